@@ -19,6 +19,14 @@ STORAGE_DIR = BASE_DIR / "storage"
 UPLOAD_DIR = STORAGE_DIR / "uploads"
 TXT_DIR = STORAGE_DIR / "txts"
 RESULTS_DIR = STORAGE_DIR / "results"
+UPLOAD_INDEX_PATH = STORAGE_DIR / "upload_index.sqlite3"
+# Keep a copy of every original upload under UPLOAD_DIR (parsing itself does not need it)
+ARCHIVE_UPLOADS = os.getenv("ARCHIVE_UPLOADS", "true").lower() in {"1", "true", "yes"}
+# Uploads up to this size are received into memory and parsed from the buffer; larger
+# ones roll over to a temp file in UPLOAD_DIR (0 = always spool to disk)
+UPLOAD_MEMORY_SPOOL_BYTES = int(os.getenv("UPLOAD_MEMORY_SPOOL_BYTES", str(8 * 1024 * 1024)))
+JOB_DIR = STORAGE_DIR / "jobs"
+JOB_DB_PATH = STORAGE_DIR / "jobs.sqlite3"
 
 # Primary LLM: Aliyun Dashscope (for feature_jzf compatibility)
 LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
@@ -26,6 +34,8 @@ LLM_MODEL = os.getenv("LLM_MODEL", "qwen-max")
 LLM_TIMEOUT_SECONDS = int(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
 LLM_API_KEY = os.getenv("LLM_API_KEY")
 
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.1"))
+
 # Default routing to Dashscope
 DEFAULT_LLM_PROVIDER = os.getenv("DEFAULT_LLM_PROVIDER", "dashscope")
 DEFAULT_LLM_MODEL = os.getenv("DEFAULT_LLM_MODEL", LLM_MODEL)
@@ -42,3 +52,96 @@ OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/com
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "deepseek-r1:1.5b")
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/generate")
 OLLAMA_TIMEOUT_SECONDS = int(os.getenv("OLLAMA_TIMEOUT_SECONDS", "300"))
+
+# Pooled LLM HTTP sessions (sync client): one long-lived session per provider
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "4"))
+LLM_POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "32"))
+LLM_TCP_KEEPALIVE = os.getenv("LLM_TCP_KEEPALIVE", "true").lower() in {"1", "true", "yes"}
+LLM_PRECONNECT_PROVIDERS = [
+    p.strip().lower() for p in os.getenv("LLM_PRECONNECT_PROVIDERS", DEFAULT_LLM_PROVIDER).split(",") if p.strip()
+]
+LLM_PRECONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_PRECONNECT_TIMEOUT_SECONDS", "3"))
+
+# Async LLM client: shared keep-alive pool and per-provider concurrency caps
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", "200"))
+LLM_ASYNC_MAX_KEEPALIVE = int(os.getenv("LLM_ASYNC_MAX_KEEPALIVE", "50"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_PROVIDER_CONCURRENCY = {
+    provider: int(os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", default))
+    for provider, default in (("dashscope", "32"), ("gemini", "32"), ("openai", "32"), ("ollama", "4"))
+}
+LLM_MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "64")))
+
+# Execution layer: process pool for document parsing, thread pool for LLM calls / disk I/O
+PARSE_WORKERS = max(1, int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1))))
+PARSE_MAX_QUEUE = int(os.getenv("PARSE_MAX_QUEUE", "500"))
+PARSE_POOL_PREWARM = os.getenv("PARSE_POOL_PREWARM", "true").lower() in {"1", "true", "yes"}
+# Parse worker sandbox: wall-clock limit per task, address-space limit per worker process and
+# how many tasks a worker runs before it is replaced (0 = no limit)
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "60"))
+PARSE_MEMORY_LIMIT_MB = int(os.getenv("PARSE_MEMORY_LIMIT_MB", "1024"))
+PARSE_MAX_TASKS_PER_WORKER = int(os.getenv("PARSE_MAX_TASKS_PER_WORKER", "500"))
+IO_WORKERS = max(1, int(os.getenv("IO_WORKERS", "64")))
+IO_MAX_QUEUE = int(os.getenv("IO_MAX_QUEUE", "1000"))
+# Large PDFs: split page ranges across page processes of the parse worker. A PDF parse borrows up to
+# PDF_PAGE_WORKERS cpu slots that are idle when it starts and runs one page process per borrowed
+# slot, so parse workers + page processes stay within PARSE_WORKERS (PDF_PAGE_WORKERS <= 0 disables)
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "24"))
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Extraction budgets: pages read from a PDF and characters kept per document (0 = unlimited)
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "60000"))
+# Pre-flight PDF triage: reject truncated / encrypted / image-only PDFs before page extraction
+PDF_TRIAGE_ENABLED = os.getenv("PDF_TRIAGE_ENABLED", "true").lower() in {"1", "true", "yes"}
+PDF_TRIAGE_SAMPLE_PAGES = int(os.getenv("PDF_TRIAGE_SAMPLE_PAGES", "3"))
+
+# LLM response cache: in-memory LRU + SQLite under STORAGE_DIR
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(STORAGE_DIR / "llm_cache.sqlite3")))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))
+
+# Local validity gate in front of the LLM is_resume classifier
+VALIDITY_GATE_ENABLED = os.getenv("VALIDITY_GATE_ENABLED", "true").lower() in {"1", "true", "yes"}
+VALIDITY_GATE_PASS_CONFIDENCE = float(os.getenv("VALIDITY_GATE_PASS_CONFIDENCE", "0.8"))
+VALIDITY_GATE_PASS_SCORE = float(os.getenv("VALIDITY_GATE_PASS_SCORE", "65"))
+VALIDITY_GATE_FAIL_CONFIDENCE = float(os.getenv("VALIDITY_GATE_FAIL_CONFIDENCE", "0.5"))
+
+# Local logistic resume classifier, consulted when the validity gate is undecided.
+# Train it with `python -m services.resume_classifier` from the logged LLM verdicts.
+RESUME_CLASSIFIER_ENABLED = os.getenv("RESUME_CLASSIFIER_ENABLED", "true").lower() in {"1", "true", "yes"}
+RESUME_CLASSIFIER_PATH = Path(os.getenv("RESUME_CLASSIFIER_PATH", str(STORAGE_DIR / "models" / "resume_classifier.npz")))
+RESUME_CLASSIFIER_ACCEPT_PROBABILITY = float(os.getenv("RESUME_CLASSIFIER_ACCEPT_PROBABILITY", "0.9"))
+RESUME_CLASSIFIER_REJECT_PROBABILITY = float(os.getenv("RESUME_CLASSIFIER_REJECT_PROBABILITY", "0.1"))
+# false: decide uncertain texts at p >= 0.5 instead of asking the LLM
+RESUME_CLASSIFIER_LLM_FALLBACK = os.getenv("RESUME_CLASSIFIER_LLM_FALLBACK", "true").lower() in {"1", "true", "yes"}
+# Log every LLM is_resume verdict with the checker stats as a training sample
+VALIDITY_SAMPLES_ENABLED = os.getenv("VALIDITY_SAMPLES_ENABLED", "true").lower() in {"1", "true", "yes"}
+VALIDITY_SAMPLES_PATH = Path(os.getenv("VALIDITY_SAMPLES_PATH", str(STORAGE_DIR / "validity_samples.sqlite3")))
+
+# Prompt compaction before LLM extraction: drop repeated page headers / footers and
+# near-duplicate paragraphs, then trim sections to an input-token budget (0 = no budget)
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() in {"1", "true", "yes"}
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "6000"))
+# A short line at the top or bottom of at least this many PDF pages (>= 2) is a running header / footer
+PROMPT_REPEATED_LINE_MIN_COUNT = max(2, int(os.getenv("PROMPT_REPEATED_LINE_MIN_COUNT", "3")))
+# A paragraph is dropped when this share of its 3-word shingles occurs in one earlier paragraph
+PROMPT_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("PROMPT_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# Extraction flow: "two_call" (classify, then extract), "single_call" (one combined prompt)
+# or "speculative" (classify and extract concurrently, discard extraction if not a resume)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "two_call")
+
+# /api/parse/batch: files per request and how many of them extract concurrently
+PARSE_BATCH_MAX_FILES = int(os.getenv("PARSE_BATCH_MAX_FILES", "100"))
+PARSE_BATCH_CONCURRENCY = max(1, int(os.getenv("PARSE_BATCH_CONCURRENCY", "16")))
+
+# Bulk parse jobs: persistent queue under STORAGE_DIR, drained by in-process workers
+JOB_WORKERS = max(0, int(os.getenv("JOB_WORKERS", "8")))
+JOB_MAX_FILES = int(os.getenv("JOB_MAX_FILES", "1000"))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "900"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
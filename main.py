@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -5,7 +7,16 @@ from fastapi.staticfiles import StaticFiles
 from config import settings
 from routes.api import router as api_router
 from routes.llm import routes as llm_router
+from routes.metrics import routes as metrics_router
+from services import job_service, resume_classifier
+from services.llm_service import (
+    close_async_client,
+    close_sessions,
+    preconnect_async_client,
+    preconnect_sessions,
+)
 from utils.errors import InvalidFileType
+from utils.executors import shutdown_process_pool, shutdown_thread_pool, warm_process_pool
 
 app = FastAPI()  #主接口，用于把后续接口集合挂载上去
 
@@ -24,6 +35,40 @@ except Exception:
 # 把各个接口封装到总服务接口上，目前提供四个接口，也就是说在前端fastapi上可以调用4个接口
 app.include_router(api_router)  # 
 app.include_router(llm_router)
+app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+def start_workers():
+    # 预先拉起解析进程池，避免第一批上传承担进程启动和模块导入的开销
+    if settings.PARSE_POOL_PREWARM:
+        warm_process_pool()
+    # 本地简历分类模型只在启动时加载一次；没有训练产物时所有不确定的文本照旧交给 LLM
+    resume_classifier.load_classifier()
+
+
+@app.on_event("startup")
+async def preconnect_llm():
+    # 启动时先和 LLM 服务建立好连接，第一次调用不再承担 TCP + TLS 握手
+    await asyncio.gather(
+        asyncio.to_thread(preconnect_sessions),
+        preconnect_async_client(),
+    )
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    # 恢复上次未完成的批量任务，并启动后台任务消费者
+    await job_service.start_workers()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await job_service.stop_workers()
+    await close_async_client()
+    close_sessions()
+    shutdown_process_pool()
+    shutdown_thread_pool()
 
 
 @app.exception_handler(InvalidFileType) #如果整个服务运行过程中出现 InvalidFileType 这个异常，就交给下面那个函数处理 ，而不是让程序崩掉或返回默认的 500。
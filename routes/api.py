@@ -1,35 +1,53 @@
+import asyncio
 import json
 import time
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional
 
-from fastapi import APIRouter, File, HTTPException, Request, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from config import settings
-from services.extract_service import extract_structured_resume
+from services import job_service
+from services.extract_service import EXTRACTION_MODES, extract_structured_resume_async
+from services.resume_validity_checker import ValidityResult, validity_checker
 from services.upload_service import (
+    SpooledUpload,
+    UploadSpool,
+    discard_spooled,
+    load_stored_result,
+    page_slots_wanted,
     process_single_file_in_batch,
-    process_upload,
+    process_spooled_upload,
+    save_structured_result,
     validate_batch_file,
     validate_filename,
 )
-from storage.file_store import save_result_json
 
+from storage.job_store import STATUSES as JOB_ITEM_STATUSES, JobItemInput
 from utils.constants import (
     DEFAULT_CHUNK_SIZE,
     ERR_FILE_CONTENT_EMPTY,
     ERR_FILE_EMPTY,
     ERR_FILE_TOO_LARGE,
+    ERR_JOB_NOT_FOUND,
+    HTTP_202_ACCEPTED,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
     HTTP_413_PAYLOAD_TOO_LARGE,
     HTTP_422_UNPROCESSABLE_ENTITY,
     HTTP_502_BAD_GATEWAY,
+    HTTP_503_SERVICE_UNAVAILABLE,
     MAX_BATCH_SIZE,
 )
+from utils.executors import cpu_executor, io_executor
 from utils.errors import (
+    AppError,
     CorruptedPDFError,
     DocumentExtractError,
     EncryptedPDFError,
+    ExecutorBusyError,
+    ExtractionLimitError,
     FileSizeError,
     InvalidFileType,
     InvalidResumeError,
@@ -48,8 +66,10 @@ _EXCEPTION_STATUS_MAP = {
     InvalidResumeError: HTTP_422_UNPROCESSABLE_ENTITY, # Add this line
     EncryptedPDFError: HTTP_422_UNPROCESSABLE_ENTITY,
     CorruptedPDFError: HTTP_422_UNPROCESSABLE_ENTITY,
+    ExtractionLimitError: HTTP_422_UNPROCESSABLE_ENTITY,
     DocumentExtractError: HTTP_422_UNPROCESSABLE_ENTITY,
     LLMError: HTTP_502_BAD_GATEWAY,
+    ExecutorBusyError: HTTP_503_SERVICE_UNAVAILABLE,
 }
 
 
@@ -61,25 +81,63 @@ def _raise_http_exception(exc: Exception) -> None:
     raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
-async def _read_upload_content(file: UploadFile, content_length: Optional[int]) -> bytes:
-    """Read and validate upload file content."""
+async def _spool_upload(file: UploadFile, ext: str, content_length: Optional[int]) -> SpooledUpload:
+    """
+    Receive the upload one chunk at a time, hashing and magic-checking it as it
+    arrives; small files stay in memory, larger ones are spooled to UPLOAD_DIR.
+    """
     if content_length is not None and content_length > settings.MAX_UPLOAD_BYTES:
         raise HTTPException(status_code=HTTP_413_PAYLOAD_TOO_LARGE, detail=ERR_FILE_TOO_LARGE)
 
-    data = bytearray()
-    total = 0
-    while True:
-        chunk = await file.read(DEFAULT_CHUNK_SIZE)
-        if not chunk:
-            break
-        total += len(chunk)
-        if total > settings.MAX_UPLOAD_BYTES:
-            raise HTTPException(status_code=HTTP_413_PAYLOAD_TOO_LARGE, detail=ERR_FILE_TOO_LARGE)
-        data.extend(chunk)
-    
-    if not data:
-        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ERR_FILE_EMPTY)
-    return bytes(data)
+    spool = await io_executor.run(UploadSpool, ext)
+    try:
+        while True:
+            chunk = await file.read(DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                break
+            if spool.size + len(chunk) > settings.MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=HTTP_413_PAYLOAD_TOO_LARGE, detail=ERR_FILE_TOO_LARGE)
+            await io_executor.run(spool.write, chunk)
+
+        if not spool.size:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=ERR_FILE_EMPTY)
+        return await io_executor.run(spool.finish)
+    except BaseException:
+        spool.discard()
+        raise
+
+
+async def _run_parse_task(spooled: SpooledUpload, ext: str, func, *args):
+    """
+    Run a parse task on the CPU executor, lending a PDF the idle slots for its page fan-out.
+    A worker killed for exceeding the parse time or memory limit cannot clean up after
+    itself, so its temp file is removed here.
+    """
+    try:
+        return await cpu_executor.run(func, *args, borrow_idle=page_slots_wanted(ext))
+    except ExtractionLimitError:
+        await io_executor.run(discard_spooled, spooled)
+        raise
+
+
+async def _spool_batch_file(
+    file: UploadFile, ext: str, filename: str
+) -> tuple[Optional[SpooledUpload], Optional[dict]]:
+    """Spool one batch member, turning a rejected upload into a failure entry."""
+    try:
+        return await _spool_upload(file, ext, None), None
+    except HTTPException as exc:
+        reason = exc.detail
+    except AppError as exc:
+        reason = str(exc)
+    logger.error("[BATCH] Skipping %s: %s", filename, reason)
+    return None, {"filename": filename, "reason": reason}
+
+
+def _check_mode(mode: Optional[str]) -> None:
+    """Reject an unknown extraction mode before any upload is parsed or stored."""
+    if mode is not None and (not isinstance(mode, str) or mode not in EXTRACTION_MODES):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"不支持的抽取模式: {mode}")
 
 
 def _get_content_length(request: Request) -> Optional[int]:
@@ -93,9 +151,38 @@ def _get_content_length(request: Request) -> Optional[int]:
     return None
 
 
-def _extract_structured(text: str, resume_id: Optional[str]):
+async def _extract_structured(
+    text: str,
+    resume_id: Optional[str],
+    validity: Optional[ValidityResult] = None,
+    mode: Optional[str] = None,
+    refresh: bool = False,
+):
     """Call LLM extract service."""
-    return extract_structured_resume(ExtractionInput(text=text, resume_id=resume_id))
+    return await extract_structured_resume_async(
+        ExtractionInput(text=text, resume_id=resume_id),
+        validity=validity,
+        mode=mode,
+        refresh=refresh,
+    )
+
+
+async def _extract_and_save(
+    text: str,
+    resume_id: Optional[str],
+    validity: Optional[ValidityResult] = None,
+    mode: Optional[str] = None,
+    refresh: bool = False,
+):
+    """
+    Extract structured data and persist it; the file write runs on the I/O executor.
+    ``refresh`` (force=true uploads) bypasses the LLM response cache.
+    """
+    structured, usage = await _extract_structured(text, resume_id, validity, mode, refresh)
+    json_text = structured.model_dump_json(ensure_ascii=False)
+    if resume_id:
+        await io_executor.run(save_structured_result, resume_id, json_text)
+    return json_text, usage
 
 
 @router.get("/")
@@ -104,17 +191,30 @@ def index():
     return JSONResponse({
         "message": "ok",
         "docs": "/docs",
-        "endpoints": ["/api/upload", "/api/upload/batch", "/api/extract", "/api/parse"],
+        "endpoints": [
+            "/api/upload",
+            "/api/upload/batch",
+            "/api/upload/batch/stream",
+            "/api/extract",
+            "/api/parse",
+            "/api/parse/batch",
+            "/api/jobs",
+            "/api/metrics",
+        ],
     })
 
 
 @router.post("/api/upload")
-async def upload_resume(request: Request, file: UploadFile = File(...)):
+async def upload_resume(
+    request: Request,
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+):
     """Upload and convert a resume file to text."""
     try:
         ext = validate_filename(file.filename)
-        content = await _read_upload_content(file, _get_content_length(request))
-        result = process_upload(ext, content)
+        spooled = await _spool_upload(file, ext, _get_content_length(request))
+        result = await _run_parse_task(spooled, ext, process_spooled_upload, ext, spooled, force)
     except HTTPException:
         raise
     except Exception as exc:
@@ -125,34 +225,79 @@ async def upload_resume(request: Request, file: UploadFile = File(...)):
         "resume_id": result.resume_id,
         "text": result.text,
         "txt_path": result.txt_path,
+        "deduplicated": result.deduplicated,
+        "truncated": result.truncated,
+        "pdf_triage": result.triage,
     })
 
 
-@router.post("/api/upload/batch")
-async def upload_resume_batch(request: Request, files: list[UploadFile] = File(...)):
-    """Batch upload and convert multiple resume files."""
+def _check_batch_size(files: list[UploadFile]) -> None:
     if len(files) > MAX_BATCH_SIZE:
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST,
             detail=f"批量上传最多支持 {MAX_BATCH_SIZE} 个文件，当前 {len(files)} 个"
         )
 
-    succeeded, failed = [], []
 
+async def _start_batch(files: list[UploadFile], force: bool) -> list[tuple[str, object]]:
+    """
+    Validate and read each file, handing it to the CPU executor as soon as it is read,
+    so parsing runs in parallel and the event loop stays free.
+    Returns (filename, outcome) pairs where outcome is either a finished
+    (success, failure) tuple or a task that resolves to one.
+    """
+    pending: list[tuple[str, object]] = []
     for file in files:
         ext, filename, failure = validate_batch_file(file.filename)
         if failure:
-            failed.append(failure)
+            pending.append((filename, (None, failure)))
             continue
 
-        try:
-            content = await _read_upload_content(file, None)
-        except HTTPException as exc:
-            logger.error("[BATCH] Skipping %s: %s", filename, exc.detail)
-            failed.append({"filename": filename, "reason": exc.detail})
+        spooled, failure = await _spool_batch_file(file, ext, filename)
+        if failure:
+            pending.append((filename, (None, failure)))
             continue
 
-        success, failure = process_single_file_in_batch(filename, ext, content)
+        task = asyncio.ensure_future(
+            _run_parse_task(spooled, ext, process_single_file_in_batch, filename, ext, spooled, force)
+        )
+        pending.append((filename, task))
+    return pending
+
+
+async def _resolve_batch_entry(filename: str, outcome) -> tuple[Optional[dict], Optional[dict]]:
+    if isinstance(outcome, asyncio.Future):
+        try:
+            outcome = await outcome
+        except ExtractionLimitError as exc:
+            logger.error("[BATCH] %s: %s", filename, exc)
+            outcome = (None, {"filename": filename, "reason": str(exc)})
+        except (BrokenProcessPool, ExecutorBusyError) as exc:
+            logger.error("[BATCH] Could not process %s: %s", filename, exc)
+            outcome = (None, {"filename": filename, "reason": f"处理失败: {exc}"})
+    return outcome
+
+
+def _format_stream_event(event: str, data: dict, stream_format: str) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+
+
+@router.post("/api/upload/batch")
+async def upload_resume_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+):
+    """Batch upload and convert multiple resume files."""
+    _check_batch_size(files)
+    pending = await _start_batch(files, force)
+
+    succeeded, failed = [], []
+    for filename, outcome in pending:
+        success, failure = await _resolve_batch_entry(filename, outcome)
         if success:
             succeeded.append(success)
         if failure:
@@ -167,23 +312,77 @@ async def upload_resume_batch(request: Request, files: list[UploadFile] = File(.
     })
 
 
+@router.post("/api/upload/batch/stream")
+async def upload_resume_batch_stream(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+    stream_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$"),
+):
+    """
+    Batch upload that streams one event per file in completion order (NDJSON or SSE),
+    followed by a summary event with total / succeeded_count / failed_count.
+    """
+    _check_batch_size(files)
+    # Uploaded files are closed once this handler returns, so everything is read and
+    # submitted here; only the waiting happens inside the stream.
+    pending = await _start_batch(files, force)
+
+    async def events():
+        succeeded_count = failed_count = 0
+        for next_done in asyncio.as_completed(
+            [_resolve_batch_entry(filename, outcome) for filename, outcome in pending]
+        ):
+            success, failure = await next_done
+            if success:
+                succeeded_count += 1
+                yield _format_stream_event("file", {"status": "succeeded", **success}, stream_format)
+            if failure:
+                failed_count += 1
+                yield _format_stream_event("file", {"status": "failed", **failure}, stream_format)
+        yield _format_stream_event(
+            "summary",
+            {"total": len(files), "succeeded_count": succeeded_count, "failed_count": failed_count},
+            stream_format,
+        )
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/api/parse")
-async def parse_resume(request: Request, file: UploadFile = File(...)):
+async def parse_resume(
+    request: Request,
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+    mode: Optional[str] = Query(None, description="Extraction mode: two_call, single_call or speculative"),
+):
     """Upload, convert to text, and extract structured data from a resume."""
+    _check_mode(mode)
     start_time = time.time()
     try:
         ext = validate_filename(file.filename)
-        content = await _read_upload_content(file, _get_content_length(request))
-        result = process_upload(ext, content)
-        structured, usage = _extract_structured(result.text, result.resume_id)
+        spooled = await _spool_upload(file, ext, _get_content_length(request))
+        result = await _run_parse_task(spooled, ext, process_spooled_upload, ext, spooled, force)
+        json_text = None
+        if result.deduplicated:
+            json_text = await io_executor.run(load_stored_result, result.resume_id)
+        if json_text is not None:
+            usage = {"cached": True}
+        else:
+            json_text, usage = await _extract_and_save(
+                result.text, result.resume_id, result.validity, mode, force
+            )
     except HTTPException:
         raise
     except Exception as exc:
         _raise_http_exception(exc)
 
     duration = time.time() - start_time
-    json_text = structured.model_dump_json(ensure_ascii=False)
-    save_result_json(result.resume_id, json_text)
 
     logger.info("Parsed resume %s in %.2f seconds", result.resume_id, duration)
 
@@ -192,6 +391,121 @@ async def parse_resume(request: Request, file: UploadFile = File(...)):
         "result": json.loads(json_text),
         "usage": usage,
         "duration_seconds": round(duration, 2),
+        "deduplicated": result.deduplicated,
+        "truncated": result.truncated,
+        "pdf_triage": result.triage,
+    })
+
+
+def _merge_usage(total: dict, usage: dict) -> None:
+    """Add one file's usage into the batch total (numeric fields are summed)."""
+    if usage.get("cached"):
+        total["cached_files"] = total.get("cached_files", 0) + 1
+        return
+    for key, value in usage.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+
+
+async def _parse_batch_file(
+    filename: str,
+    ext: str,
+    spooled: SpooledUpload,
+    force: bool,
+    mode: Optional[str],
+    llm_slots: asyncio.Semaphore,
+) -> tuple[Optional[dict], Optional[dict]]:
+    """Parse one file of a batch, then extract once a batch LLM slot is free."""
+    started = time.perf_counter()
+    timings = {"parse_seconds": None, "extract_seconds": None}
+    try:
+        result = await _run_parse_task(spooled, ext, process_spooled_upload, ext, spooled, force)
+        parsed = time.perf_counter()
+        timings["parse_seconds"] = round(parsed - started, 3)
+
+        json_text = None
+        if result.deduplicated:
+            json_text = await io_executor.run(load_stored_result, result.resume_id)
+        if json_text is not None:
+            usage = {"cached": True}
+        else:
+            async with llm_slots:
+                extract_started = time.perf_counter()
+                json_text, usage = await _extract_and_save(
+                    result.text, result.resume_id, result.validity, mode, force
+                )
+                timings["extract_seconds"] = round(time.perf_counter() - extract_started, 3)
+    except Exception as exc:
+        logger.error("[PARSE BATCH] %s failed: %s", filename, exc)
+        timings["total_seconds"] = round(time.perf_counter() - started, 3)
+        return None, {"filename": filename, "reason": str(exc), "timings": timings}
+
+    timings["total_seconds"] = round(time.perf_counter() - started, 3)
+    return {
+        "filename": filename,
+        "resume_id": result.resume_id,
+        "deduplicated": result.deduplicated,
+        "truncated": result.truncated,
+        "pdf_triage": result.triage,
+        "result": json.loads(json_text),
+        "usage": usage,
+        "timings": timings,
+    }, None
+
+
+@router.post("/api/parse/batch")
+async def parse_resume_batch(
+    files: list[UploadFile] = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+    mode: Optional[str] = Query(None, description="Extraction mode: two_call, single_call or speculative"),
+):
+    """
+    Upload, convert and extract a batch of resumes in one request.
+    Files are parsed on the process pool and extracted concurrently, at most
+    PARSE_BATCH_CONCURRENCY at a time (LLM calls are further capped per provider).
+    """
+    if len(files) > settings.PARSE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"批量解析最多支持 {settings.PARSE_BATCH_MAX_FILES} 个文件，当前 {len(files)} 个"
+        )
+    _check_mode(mode)
+
+    start_time = time.time()
+    llm_slots = asyncio.Semaphore(settings.PARSE_BATCH_CONCURRENCY)
+    tasks = []
+    for file in files:
+        ext, filename, failure = validate_batch_file(file.filename)
+        if failure:
+            tasks.append(asyncio.sleep(0, (None, failure)))
+            continue
+        spooled, failure = await _spool_batch_file(file, ext, filename)
+        if failure:
+            tasks.append(asyncio.sleep(0, (None, failure)))
+            continue
+        tasks.append(asyncio.ensure_future(
+            _parse_batch_file(filename, ext, spooled, force, mode, llm_slots)
+        ))
+
+    succeeded, failed = [], []
+    usage: dict = {}
+    for success, failure in await asyncio.gather(*tasks):
+        if success:
+            succeeded.append(success)
+            _merge_usage(usage, success["usage"])
+        if failure:
+            failed.append(failure)
+
+    duration = time.time() - start_time
+    logger.info("Parsed batch of %d files in %.2f seconds", len(files), duration)
+    return JSONResponse({
+        "total": len(files),
+        "succeeded_count": len(succeeded),
+        "failed_count": len(failed),
+        "succeeded": succeeded,
+        "failed": failed,
+        "usage": usage,
+        "duration_seconds": round(duration, 2),
     })
 
 
@@ -200,18 +514,97 @@ async def extract_resume(payload: dict):
     """Extract structured data from resume text."""
     text = payload.get("text")
     resume_id = payload.get("resume_id") if isinstance(payload.get("resume_id"), str) else None
+    mode = payload.get("mode")
+    refresh = payload.get("refresh") is True
 
+    _check_mode(mode)
     if not isinstance(text, str) or not text.strip():
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="text 不能为空")
 
     try:
-        structured = _extract_structured(text, resume_id)
+        validity = await cpu_executor.run(validity_checker.check_text, text)
+        json_text, _ = await _extract_and_save(text, resume_id, validity, mode, refresh)
     except Exception as exc:
         _raise_http_exception(exc)
 
-    json_text = structured.model_dump_json(ensure_ascii=False)
-    if resume_id:
-        save_result_json(resume_id, json_text)
-        
-
     return JSONResponse(json.loads(json_text))
+
+
+@router.post("/api/jobs")
+async def create_parse_job(
+    files: list[UploadFile] = File(...),
+    force: bool = Query(False, description="Reprocess even if the same file was uploaded before"),
+    mode: Optional[str] = Query(None, description="Extraction mode: two_call, single_call or speculative"),
+):
+    """
+    Queue files for full parsing (upload + structured extraction) in the background.
+    Poll GET /api/jobs/{job_id} for progress and GET /api/jobs/{job_id}/results for output.
+    """
+    if len(files) > settings.JOB_MAX_FILES:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"单个任务最多支持 {settings.JOB_MAX_FILES} 个文件，当前 {len(files)} 个"
+        )
+    _check_mode(mode)
+
+    job_id = job_service.new_job_id()
+    items: list[JobItemInput] = []
+    for position, file in enumerate(files):
+        ext, filename, failure = validate_batch_file(file.filename)
+        if failure:
+            items.append(JobItemInput(filename=filename, error=failure["reason"]))
+            continue
+        spooled, failure = await _spool_batch_file(file, ext, filename)
+        if failure:
+            items.append(JobItemInput(filename=filename, error=failure["reason"]))
+            continue
+        input_path = await io_executor.run(job_service.adopt_input, job_id, position, ext, spooled)
+        items.append(JobItemInput(filename=filename, ext=ext, input_path=input_path))
+
+    try:
+        await job_service.submit_job(job_id, mode, force, items)
+    except Exception as exc:
+        _raise_http_exception(exc)
+
+    logger.info("Queued job %s with %d files", job_id, len(items))
+    return JSONResponse(
+        {
+            "job_id": job_id,
+            "total": len(items),
+            "status_url": f"/api/jobs/{job_id}",
+            "results_url": f"/api/jobs/{job_id}/results",
+        },
+        status_code=HTTP_202_ACCEPTED,
+    )
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_parse_job(job_id: str):
+    """Job progress: item counts per status and per-stage throughput."""
+    status = await io_executor.run(job_service.job_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=ERR_JOB_NOT_FOUND)
+    return JSONResponse(status)
+
+
+@router.get("/api/jobs/{job_id}/results")
+async def get_parse_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = Query(None, description="Only items in this status"),
+):
+    """Per-file outcome in submission order; succeeded items include the structured result."""
+    if status is not None and status not in JOB_ITEM_STATUSES:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"不支持的状态: {status}")
+    job = await io_executor.run(job_service.job_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=ERR_JOB_NOT_FOUND)
+    results = await io_executor.run(job_service.job_results, job_id, offset, limit, status)
+    return JSONResponse({
+        "job_id": job_id,
+        "status": job["status"],
+        "total": job["total"],
+        "offset": offset,
+        "results": results,
+    })
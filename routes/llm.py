@@ -3,7 +3,7 @@ from fastapi.responses import JSONResponse
 
 from config import settings
 from schemas.api_models import LLMGenerateRequest
-from services.llm_service import call_llm
+from services.llm_service import call_llm_async
 from utils.errors import LLMError
 
 routes = APIRouter(prefix="/api/llm", tags=["llm"])
@@ -15,10 +15,11 @@ async def generate_with_unified_llm(payload: LLMGenerateRequest):
     Unified API endpoint for calling different models.
     """
     try:
-        output = call_llm(
+        output = await call_llm_async(
             prompt=payload.prompt,
             provider=payload.provider,
             model=payload.model,
+            use_cache=False,
         )
     except LLMError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from utils import metrics
+
+routes = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@routes.get("")  #查看执行器队列、耗时等运行指标
+def get_metrics():
+    """Counters, timings and executor queue state for this worker process."""
+    return JSONResponse(metrics.snapshot())
@@ -1,48 +1,164 @@
 from __future__ import annotations
 
+import zipfile
+from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+from xml.etree import ElementTree
 
-from docx import Document
-
-from services.document_validate import validate_file_size
-from services.pdf_to_txt import extract_text_from_pdf
-from services.text_clean_service import finalize_extracted_plaintext
-from utils.errors import DocumentExtractError
+from services.document_validate import validate_file_size, validate_size, word_document_member
+from services.pdf_to_txt import extract_pdf
+from services.text_clean_service import ExtractedText, char_budget_reached, finalize_extracted
+from utils.errors import DocumentExtractError, ExtractionLimitError
 from utils.logger import get_logger
 
 logger = get_logger("document_extract")
 
 
-def extract_text_from_document(path: Path) -> str:
-    validate_file_size(path)
-    ext = path.suffix.lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(path, skip_size_check=True)
-    if ext == ".docx":
-        return _docx_to_txt(path)
-    raise DocumentExtractError(f"不支持的文件类型: {ext}")
+DocumentSource = Union[Path, bytes, bytearray, memoryview, BinaryIO]
 
 
-def _docx_to_txt(path: Path) -> str:
+def extract_document(
+    source: DocumentSource,
+    ext: Optional[str] = None,
+    *,
+    name: Optional[str] = None,
+) -> ExtractedText:
+    """
+    Extract a PDF / DOCX from a path or from memory (bytes / memoryview / binary stream),
+    honouring the PDF_MAX_PAGES and EXTRACT_MAX_CHARS budgets.
+    """
+    if isinstance(source, Path):
+        validate_file_size(source)
+        ext = ext or source.suffix
+        name = name or source.name
+    else:
+        name = name or f"<memory>{ext}"
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            validate_size(memoryview(source).nbytes, name)
+    ext = (ext or "").lower()
     try:
-        doc = Document(str(path))
-    except Exception as exc:
-        logger.error("DOCX open failed: %s — %s", path.name, exc)
-        raise DocumentExtractError(
-            f"无法打开或解析 DOCX：{path.name}（文件可能已损坏或已加密）"
+        if ext == ".pdf":
+            return extract_pdf(source, skip_size_check=True, name=name)
+        if ext == ".docx":
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                source = BytesIO(source)
+            return _docx_to_txt(source, name)
+    except MemoryError as exc:
+        # 解析进程有地址空间上限（PARSE_MEMORY_LIMIT_MB），超出时在这里统一报告
+        logger.error("Extraction ran out of memory: %s", name)
+        raise ExtractionLimitError(
+            f"文档解析超出内存限制：{name}", details={"reason": "memory"}
         ) from exc
+    raise DocumentExtractError(f"不支持的文件类型: {ext}")
 
+
+def extract_text_from_document(path: Path) -> str:
+    return extract_document(path).text
+
+
+def _docx_to_txt(source: Union[Path, BinaryIO], name: Optional[str] = None) -> ExtractedText:
+    """Stream word/document.xml once instead of building a python-docx Document."""
+    name = name or (source.name if isinstance(source, Path) else "<memory>.docx")
     parts: list[str] = []
-    for paragraph in doc.paragraphs:
-        t = (paragraph.text or "").strip()
-        if t:
-            parts.append(t)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                t = (cell.text or "").strip()
-                if t:
+    extracted_chars = 0
+    truncated = False
+    try:
+        with zipfile.ZipFile(source) as archive:
+            member = word_document_member(archive)
+            if member is None:
+                raise KeyError("word/document.xml")
+            with archive.open(member) as xml:
+                for t in _docx_blocks(xml):
                     parts.append(t)
+                    extracted_chars += len(t)
+                    if char_budget_reached(extracted_chars):
+                        truncated = True
+                        break
+    except MemoryError:
+        raise
+    except Exception as exc:
+        logger.error("DOCX open failed: %s — %s", name, exc)
+        raise DocumentExtractError(
+            f"无法打开或解析 DOCX：{name}（文件可能已损坏或已加密）"
+        ) from exc
 
     raw = "\n".join(parts)
-    return finalize_extracted_plaintext(raw, source="docx")
+    return finalize_extracted(raw, source="docx", truncated=truncated)
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# 段落内除 w:t 以外会产生文本的 run 子元素（与 python-docx 的 run.text 一致）
+_RUN_SPECIAL_TEXT = {f"{_W}tab": "\t", f"{_W}ptab": "\t", f"{_W}br": "\n", f"{_W}cr": "\n", f"{_W}noBreakHyphen": "-"}
+
+
+def _docx_blocks(xml: BinaryIO) -> Iterator[str]:
+    """
+    Non-empty paragraph and table-cell texts of document.xml, in document order, read lazily.
+
+    Each <w:tc> is emitted once: a cell spanning several grid columns is one element, and
+    vertically merged continuation cells are skipped, so merged text is not repeated.
+    Paragraphs inside a cell (and nested tables) become lines of that cell's text.
+    Text boxes are kept; their VML fallback copy (mc:Fallback) is skipped.
+    """
+    paragraphs: list[list[str]] = []  # open paragraphs, innermost last (text boxes nest)
+    cells: list[list] = []  # open cells: [lines, is_merge_continuation]
+    run_depth = 0
+    skip_depth = 0
+    depth = 0
+    body = None
+
+    for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth += 1
+            if tag == f"{_W}body":
+                body = elem
+            if skip_depth or tag == _MC_FALLBACK:
+                skip_depth += 1
+            elif tag == f"{_W}p":
+                paragraphs.append([])
+            elif tag == f"{_W}r":
+                run_depth += 1
+            elif tag == f"{_W}tc":
+                cells.append([[], False])
+            continue
+
+        depth -= 1
+        if depth == 2 and body is not None:
+            # 正文的顶层块处理完就从树上摘掉，内存占用不随文档长度增长
+            body.remove(elem)
+        if skip_depth:
+            skip_depth -= 1
+            continue
+
+        if tag == f"{_W}t":
+            if paragraphs and elem.text:
+                paragraphs[-1].append(elem.text)
+        elif tag == f"{_W}r":
+            run_depth -= 1
+        elif run_depth and tag in _RUN_SPECIAL_TEXT:
+            if paragraphs:
+                paragraphs[-1].append(_RUN_SPECIAL_TEXT[tag])
+        elif tag == f"{_W}vMerge":
+            if cells and elem.get(f"{_W}val", "continue") == "continue":
+                cells[-1][1] = True
+        elif tag == f"{_W}p":
+            text = "".join(paragraphs.pop())
+            if cells:
+                cells[-1][0].append(text)
+            else:
+                text = text.strip()
+                if text:
+                    yield text
+            elem.clear()
+        elif tag == f"{_W}tc":
+            lines, continuation = cells.pop()
+            text = "" if continuation else "\n".join(lines).strip()
+            if text:
+                if cells:
+                    cells[-1][0].append(text)
+                else:
+                    yield text
+            elem.clear()
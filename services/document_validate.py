@@ -3,6 +3,7 @@ from __future__ import annotations
 import zipfile
 from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO, Optional
 
 from config import settings
 from utils.errors import FileSizeError, InvalidFileType
@@ -24,38 +25,63 @@ def allowed_types_hint() -> str:
 
 
 def validate_file_size(path: Path) -> None:
-    size = path.stat().st_size
+    validate_size(path.stat().st_size, path.name)
+
+
+def validate_size(size: int, name: str) -> None:
     if size < settings.MIN_UPLOAD_BYTES:
-        logger.warning("File too small, skipping: %s (%d bytes)", path.name, size)
-        raise FileSizeError(f"File too small: {path.name} ({size} bytes)")
+        logger.warning("File too small, skipping: %s (%d bytes)", name, size)
+        raise FileSizeError(f"File too small: {name} ({size} bytes)")
     if size > settings.MAX_UPLOAD_BYTES:
-        logger.warning("File too large, skipping: %s (%d bytes)", path.name, size)
-        raise FileSizeError(f"File too large: {path.name} ({size} bytes)")
+        logger.warning("File too large, skipping: %s (%d bytes)", name, size)
+        raise FileSizeError(f"File too large: {name} ({size} bytes)")
 
 
-def _zip_has_word_document(content: bytes) -> bool:
+def open_docx_archive(source: bytes | Path | BinaryIO) -> Optional[zipfile.ZipFile]:
+    """Open a DOCX zip from a path, a stream or bytes; None if the source is not a zip."""
     try:
-        with zipfile.ZipFile(BytesIO(content)) as zf:
-            for name in zf.namelist():
-                normalized = name.replace("\\", "/").lower()
-                if normalized == "word/document.xml":
-                    return True
-        return False
+        return zipfile.ZipFile(BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
     except zipfile.BadZipFile:
+        return None
+
+
+def word_document_member(zf: zipfile.ZipFile) -> Optional[str]:
+    """Name of the zip entry holding the document body (word/document.xml), if present."""
+    for name in zf.namelist():
+        normalized = name.replace("\\", "/").lower()
+        if normalized == "word/document.xml":
+            return name
+    return None
+
+
+def _zip_has_word_document(source: bytes | Path) -> bool:
+    zf = open_docx_archive(source)
+    if zf is None:
         return False
+    with zf:
+        return word_document_member(zf) is not None
+
+
+# 文件头检查只需要前 UPLOAD_HEAD_BYTES 字节，流式写盘时拿到第一块数据就能判断
+UPLOAD_HEAD_BYTES = 1024
 
 
-def validate_upload_magic(ext: str, content: bytes) -> None:
+def validate_upload_head(ext: str, head: bytes) -> None:
+    """Check the leading bytes of an upload against its extension."""
     ext = ext.lower()
     hint = allowed_types_hint()
     if ext == ".pdf":
-        head = content[:1024].lstrip()
-        if not head.startswith(b"%PDF-"):
+        if not head[:UPLOAD_HEAD_BYTES].lstrip().startswith(b"%PDF-"):
             raise InvalidFileType(f"文件内容与扩展名不符，仅支持 {hint}")
     elif ext == ".docx":
-        if len(content) < 4 or not content.startswith(b"PK"):
+        if len(head) < 4 or not head.startswith(b"PK"):
             raise InvalidFileType(f"不是有效的 DOCX 文件，仅支持 {hint}")
-        if not _zip_has_word_document(content):
-            raise InvalidFileType(f"不是有效的 DOCX 文件（缺少文档主体），仅支持 {hint}")
     else:
         raise InvalidFileType(f"不支持的文件类型，仅支持 {hint}")
+
+
+def validate_upload_body(ext: str, source: bytes | Path) -> None:
+    """Checks that need the complete upload (the DOCX zip directory sits at the end)."""
+    if ext.lower() == ".docx" and not _zip_has_word_document(source):
+        raise InvalidFileType(f"不是有效的 DOCX 文件（缺少文档主体），仅支持 {allowed_types_hint()}")
+
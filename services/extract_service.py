@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import re
+import time
 from typing import Optional
 
 from pydantic import ValidationError
 
+from config import settings
 from schemas.models import ExtractionInput, ResumeStructured
-from services.llm_service import call_llm
+from services import resume_classifier
+from services.prompt_compaction import compact_text
+from services.llm_service import call_llm, call_llm_async
+from services.resume_validity_checker import ValidityResult
+from services.text_clean_service import without_page_breaks
+from utils import metrics
 from utils.errors import LLMParseError, NotResumeError
 
+# two_call: LLM classifier, then extraction; single_call: one prompt returns both;
+# speculative: classifier and extraction are sent at the same time
+EXTRACTION_MODES = {"two_call", "single_call", "speculative"}
+
+# 抽取 prompt 里的 schema 只生成一次，用紧凑 JSON（去掉缩进约省一半 schema token）
+_SCHEMA_JSON = json.dumps(ResumeStructured.model_json_schema(), ensure_ascii=False, separators=(",", ":"))
+
 
 def _normalize_text(text: str) -> str:
     """Normalize whitespace for downstream checks."""
@@ -34,16 +49,55 @@ Text:
 """.strip()
 
 
-def _looks_like_resume(text: str, provider: Optional[str] = None, model: Optional[str] = None) -> bool:
+def _resume_check_snippet(text: str) -> Optional[str]:
+    """Return the text sent to the classifier, or None if it is too short to be a resume."""
     normalized = _normalize_text(text)
     if len(normalized) < 40:
+        return None
+    return normalized[:4000]
+
+
+def _looks_like_resume(
+    text: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    refresh: bool = False,
+) -> bool:
+    snippet = _resume_check_snippet(text)
+    if snippet is None:
         return False
 
-    snippet = normalized[:4000]
     prompt = _build_resume_check_prompt(snippet)
-    raw_output, _ = call_llm(prompt, provider=provider, model=model)
-    parsed = _extract_json(raw_output)
+    raw_output, usage = call_llm(
+        prompt, provider=provider, model=model, refresh=refresh, validate=_parse_resume_check
+    )
+    _record_usage("classify", usage)
+    return _parse_resume_check(raw_output)
+
+
+async def _looks_like_resume_async(
+    text: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    refresh: bool = False,
+) -> bool:
+    snippet = _resume_check_snippet(text)
+    if snippet is None:
+        return False
+
+    prompt = _build_resume_check_prompt(snippet)
+    raw_output, usage = await call_llm_async(
+        prompt, provider=provider, model=model, refresh=refresh, validate=_parse_resume_check
+    )
+    _record_usage("classify", usage)
+    return _parse_resume_check(raw_output)
+
 
+def _parse_resume_check(raw_output: str) -> bool:
+    return _coerce_is_resume(_extract_json(raw_output))
+
+
+def _coerce_is_resume(parsed: dict) -> bool:
     value = parsed.get("is_resume")
     if isinstance(value, bool):
         return value
@@ -56,6 +110,42 @@ def _looks_like_resume(text: str, provider: Optional[str] = None, model: Optiona
 
     raise LLMParseError("LLM output missing boolean field: is_resume")
 
+#用本地有效性检查结果做闸门：高置信 PASS 跳过 LLM 分类，高置信 HARD_FAIL 直接拒绝，其余才调用 LLM
+def _validity_gate(validity: Optional[ValidityResult]) -> Optional[bool]:
+    """
+    Decide resume/not-resume from the local checker when it is confident enough.
+    Returns True (resume), False (not a resume) or None (ask the LLM classifier).
+    """
+    if validity is None or not settings.VALIDITY_GATE_ENABLED:
+        metrics.incr("validity_gate.no_signal")
+        return None
+
+    if (
+        validity.decision == "PASS"
+        and validity.confidence >= settings.VALIDITY_GATE_PASS_CONFIDENCE
+        and validity.overall_score >= settings.VALIDITY_GATE_PASS_SCORE
+    ):
+        metrics.incr("validity_gate.accepted")
+        return True
+
+    if (
+        validity.decision == "HARD_FAIL"
+        and validity.confidence >= settings.VALIDITY_GATE_FAIL_CONFIDENCE
+    ):
+        metrics.incr("validity_gate.rejected")
+        return False
+
+    metrics.incr("validity_gate.llm_classified")
+    return None
+
+
+def _local_verdict(validity: Optional[ValidityResult]) -> Optional[bool]:
+    """The validity gate first, then the trained local classifier; None = ask the LLM."""
+    is_resume = _validity_gate(validity)
+    if is_resume is None:
+        is_resume = resume_classifier.classify(validity)
+    return is_resume
+
 #把 LLM 的原始输出里可能被代码块包着的 JSON 提取出来并解析成 dict ，解析不了就抛 LLMParseError 。
 def _extract_json(raw_output: str) -> dict:
     """Extract JSON object from raw LLM output."""
@@ -70,15 +160,16 @@ def _extract_json(raw_output: str) -> dict:
         raw_output = generic_match.group(1).strip()
 
     try:
-        return json.loads(raw_output)
+        parsed = json.loads(raw_output)
     except json.JSONDecodeError as exc:
         raise LLMParseError("LLM output is not valid JSON") from exc
+    if not isinstance(parsed, dict):
+        raise LLMParseError("LLM output is not a JSON object")
+    return parsed
 
 #根据 ResumeStructured 模型的 JSON schema 构建提取提示,要改prompt也是在这里改
 def _build_prompt(text: str) -> str:
     """Build the extraction prompt using the schema contract."""
-    schema_dict = ResumeStructured.model_json_schema()
-
     return f"""
 You are a resume information extraction system.
 
@@ -91,33 +182,217 @@ Rules:
 4. If a field is missing, use null for scalar fields and [] for list fields.
 5. Follow this JSON schema exactly:
 
-{json.dumps(schema_dict, ensure_ascii=False, indent=2)}
+{_SCHEMA_JSON}
 
 Resume text:
 {text}
 """.strip()
 
+#单次调用模式：一个 prompt 同时返回 is_resume 判断和结构化结果
+def _build_combined_prompt(text: str) -> str:
+    """Build a prompt that classifies and extracts in one LLM call."""
+    return f"""
+You are a resume classification and information extraction system.
+
+First decide whether the input text is a resume/CV. If it is, extract structured
+resume information from it.
+
+Rules:
+1. Return JSON only.
+2. Do not wrap the JSON in markdown.
+3. Do not invent information that is not explicitly supported by the text.
+4. If a field is missing, use null for scalar fields and [] for list fields.
+5. Return an object of the form {{"is_resume": boolean, "resume": object or null}}.
+6. If is_resume is false, set "resume" to null.
+7. Otherwise "resume" must follow this JSON schema exactly:
+
+{_SCHEMA_JSON}
+
+Text:
+{text}
+""".strip()
+
+
+def _parse_combined(raw_output: str) -> Optional[ResumeStructured]:
+    """The extracted resume, or None when the LLM says the text is not a resume."""
+    parsed = _extract_json(raw_output)
+    if not _coerce_is_resume(parsed):
+        return None
+
+    resume = parsed.get("resume")
+    if not isinstance(resume, dict):
+        raise LLMParseError("LLM output missing object field: resume")
+    return _validate_structured(resume)
+
+
+def _prompt_text(text: str, provider: Optional[str]) -> str:
+    """The resume text as it goes into LLM prompts: compacted and within the token budget."""
+    if not settings.PROMPT_COMPACTION_ENABLED:
+        return without_page_breaks(text)
+    return compact_text(text, provider).text
+
+
+def _resolve_mode(mode: Optional[str]) -> str:
+    resolved = (mode or settings.EXTRACTION_MODE).lower().strip()
+    if resolved not in EXTRACTION_MODES:
+        raise ValueError(f"Unsupported extraction mode: {resolved}")
+    return resolved
+
+
+def _record_usage(stage: str, usage: dict) -> None:
+    """Accumulate token usage per stage so the extraction modes can be compared."""
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(key)
+        if isinstance(value, (int, float)):
+            metrics.incr(f"extraction.tokens.{stage}.{key}", value)
+
+#投机模式：分类和抽取同时发出，分类判定不是简历时丢弃抽取结果
+async def _speculative_extract_async(
+    text: str,
+    provider: Optional[str],
+    model: Optional[str],
+    validity: Optional[ValidityResult] = None,
+    refresh: bool = False,
+) -> tuple[ResumeStructured, dict]:
+    if _resume_check_snippet(text) is None:
+        raise NotResumeError("Input text does not look like a resume")
+
+    extraction = asyncio.ensure_future(
+        call_llm_async(
+            _build_prompt(text), provider=provider, model=model, refresh=refresh, validate=_parse_structured
+        )
+    )
+    try:
+        is_resume = await _looks_like_resume_async(text, provider=provider, model=model, refresh=refresh)
+    except BaseException:
+        extraction.cancel()
+        raise
+    await asyncio.to_thread(resume_classifier.record_verdict, validity, is_resume)
+    if not is_resume:
+        extraction.cancel()
+        metrics.incr("extraction.speculative.discarded")
+        raise NotResumeError("Input text does not look like a resume")
+
+    raw_output, usage = await extraction
+    _record_usage("extract", usage)
+    return _parse_structured(raw_output), usage
+
 #整合前面的函数来实现从原始文本到结构化简历的提取
 def extract_structured_resume(
     data: ExtractionInput,
     provider: Optional[str] = None,
     model: Optional[str] = None,
+    validity: Optional[ValidityResult] = None,
+    mode: Optional[str] = None,
+    refresh: bool = False,
 ) -> tuple[ResumeStructured, dict]:
     """
     Convert raw resume text into a validated ResumeStructured object.
+    ``validity`` is the local ResumeValidityChecker result for the same text; when it or the
+    trained local classifier is confident the LLM classification call is skipped.
+    ``mode`` selects two_call, single_call or speculative (defaults to settings.EXTRACTION_MODE).
+    This blocking variant has no concurrency of its own, so speculative runs as two_call;
+    use extract_structured_resume_async for overlapped calls.
+    ``refresh`` bypasses the LLM response cache and replaces its entries.
     """
+    mode = _resolve_mode(mode)
     if not data.text.strip():
         raise NotResumeError("Input text is empty")
 
-    if not _looks_like_resume(data.text, provider=provider, model=model):
+    started_at = time.perf_counter()
+    is_resume = _local_verdict(validity)
+    text = _prompt_text(data.text, provider)
+    if is_resume is None and mode == "single_call":
+        if _resume_check_snippet(text) is None:
+            raise NotResumeError("Input text does not look like a resume")
+        raw_output, usage = call_llm(
+            _build_combined_prompt(text), provider=provider, model=model, refresh=refresh, validate=_parse_combined
+        )
+        _record_usage("single_call", usage)
+        structured = _parse_combined(raw_output)
+        resume_classifier.record_verdict(validity, structured is not None)
+        if structured is None:
+            raise NotResumeError("Input text does not look like a resume")
+        metrics.observe("extraction.single_call", time.perf_counter() - started_at)
+        return structured, usage
+
+    if is_resume is None:
+        is_resume = _looks_like_resume(text, provider=provider, model=model, refresh=refresh)
+        resume_classifier.record_verdict(validity, is_resume)
+    if not is_resume:
         raise NotResumeError("Input text does not look like a resume")
 
-    prompt = _build_prompt(data.text)
-    raw_output, usage = call_llm(prompt, provider=provider, model=model)
-    parsed = _extract_json(raw_output)
+    prompt = _build_prompt(text)
+    raw_output, usage = call_llm(
+        prompt, provider=provider, model=model, refresh=refresh, validate=_parse_structured
+    )
+    _record_usage("extract", usage)
+    structured = _parse_structured(raw_output)
+    metrics.observe("extraction.two_call", time.perf_counter() - started_at)
+    return structured, usage
+
+
+async def extract_structured_resume_async(
+    data: ExtractionInput,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    validity: Optional[ValidityResult] = None,
+    mode: Optional[str] = None,
+    refresh: bool = False,
+) -> tuple[ResumeStructured, dict]:
+    """
+    Async variant of extract_structured_resume built on call_llm_async.
+    """
+    mode = _resolve_mode(mode)
+    if not data.text.strip():
+        raise NotResumeError("Input text is empty")
+
+    started_at = time.perf_counter()
+    is_resume = _local_verdict(validity)
+    # 压缩是纯 CPU 的文本处理，长文本要几十毫秒，不能卡住事件循环
+    text = await asyncio.to_thread(_prompt_text, data.text, provider)
+    if is_resume is None and mode == "single_call":
+        if _resume_check_snippet(text) is None:
+            raise NotResumeError("Input text does not look like a resume")
+        raw_output, usage = await call_llm_async(
+            _build_combined_prompt(text), provider=provider, model=model, refresh=refresh, validate=_parse_combined
+        )
+        _record_usage("single_call", usage)
+        structured = _parse_combined(raw_output)
+        await asyncio.to_thread(resume_classifier.record_verdict, validity, structured is not None)
+        if structured is None:
+            raise NotResumeError("Input text does not look like a resume")
+        metrics.observe("extraction.single_call", time.perf_counter() - started_at)
+        return structured, usage
+
+    if is_resume is None and mode == "speculative":
+        structured, usage = await _speculative_extract_async(text, provider, model, validity, refresh)
+        metrics.observe("extraction.speculative", time.perf_counter() - started_at)
+        return structured, usage
+
+    if is_resume is None:
+        is_resume = await _looks_like_resume_async(text, provider=provider, model=model, refresh=refresh)
+        await asyncio.to_thread(resume_classifier.record_verdict, validity, is_resume)
+    if not is_resume:
+        raise NotResumeError("Input text does not look like a resume")
+
+    prompt = _build_prompt(text)
+    raw_output, usage = await call_llm_async(
+        prompt, provider=provider, model=model, refresh=refresh, validate=_parse_structured
+    )
+    _record_usage("extract", usage)
+    structured = _parse_structured(raw_output)
+    metrics.observe("extraction.two_call", time.perf_counter() - started_at)
+    return structured, usage
+
+
+def _parse_structured(raw_output: str) -> ResumeStructured:
+    return _validate_structured(_extract_json(raw_output))
+
 
+def _validate_structured(parsed: dict) -> ResumeStructured:
     try:
-        return ResumeStructured.model_validate(parsed), usage
+        return ResumeStructured.model_validate(parsed)
     except ValidationError as exc:
         raise LLMParseError(
             f"LLM output does not match ResumeStructured schema: {exc}"
@@ -0,0 +1,293 @@
+"""
+Bulk parse jobs: spool uploads, queue them in storage.job_store and run
+upload conversion + structured extraction for each file on a pool of asyncio workers.
+
+Transient failures (LLM timeouts / 429 / 5xx, a busy or broken parse pool) are
+retried with exponential backoff up to JOB_MAX_ATTEMPTS; anything else fails the item.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+from schemas.models import ExtractionInput
+from services.extract_service import extract_structured_resume_async
+from services.upload_service import (
+    SpooledUpload,
+    UploadResult,
+    discard_spooled,
+    load_stored_result,
+    page_slots_wanted,
+    process_spooled_upload,
+    save_structured_result,
+    spool_existing_file,
+    stored_triage,
+)
+from storage import job_store
+from storage.job_store import JobItem, JobItemInput
+from utils import metrics
+from utils.errors import ExecutorBusyError, ExtractionLimitError, LLMError
+from utils.executors import cpu_executor, io_executor
+from utils.logger import get_logger
+
+logger = get_logger("job_service")
+
+_workers: list[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def adopt_input(job_id: str, position: int, ext: str, spooled: SpooledUpload) -> str:
+    """Move one spooled upload under JOB_DIR so the job survives a restart."""
+    job_dir = settings.JOB_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    path = job_dir / f"{position}{ext}"
+    if spooled.path is None:
+        path.write_bytes(spooled.content)
+    else:
+        os.replace(spooled.path, path)
+    return str(path)
+
+
+async def submit_job(job_id: str, mode: Optional[str], force: bool, items: list[JobItemInput]) -> None:
+    await io_executor.run(job_store.create_job, job_id, mode, force, items)
+    metrics.incr("jobs.submitted")
+    metrics.incr("jobs.items.submitted", len(items))
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def parse_job_input(ext: str, input_path: str, force: bool) -> UploadResult:
+    """Stage the job input as an upload and convert it on the parse pool."""
+    spooled = await io_executor.run(spool_existing_file, ext, Path(input_path))
+    try:
+        return await cpu_executor.run(
+            process_spooled_upload, ext, spooled, force, borrow_idle=page_slots_wanted(ext)
+        )
+    except ExtractionLimitError:
+        # 解析进程被终止，来不及删除自己的临时文件
+        await io_executor.run(discard_spooled, spooled)
+        raise
+
+
+class _LeaseLost(Exception):
+    """The item was taken over by another worker; stop without touching its row."""
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, LLMError):
+        return bool(exc.details.get("transient"))
+    return isinstance(exc, (ExecutorBusyError, BrokenProcessPool))
+
+
+async def _process_item(item: JobItem) -> None:
+    # 解析结果已入库的重试不再强制重新解析，直接命中内容哈希去重
+    force = item.force and item.resume_id is None
+
+    started = time.perf_counter()
+    result = await parse_job_input(item.ext, item.input_path, force)
+    parse_seconds = time.perf_counter() - started
+    metrics.observe("jobs.stage.parse", parse_seconds)
+    if not await io_executor.run(
+        job_store.record_parsed, item.id, result.resume_id, result.deduplicated, parse_seconds
+    ):
+        raise _LeaseLost()
+
+    extract_seconds = None
+    json_text = None
+    if result.deduplicated:
+        json_text = await io_executor.run(load_stored_result, result.resume_id)
+    if json_text is None:
+        started = time.perf_counter()
+        structured, _ = await extract_structured_resume_async(
+            ExtractionInput(text=result.text, resume_id=result.resume_id),
+            validity=result.validity,
+            mode=item.mode,
+            refresh=item.force,
+        )
+        await io_executor.run(
+            save_structured_result, result.resume_id, structured.model_dump_json(ensure_ascii=False)
+        )
+        extract_seconds = time.perf_counter() - started
+        metrics.observe("jobs.stage.extract", extract_seconds)
+
+    if not await io_executor.run(job_store.complete_item, item.id, extract_seconds):
+        raise _LeaseLost()
+
+
+async def _renew_lease(item: JobItem) -> None:
+    # 抽取可能比租约还长；定期续约，避免别的 worker 把仍在处理的条目再领走一次
+    interval = settings.JOB_LEASE_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            renewed = await io_executor.run(job_store.renew_lease, item.id)
+        except Exception as exc:
+            logger.warning("[JOB %s] %s lease renewal failed: %s", item.job_id, item.filename, exc)
+            continue
+        if not renewed:
+            logger.warning("[JOB %s] %s lease was taken over by another worker", item.job_id, item.filename)
+            metrics.incr("jobs.items.lease_lost")
+            return
+
+
+async def _process_leased(item: JobItem) -> None:
+    heartbeat = asyncio.create_task(_renew_lease(item))
+    try:
+        await _process_item(item)
+    finally:
+        heartbeat.cancel()
+
+
+async def _run_item(item: JobItem) -> None:
+    try:
+        await _process_leased(item)
+    except _LeaseLost:
+        _log_lease_lost(item)
+        return
+    except asyncio.CancelledError:
+        # 放回队列要等 SQLite 写完；shield 让再次取消也打断不了这次写入
+        await asyncio.shield(asyncio.to_thread(job_store.release_item, item.id))
+        raise
+    except Exception as exc:
+        if _is_transient(exc) and item.attempts < settings.JOB_MAX_ATTEMPTS:
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
+            logger.warning(
+                "[JOB %s] %s attempt %d failed, retrying in %.1fs: %s",
+                item.job_id, item.filename, item.attempts, delay, exc,
+            )
+            if not await io_executor.run(job_store.retry_item, item.id, str(exc), delay):
+                _log_lease_lost(item)
+                return
+            metrics.incr("jobs.items.retried")
+            return
+        logger.error("[JOB %s] %s failed: %s", item.job_id, item.filename, exc)
+        if not await io_executor.run(job_store.fail_item, item.id, str(exc)):
+            _log_lease_lost(item)
+            return
+        metrics.incr("jobs.items.failed")
+    else:
+        metrics.incr("jobs.items.succeeded")
+    _discard_input(item.input_path)
+
+
+def _log_lease_lost(item: JobItem) -> None:
+    # 输入文件归新的持有者处理，这里不删
+    logger.warning("[JOB %s] %s was taken over by another worker; dropping this attempt", item.job_id, item.filename)
+    metrics.incr("jobs.items.superseded")
+
+
+def _discard_input(input_path: Optional[str]) -> None:
+    if not input_path:
+        return
+    path = Path(input_path)
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()  # 整个任务的文件都处理完后目录为空才会被删掉
+    except OSError:
+        pass
+
+
+async def _worker_loop(index: int) -> None:
+    while True:
+        try:
+            item = await io_executor.run(job_store.claim_next)
+        except Exception as exc:
+            logger.error("[JOB worker %d] claim failed: %s", index, exc)
+            item = None
+
+        if item is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_item(item)
+
+
+async def start_workers() -> None:
+    """Requeue work orphaned by a previous run and start JOB_WORKERS queue consumers."""
+    global _wakeup
+    if _workers or settings.JOB_WORKERS <= 0:
+        return
+    reclaimed = await io_executor.run(job_store.reclaim_orphans)
+    if reclaimed:
+        logger.info("Requeued %d job items left running by a stopped process", reclaimed)
+    _wakeup = asyncio.Event()
+    for index in range(settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(index)))
+    logger.info("Started %d job workers", settings.JOB_WORKERS)
+
+
+async def stop_workers() -> None:
+    workers = list(_workers)
+    _workers.clear()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+def job_status(job_id: str) -> Optional[dict]:
+    job = job_store.get_job(job_id)
+    if job is None:
+        return None
+    counts = job_store.status_counts(job_id)
+    if counts["queued"] + counts["running"] == 0:
+        status = "completed"
+    elif counts["running"] or counts["succeeded"] or counts["failed"]:
+        status = "running"
+    else:
+        status = "queued"
+    return {
+        "job_id": job.id,
+        "status": status,
+        "mode": job.mode,
+        "force": job.force,
+        "total": job.total,
+        "created_at": job.created_at,
+        "counts": counts,
+        "stages": job_store.stage_stats(job_id),
+    }
+
+
+def job_results(job_id: str, offset: int, limit: int, status: Optional[str] = None) -> list[dict]:
+    results = []
+    for item in job_store.list_items(job_id, offset, limit, status):
+        entry = {
+            "position": item.position,
+            "filename": item.filename,
+            "status": item.status,
+            "attempts": item.attempts,
+            "resume_id": item.resume_id,
+            "deduplicated": item.deduplicated,
+            "error": item.error,
+        }
+        if item.status == "succeeded" and item.resume_id:
+            json_text = load_stored_result(item.resume_id)
+            entry["result"] = json.loads(json_text) if json_text else None
+            entry["pdf_triage"] = stored_triage(item.resume_id)
+        results.append(entry)
+    return results
+
+
+def _queue_stats() -> dict:
+    try:
+        counts = job_store.status_counts()
+    except Exception:
+        counts = None
+    return {"workers": len(_workers), "items": counts}
+
+
+metrics.register_collector("jobs", _queue_stats)
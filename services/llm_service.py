@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import socket
+import threading
+from urllib.parse import urlsplit
+
+import certifi
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 from config import settings
+from storage import llm_cache
+from utils import metrics
 from utils.errors import LLMError
+from utils.logger import get_logger
+
+logger = get_logger("llm_service")
 
 
 SUPPORTED_PROVIDERS = {"dashscope", "gemini", "openai", "ollama"}
@@ -19,17 +33,175 @@ CIPHERS = (
     "DHE-RSA-AES128-GCM-SHA256:DHE-RSA-AES256-GCM-SHA384"
 )
 
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+def _shared_ssl_context():
+    """
+    Build the cipher-restricted SSL context once and share it across all pools.
+    create_urllib3_context leaves the CA store empty (requests loads certifi per
+    connection, httpx uses a passed-in context as is), so certifi is loaded here.
+    """
+    global _ssl_context
+    with _ssl_context_lock:
+        if _ssl_context is None:
+            context = requests.packages.urllib3.util.ssl_.create_urllib3_context(ciphers=CIPHERS)
+            context.load_verify_locations(certifi.where())
+            _ssl_context = context
+        return _ssl_context
+
+
 class SSLAdapter(HTTPAdapter):
     def init_poolmanager(self, *args, **kwargs):
-        context = requests.packages.urllib3.util.ssl_.create_urllib3_context(ciphers=CIPHERS)
-        kwargs["ssl_context"] = context
+        kwargs["ssl_context"] = _shared_ssl_context()
         return super().init_poolmanager(*args, **kwargs)
 
     def proxy_manager_for(self, *args, **kwargs):
-        context = requests.packages.urllib3.util.ssl_.create_urllib3_context(ciphers=CIPHERS)
-        kwargs["ssl_context"] = context
+        kwargs["ssl_context"] = _shared_ssl_context()
         return super().proxy_manager_for(*args, **kwargs)
 
+
+# ---------------------------------------------------------------------------
+# Pooled sessions
+# 每个 provider 一个长期存活的 requests.Session，连接池在多次调用（分类 + 抽取）之间复用，
+# 避免每次调用都重新做 TCP + TLS 握手。
+# ---------------------------------------------------------------------------
+
+_PROVIDER_LABELS = {"dashscope": "Dashscope", "gemini": "Gemini", "openai": "OpenAI", "ollama": "Ollama"}
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_connection_stats: dict[str, dict[str, int]] = {}
+_connection_stats_lock = threading.Lock()
+
+
+def _count_connection_event(provider: str, event: str) -> None:
+    with _connection_stats_lock:
+        stats = _connection_stats.setdefault(provider, {"requests": 0, "new_connections": 0})
+        stats[event] += 1
+
+
+def _counting_pool_classes(provider: str) -> dict:
+    """Connection pool classes that record requests and newly opened connections for ``provider``."""
+
+    class _Counting:
+        def _new_conn(self):
+            _count_connection_event(provider, "new_connections")
+            return super()._new_conn()
+
+        def _make_request(self, *args, **kwargs):
+            _count_connection_event(provider, "requests")
+            return super()._make_request(*args, **kwargs)
+
+    return {
+        "http": type("CountingHTTPConnectionPool", (_Counting, HTTPConnectionPool), {}),
+        "https": type("CountingHTTPSConnectionPool", (_Counting, HTTPSConnectionPool), {}),
+    }
+
+
+class _PooledAdapter(SSLAdapter):
+    """SSLAdapter with per-provider connection accounting and optional TCP keep-alive."""
+
+    def __init__(self, provider: str, **kwargs):
+        self._provider = provider
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if settings.LLM_TCP_KEEPALIVE:
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._provider)
+
+
+def _get_session(provider: str) -> requests.Session:
+    """Return the long-lived session for ``provider``; safe to share between threads."""
+    session = _sessions.get(provider)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = _PooledAdapter(
+                provider,
+                pool_connections=settings.LLM_POOL_CONNECTIONS,
+                pool_maxsize=settings.LLM_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def connection_stats() -> dict:
+    """Requests, new connections and reused connections per provider (sync client)."""
+    with _connection_stats_lock:
+        return {
+            provider: {
+                **stats,
+                "reused_connections": max(0, stats["requests"] - stats["new_connections"]),
+            }
+            for provider, stats in _connection_stats.items()
+        }
+
+
+metrics.register_collector("llm_connections", connection_stats)
+
+
+def _provider_origin(provider: str) -> str:
+    urls = {
+        "dashscope": settings.LLM_BASE_URL,
+        "gemini": settings.GEMINI_API_URL_TEMPLATE,
+        "openai": settings.OPENAI_API_URL,
+        "ollama": settings.OLLAMA_API_URL,
+    }
+    parts = urlsplit(urls[provider])
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def preconnect_sessions(providers: Optional[list[str]] = None) -> None:
+    """Open one pooled connection per provider so the first real call skips the handshakes."""
+    for provider in providers or settings.LLM_PRECONNECT_PROVIDERS:
+        try:
+            _get_session(provider).head(
+                _provider_origin(provider),
+                timeout=settings.LLM_PRECONNECT_TIMEOUT_SECONDS,
+            )
+        except (requests.RequestException, KeyError) as exc:
+            logger.warning("Pre-connect to %s failed: %s", provider, exc)
+
+
+def _is_transient_status(status_code: int) -> bool:
+    """Rate limits and server-side errors are worth retrying; other 4xx are not."""
+    return status_code in (408, 429) or status_code >= 500
+
+
+def _post_json(provider: str, url: str, headers: dict, payload: dict, timeout: int) -> dict:
+    label = _PROVIDER_LABELS[provider]
+    try:
+        response = _get_session(provider).post(url, headers=headers, json=payload, timeout=timeout)
+    except requests.RequestException as exc:
+        raise LLMError(f"{label} request failed: {exc}", details={"transient": True}) from exc
+
+    if response.status_code != 200:
+        raise LLMError(
+            f"{label} API error: {response.status_code} - {response.text}",
+            details={"status_code": response.status_code, "transient": _is_transient_status(response.status_code)},
+        )
+
+    return response.json()
+
 #把传入的 provider（或默认配置）规范化成小写无空格的值，并校验它必须在系统支持的 provider 列表里，否则直接报错。
 def _resolve_provider(provider: Optional[str]) -> str:
     resolved = (provider or settings.DEFAULT_LLM_PROVIDER).lower().strip()
@@ -53,8 +225,8 @@ def _resolve_model(provider: str, model: Optional[str]) -> str:
 
     raise LLMError(f"Unsupported provider: {provider}")
 
-#调用 Gemini 模型
-def _call_gemini(prompt: str, model: str) -> tuple[str, dict]:
+#构造 Gemini 请求（url, headers, payload），同步和异步调用共用
+def _gemini_request(prompt: str, model: str) -> tuple[str, dict, dict]:
     if not settings.GEMINI_API_KEY:
         raise LLMError("Missing GEMINI_API_KEY")
 
@@ -68,29 +240,15 @@ def _call_gemini(prompt: str, model: str) -> tuple[str, dict]:
             }
         ],
         "generationConfig": {
-            "temperature": 0.1,
+            "temperature": settings.LLM_TEMPERATURE,
             "maxOutputTokens": 2048,
             "responseMimeType": "application/json",
         },
     }
+    return url, {"Content-Type": "application/json"}, payload
 
-    try:
-        session = requests.Session()
-        session.mount("https://", SSLAdapter())
-        response = session.post(
-            url,
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=settings.LLM_TIMEOUT_SECONDS,
-        )
-    except requests.RequestException as exc:
-        raise LLMError(f"Gemini request failed: {exc}") from exc
-
-    if response.status_code != 200:
-        raise LLMError(f"Gemini API error: {response.status_code} - {response.text}")
-
-    data = response.json()
 
+def _parse_gemini(data: dict) -> tuple[str, dict]:
     try:
         content = data["candidates"][0]["content"]["parts"][0]["text"]
         # Gemini API v1beta doesn't consistently return usage stats in this format
@@ -99,8 +257,14 @@ def _call_gemini(prompt: str, model: str) -> tuple[str, dict]:
     except (KeyError, IndexError, TypeError) as exc:
         raise LLMError(f"Unexpected Gemini response structure: {exc}") from exc
 
-#调用 OpenAI 模型
-def _call_openai(prompt: str, model: str) -> tuple[str, dict]:
+#调用 Gemini 模型
+def _call_gemini(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _gemini_request(prompt, model)
+    data = _post_json("gemini", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_gemini(data)
+
+#构造 OpenAI 请求
+def _openai_request(prompt: str, model: str) -> tuple[str, dict, dict]:
     if not settings.OPENAI_API_KEY:
         raise LLMError("Missing OPENAI_API_KEY")
 
@@ -114,26 +278,12 @@ def _call_openai(prompt: str, model: str) -> tuple[str, dict]:
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.1,
+        "temperature": settings.LLM_TEMPERATURE,
     }
+    return settings.OPENAI_API_URL, headers, payload
 
-    try:
-        session = requests.Session()
-        session.mount("https://", SSLAdapter())
-        response = session.post(
-            settings.OPENAI_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=settings.LLM_TIMEOUT_SECONDS,
-        )
-    except requests.RequestException as exc:
-        raise LLMError(f"OpenAI request failed: {exc}") from exc
-
-    if response.status_code != 200:
-        raise LLMError(f"OpenAI API error: {response.status_code} - {response.text}")
-
-    data = response.json()
 
+def _parse_openai(data: dict) -> tuple[str, dict]:
     try:
         content = data["choices"][0]["message"]["content"]
         usage = data.get("usage", {})
@@ -141,29 +291,23 @@ def _call_openai(prompt: str, model: str) -> tuple[str, dict]:
     except (KeyError, IndexError, TypeError) as exc:
         raise LLMError(f"Unexpected OpenAI response structure: {exc}") from exc
 
-#调用 Ollama 模型
-def _call_ollama(prompt: str, model: str) -> tuple[str, dict]:
+#调用 OpenAI 模型
+def _call_openai(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _openai_request(prompt, model)
+    data = _post_json("openai", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_openai(data)
+
+#构造 Ollama 请求
+def _ollama_request(prompt: str, model: str) -> tuple[str, dict, dict]:
     payload = {
         "model": model,
         "prompt": prompt,
         "stream": False,
     }
+    return settings.OLLAMA_API_URL, {"Content-Type": "application/json"}, payload
 
-    try:
-        response = requests.post(
-            settings.OLLAMA_API_URL,
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=settings.OLLAMA_TIMEOUT_SECONDS,
-        )
-    except requests.RequestException as exc:
-        raise LLMError(f"Ollama request failed: {exc}") from exc
-
-    if response.status_code != 200:
-        raise LLMError(f"Ollama API error: {response.status_code} - {response.text}")
-
-    data = response.json()
 
+def _parse_ollama(data: dict) -> tuple[str, dict]:
     try:
         content = data["response"]
         # Ollama doesn't provide token usage in the same way
@@ -172,9 +316,14 @@ def _call_ollama(prompt: str, model: str) -> tuple[str, dict]:
     except KeyError as exc:
         raise LLMError(f"Unexpected Ollama response structure: {exc}") from exc
 
-#调用默认模型
-def _call_dashscope(prompt: str, model: str) -> tuple[str, dict]:
-    """Call Aliyun Dashscope API"""
+#调用 Ollama 模型
+def _call_ollama(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _ollama_request(prompt, model)
+    data = _post_json("ollama", url, headers, payload, settings.OLLAMA_TIMEOUT_SECONDS)
+    return _parse_ollama(data)
+
+#构造默认模型（Dashscope）请求
+def _dashscope_request(prompt: str, model: str) -> tuple[str, dict, dict]:
     if not settings.LLM_API_KEY:
         raise LLMError("Missing LLM_API_KEY")
 
@@ -188,26 +337,12 @@ def _call_dashscope(prompt: str, model: str) -> tuple[str, dict]:
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.1,
+        "temperature": settings.LLM_TEMPERATURE,
     }
+    return f"{settings.LLM_BASE_URL}/chat/completions", headers, payload
 
-    try:
-        session = requests.Session()
-        session.mount("https://", SSLAdapter())
-        response = session.post(
-            f"{settings.LLM_BASE_URL}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=settings.LLM_TIMEOUT_SECONDS,
-        )
-    except requests.RequestException as exc:
-        raise LLMError(f"Dashscope request failed: {exc}") from exc
-
-    if response.status_code != 200:
-        raise LLMError(f"Dashscope API error: {response.status_code} - {response.text}")
-
-    data = response.json()
 
+def _parse_dashscope(data: dict) -> tuple[str, dict]:
     try:
         content = data["choices"][0]["message"]["content"]
         usage = data.get("usage", {})
@@ -215,15 +350,66 @@ def _call_dashscope(prompt: str, model: str) -> tuple[str, dict]:
     except (KeyError, IndexError, TypeError) as exc:
         raise LLMError(f"Unexpected Dashscope response structure: {exc}") from exc
 
+#调用默认模型
+def _call_dashscope(prompt: str, model: str) -> tuple[str, dict]:
+    """Call Aliyun Dashscope API"""
+    url, headers, payload = _dashscope_request(prompt, model)
+    data = _post_json("dashscope", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_dashscope(data)
+
 #统一的大模型调用入口：根据传入/默认的 provider 和 model 选择对应厂商的请求函数
-def call_llm(prompt: str, provider: Optional[str] = None, model: Optional[str] = None) -> tuple[str, dict]:
+def call_llm(
+    prompt: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    *,
+    use_cache: bool = True,
+    refresh: bool = False,
+    validate: Optional[Callable[[str], Any]] = None,
+) -> tuple[str, dict]:
     """
     Unified LLM entrypoint.
     This function routes the request to different providers using one interface.
+    Identical (provider, model, prompt, temperature) requests are answered from the
+    response cache; a cached answer reports usage as {"cached": True}.
+
+    ``validate`` is called with the response text and should raise when it is unusable
+    (bad JSON, schema mismatch); only responses it accepts are cached, and a cached one
+    it rejects is dropped and requested again. ``refresh`` skips the cache lookup and
+    replaces the entry with the new answer.
     """
     resolved_provider = _resolve_provider(provider)
     resolved_model = _resolve_model(resolved_provider, model)
 
+    use_cache = use_cache and settings.LLM_CACHE_ENABLED
+    if use_cache and not refresh:
+        cached = llm_cache.get(resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE)
+        if cached is not None and _cached_is_valid(cached[0], validate):
+            return cached[0], {"cached": True}
+        if cached is not None:
+            llm_cache.invalidate(resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE)
+
+    content, usage = _call_provider(resolved_provider, prompt, resolved_model)
+    if validate is not None:
+        validate(content)
+    if use_cache:
+        llm_cache.put(resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE, content, usage)
+    return content, usage
+
+
+def _cached_is_valid(content: str, validate: Optional[Callable[[str], Any]]) -> bool:
+    # 缓存里的回答在写入时已经校验过；这里再校验一次，是为了 schema 变更后旧条目自动失效
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except Exception as exc:
+        logger.warning("Dropping cached LLM response that fails validation: %s", exc)
+        return False
+    return True
+
+
+def _call_provider(resolved_provider: str, prompt: str, resolved_model: str) -> tuple[str, dict]:
     if resolved_provider == "dashscope":
         return _call_dashscope(prompt, resolved_model)
     if resolved_provider == "gemini":
@@ -233,4 +419,158 @@ def call_llm(prompt: str, provider: Optional[str] = None, model: Optional[str] =
     if resolved_provider == "ollama":
         return _call_ollama(prompt, resolved_model)
 
-    raise LLMError(f"Unsupported provider: {resolved_provider}")
\ No newline at end of file
+    raise LLMError(f"Unsupported provider: {resolved_provider}")
+
+# ---------------------------------------------------------------------------
+# Async client
+# 所有 provider 共用一个 httpx.AsyncClient（长连接池），每个 provider 有独立的并发上限。
+# 调用方 task 被取消时，CancelledError 会直接穿透 httpx，连接被关闭、信号量被释放。
+# ---------------------------------------------------------------------------
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_lock = threading.Lock()
+_provider_semaphores: dict[str, asyncio.Semaphore] = {}
+_global_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(
+                verify=_shared_ssl_context(),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_ASYNC_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+                ),
+            )
+        return _async_client
+
+
+async def preconnect_async_client(providers: Optional[list[str]] = None) -> None:
+    """Async counterpart of preconnect_sessions for the shared httpx client."""
+    for provider in providers or settings.LLM_PRECONNECT_PROVIDERS:
+        try:
+            await _get_async_client().head(
+                _provider_origin(provider),
+                timeout=settings.LLM_PRECONNECT_TIMEOUT_SECONDS,
+            )
+        except (httpx.HTTPError, KeyError) as exc:
+            logger.warning("Async pre-connect to %s failed: %s", provider, exc)
+
+
+async def close_async_client() -> None:
+    global _async_client
+    with _async_client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+
+def _provider_semaphore(provider: str) -> asyncio.Semaphore:
+    semaphore = _provider_semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.LLM_PROVIDER_CONCURRENCY[provider])
+        _provider_semaphores[provider] = semaphore
+    return semaphore
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """Process-wide cap on in-flight LLM requests across all providers."""
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _global_semaphore
+
+
+async def _post_json_async(provider: str, url: str, headers: dict, payload: dict, timeout: int) -> dict:
+    label = _PROVIDER_LABELS[provider]
+    try:
+        response = await _get_async_client().post(url, headers=headers, json=payload, timeout=timeout)
+    except httpx.HTTPError as exc:
+        raise LLMError(f"{label} request failed: {exc}", details={"transient": True}) from exc
+
+    if response.status_code != 200:
+        raise LLMError(
+            f"{label} API error: {response.status_code} - {response.text}",
+            details={"status_code": response.status_code, "transient": _is_transient_status(response.status_code)},
+        )
+
+    return response.json()
+
+
+async def _call_gemini_async(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _gemini_request(prompt, model)
+    data = await _post_json_async("gemini", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_gemini(data)
+
+
+async def _call_openai_async(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _openai_request(prompt, model)
+    data = await _post_json_async("openai", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_openai(data)
+
+
+async def _call_ollama_async(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _ollama_request(prompt, model)
+    data = await _post_json_async("ollama", url, headers, payload, settings.OLLAMA_TIMEOUT_SECONDS)
+    return _parse_ollama(data)
+
+
+async def _call_dashscope_async(prompt: str, model: str) -> tuple[str, dict]:
+    url, headers, payload = _dashscope_request(prompt, model)
+    data = await _post_json_async("dashscope", url, headers, payload, settings.LLM_TIMEOUT_SECONDS)
+    return _parse_dashscope(data)
+
+
+_ASYNC_CALLERS: dict[str, Callable[[str, str], Awaitable[tuple[str, dict]]]] = {
+    "dashscope": _call_dashscope_async,
+    "gemini": _call_gemini_async,
+    "openai": _call_openai_async,
+    "ollama": _call_ollama_async,
+}
+
+
+#call_llm 的异步版本：不占用线程，受 provider 并发上限约束
+async def call_llm_async(
+    prompt: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    *,
+    use_cache: bool = True,
+    refresh: bool = False,
+    validate: Optional[Callable[[str], Any]] = None,
+) -> tuple[str, dict]:
+    """
+    Async counterpart of call_llm (same ``refresh`` / ``validate`` semantics).
+    Waits for a slot under the provider's concurrency limit and the global
+    LLM_MAX_CONCURRENCY limit, then sends the request over the shared keep-alive
+    connection pool.
+    """
+    resolved_provider = _resolve_provider(provider)
+    resolved_model = _resolve_model(resolved_provider, model)
+
+    use_cache = use_cache and settings.LLM_CACHE_ENABLED
+    if use_cache and not refresh:
+        cached = await asyncio.to_thread(
+            llm_cache.get, resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE
+        )
+        if cached is not None and _cached_is_valid(cached[0], validate):
+            return cached[0], {"cached": True}
+        if cached is not None:
+            await asyncio.to_thread(
+                llm_cache.invalidate, resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE
+            )
+
+    # 先占 provider 名额再占全局名额，避免等某个慢 provider 时占住其他 provider 的全局名额
+    async with _provider_semaphore(resolved_provider), _llm_semaphore():
+        content, usage = await _ASYNC_CALLERS[resolved_provider](prompt, resolved_model)
+
+    if validate is not None:
+        validate(content)
+    if use_cache:
+        await asyncio.to_thread(
+            llm_cache.put, resolved_provider, resolved_model, prompt, settings.LLM_TEMPERATURE, content, usage
+        )
+    return content, usage
@@ -1,12 +1,22 @@
+import math
+import time
+from dataclasses import asdict
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
 
 from pypdf import PdfReader
 from pypdf.errors import FileNotDecryptedError, PdfReadError
 
-from services.document_validate import validate_file_size
-from services.text_clean_service import finalize_extracted_plaintext
+from config import settings
+from services.document_validate import validate_file_size, validate_size
+from services.pdf_triage import TRIAGE_TAIL_BYTES, PdfTriage, inspect_reader, tail_is_truncated
+from services.text_clean_service import PAGE_BREAK, ExtractedText, char_budget_reached, finalize_extracted
 from utils.constants import MULTICOLUMN_AVG_LINE_LEN, MULTICOLUMN_MIN_LINES
 from utils.errors import CorruptedPDFError, EncryptedPDFError, PDFParseError
+from utils import metrics
+from utils.executors import get_page_pool, granted_page_workers, reset_page_pool
 from utils.logger import get_logger
 
 logger = get_logger("pdf_to_txt")
@@ -19,61 +29,291 @@ def _looks_multicolumn(text: str) -> bool:
     return (sum(len(line) for line in lines) / len(lines)) < MULTICOLUMN_AVG_LINE_LEN
 
 
-def extract_raw_text(pdf_path: Path) -> str:
-    # Note: standard extract_text can scramble multi-column layouts; layout-mode fallback is
-    # applied automatically when the heuristic detects suspiciously short average line lengths.
+# 既可以是磁盘路径，也可以是内存中的字节 / memoryview / 文件对象
+PdfSource = Union[Path, bytes, bytearray, memoryview, BinaryIO]
+
+
+def _open_reader(source: PdfSource) -> PdfReader:
+    if isinstance(source, Path):
+        return PdfReader(str(source))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO over a bytes object shares its buffer instead of copying it
+        return PdfReader(BytesIO(source))
+    source.seek(0)
+    return PdfReader(source)
+
+
+def _source_name(source: PdfSource, name: Optional[str]) -> str:
+    if name:
+        return name
+    return source.name if isinstance(source, Path) else "<memory>"
+
+
+def _read_tail(source: PdfSource) -> bytes:
+    if isinstance(source, Path):
+        with open(source, "rb") as fh:
+            fh.seek(0, 2)
+            fh.seek(max(0, fh.tell() - TRIAGE_TAIL_BYTES))
+            return fh.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[-TRIAGE_TAIL_BYTES:])
+    source.seek(0, 2)
+    source.seek(max(0, source.tell() - TRIAGE_TAIL_BYTES))
+    return source.read()
+
+
+def _triage(source: PdfSource, pdf_name: str) -> tuple[Optional[PdfReader], PdfTriage]:
+    """
+    Open the PDF behind the pre-flight triage of services.pdf_triage, recording the
+    verdict, and reject truncated / encrypted / empty / image-only files right away.
+    """
+    started = time.perf_counter()
+    try:
+        missing_eof = tail_is_truncated(_read_tail(source))
+        try:
+            reader = _open_reader(source)
+            triage = inspect_reader(reader, settings.PDF_TRIAGE_SAMPLE_PAGES)
+        except MemoryError:
+            raise
+        except Exception:
+            # 没有 %%EOF 且 pypdf 也打不开，才算上传中断；只缺标记的文件照常解析
+            if not missing_eof:
+                raise
+            reader, triage = None, PdfTriage("truncated")
+        triage.missing_eof = missing_eof
+    finally:
+        metrics.observe("pdf.triage", time.perf_counter() - started)
+    metrics.incr(f"pdf.triage.{triage.verdict}")
+    if missing_eof and triage.verdict != "truncated":
+        metrics.incr("pdf.triage.missing_eof")
+        logger.warning("No %%%%EOF near the end of %s, but it opens; parsing anyway", pdf_name)
+
+    error = _TRIAGE_REJECTIONS.get(triage.verdict)
+    if error is None:
+        return reader, triage
+    error_type, message = error
+    logger.warning(
+        "PDF triage rejected %s: %s (pages=%d, sampled=%d)",
+        pdf_name, triage.verdict, triage.pages, triage.sampled_pages,
+    )
+    raise error_type(f"{message}：{pdf_name}", details={"triage": triage.verdict})
+
+
+_TRIAGE_REJECTIONS = {
+    "truncated": (CorruptedPDFError, "PDF 文件不完整（缺少文件结尾标记，可能上传中断）"),
+    "encrypted": (EncryptedPDFError, "PDF 已加密，无法解析"),
+    "no_pages": (PDFParseError, "PDF 不包含任何页面"),
+    "image_only": (PDFParseError, "PDF 不包含可提取的文本（疑似图片 PDF）"),
+}
+
+
+def _page_text(page, page_number: int, pdf_name: str) -> tuple[str, bool]:
+    """
+    Plain extraction, redone in layout mode only when this page looks multi-column.
+    Returns the page text and whether the layout fallback ran.
+    """
+    text = page.extract_text() or ""
+    if not _looks_multicolumn(text):
+        return text, False
+
+    metrics.incr("pdf.layout_fallback.pages")
+    started = time.perf_counter()
+    try:
+        layout_text = page.extract_text(extraction_mode="layout") or ""
+    except Exception as exc:
+        logger.warning(
+            "Layout-mode fallback failed for %s page %d — %s", pdf_name, page_number, exc
+        )
+        return text, True
+    finally:
+        metrics.observe("pdf.layout_fallback", time.perf_counter() - started)
+
+    if len(layout_text) > len(text):
+        metrics.incr("pdf.layout_fallback.adopted")
+        return layout_text, True
+    return text, True
+
+
+def _extract_page_range(
+    source: Union[str, bytes], start: int, stop: int, pdf_name: str
+) -> tuple[list[tuple[str, bool]], dict]:
+    """Runs in a page-pool worker: extract pages [start, stop) and ship its metrics back."""
+    reader = PdfReader(source if isinstance(source, str) else BytesIO(source))
+    pages = [_page_text(reader.pages[i], i + 1, pdf_name) for i in range(start, stop)]
+    return pages, metrics.drain()
+
+
+def _page_pool_source(source: PdfSource) -> Union[str, bytes]:
+    """What the page workers re-open the document from: its path, or its bytes."""
+    if isinstance(source, Path):
+        return str(source)
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def _extract_pages(
+    reader: PdfReader, source: PdfSource, pdf_name: str, page_limit: int
+) -> Iterator[tuple[str, bool]]:
+    """
+    Yield the first ``page_limit`` pages in order. Documents with at least
+    PDF_PARALLEL_PAGE_THRESHOLD pages are split into contiguous ranges when the parse
+    task borrowed idle cpu slots: this process extracts the first range on its open
+    reader while one page process per borrowed slot handles the rest.
+    Closing the generator early cancels ranges that have not started yet.
+    """
+    workers = granted_page_workers()
+    if workers < 1 or page_limit < settings.PDF_PARALLEL_PAGE_THRESHOLD:
+        for i in range(page_limit):
+            yield _page_text(reader.pages[i], i + 1, pdf_name)
+        return
+
+    chunk = math.ceil(page_limit / (workers + 1))
+    ranges = [(start, min(start + chunk, page_limit)) for start in range(0, page_limit, chunk)]
+    try:
+        pool = get_page_pool()
+        payload = _page_pool_source(source)
+        futures = [
+            pool.submit(_extract_page_range, payload, start, stop, pdf_name) for start, stop in ranges[1:]
+        ]
+    except (BrokenProcessPool, RuntimeError, OSError) as exc:
+        logger.warning("PDF page pool unavailable, extracting %s sequentially — %s", pdf_name, exc)
+        reset_page_pool()
+        futures = []
+        ranges = [(0, page_limit)]
+
+    if futures:
+        metrics.incr("pdf.parallel.documents")
+    started = time.perf_counter()
     try:
-        reader = PdfReader(str(pdf_path))
+        for i in range(*ranges[0]):
+            yield _page_text(reader.pages[i], i + 1, pdf_name)
+        done = ranges[0][1]
+        for future in futures:
+            try:
+                range_pages, delta = future.result()
+            except BrokenProcessPool as exc:
+                logger.warning(
+                    "PDF page pool broke while extracting %s, finishing sequentially — %s", pdf_name, exc
+                )
+                reset_page_pool()
+                break
+            metrics.merge(delta)
+            done += len(range_pages)
+            yield from range_pages
+        for i in range(done, page_limit):
+            yield _page_text(reader.pages[i], i + 1, pdf_name)
+    finally:
+        for future in futures:
+            future.cancel()
+        if futures:
+            metrics.observe("pdf.parallel", time.perf_counter() - started)
+
+
+def _extract_raw(source: PdfSource, name: Optional[str] = None) -> tuple[str, bool, Optional[PdfTriage]]:
+    """
+    Raw text of the PDF, whether the PDF_MAX_PAGES / EXTRACT_MAX_CHARS budget cut it
+    short, and the triage result (None with PDF_TRIAGE_ENABLED off). Pages past the
+    budget are never extracted.
+    """
+    # Note: standard extract_text can scramble multi-column layouts. Each page is checked on
+    # its own; only pages with suspiciously short average line lengths are re-extracted in
+    # layout mode, on the same reader.
+    pdf_name = _source_name(source, name)
+    try:
+        triage = None
+        if settings.PDF_TRIAGE_ENABLED:
+            reader, triage = _triage(source, pdf_name)
+        else:
+            reader = _open_reader(source)
         if getattr(reader, "is_encrypted", False):
             raise PDFParseError("PDF 已加密，无法解析")
+        page_count = len(reader.pages)
+        page_limit = page_count
+        if settings.PDF_MAX_PAGES > 0:
+            page_limit = min(page_count, settings.PDF_MAX_PAGES)
+        truncated = page_limit < page_count
+
         parts = []
-        for page in reader.pages:
-            text = page.extract_text() or ""
-            if text:
-                parts.append(text)
-        text = "\n".join(parts)
+        fallback_pages = []
+        extracted_chars = 0
+        pages_read = 0
+        pages = _extract_pages(reader, source, pdf_name, page_limit)
+        try:
+            for page_number, (text, used_fallback) in enumerate(pages, start=1):
+                pages_read = page_number
+                if used_fallback:
+                    fallback_pages.append(page_number)
+                if text:
+                    parts.append(text)
+                    extracted_chars += len(text)
+                if page_number < page_limit and char_budget_reached(extracted_chars):
+                    truncated = True
+                    break
+        finally:
+            pages.close()
+        text = PAGE_BREAK.join(parts)
+        metrics.incr("pdf.pages", pages_read)
     except FileNotDecryptedError as exc:
-        logger.error("Encrypted PDF, skipping: %s", pdf_path.name)
-        raise EncryptedPDFError(f"PDF is encrypted: {pdf_path.name}") from exc
+        logger.error("Encrypted PDF, skipping: %s", pdf_name)
+        raise EncryptedPDFError(f"PDF is encrypted: {pdf_name}") from exc
     except PdfReadError as exc:
-        logger.error("Corrupted PDF, skipping: %s — %s", pdf_path.name, exc)
-        raise CorruptedPDFError(f"PDF is corrupted: {pdf_path.name}") from exc
-    except PDFParseError:
+        logger.error("Corrupted PDF, skipping: %s — %s", pdf_name, exc)
+        raise CorruptedPDFError(f"PDF is corrupted: {pdf_name}") from exc
+    except (PDFParseError, MemoryError):
         raise
     except Exception as exc:
-        logger.error("Unexpected parse error, skipping: %s — %s", pdf_path.name, exc)
-        raise PDFParseError(f"Failed to parse PDF: {pdf_path.name}") from exc
+        logger.error("Unexpected parse error, skipping: %s — %s", pdf_name, exc)
+        raise PDFParseError(f"Failed to parse PDF: {pdf_name}") from exc
 
     if not text.strip():
-        logger.warning("PDF yielded no extractable text: %s", pdf_path.name)
-        raise PDFParseError(f"PDF contains no extractable text: {pdf_path.name}")
+        logger.warning("PDF yielded no extractable text: %s", pdf_name)
+        raise PDFParseError(f"PDF contains no extractable text: {pdf_name}")
 
-    if _looks_multicolumn(text):
+    if fallback_pages:
+        metrics.incr("pdf.layout_fallback.documents")
         logger.warning(
-            "Multi-column layout detected in %s — retrying with layout extraction mode; "
-            "accuracy may be reduced",
-            pdf_path.name,
+            "Multi-column layout detected in %s (pages %s) — used layout extraction mode "
+            "for those pages; accuracy may be reduced",
+            pdf_name,
+            ",".join(map(str, fallback_pages)),
         )
-        try:
-            reader2 = PdfReader(str(pdf_path))
-            layout_parts = []
-            for page in reader2.pages:
-                layout_parts.append(page.extract_text(extraction_mode="layout") or "")
-            layout_text = "\n".join(layout_parts)
-            if len(layout_text) > len(text):
-                text = layout_text
-        except Exception as exc:
-            logger.warning(
-                "Layout-mode fallback also failed for %s — %s", pdf_path.name, exc
-            )
-
-    return text
-
-
-def extract_text_from_pdf(pdf_path: Path, *, skip_size_check: bool = False) -> str:
+    if truncated:
+        logger.info("Extraction budget reached for %s after %d of %d pages", pdf_name, pages_read, page_count)
+    return text, truncated, triage
+
+
+def extract_raw_text(source: PdfSource, name: Optional[str] = None) -> str:
+    return _extract_raw(source, name)[0]
+
+
+def extract_pdf(
+    source: PdfSource,
+    *,
+    skip_size_check: bool = False,
+    name: Optional[str] = None,
+) -> ExtractedText:
+    """Cleaned text of a PDF along with whether the extraction budget truncated it."""
     if not skip_size_check:
-        validate_file_size(pdf_path)
-    raw = extract_raw_text(pdf_path)
-    return finalize_extracted_plaintext(raw, source="pdf")
+        if isinstance(source, Path):
+            validate_file_size(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            validate_size(memoryview(source).nbytes, _source_name(source, name))
+    raw, truncated, triage = _extract_raw(source, name)
+    extracted = finalize_extracted(raw, source="pdf", truncated=truncated)
+    extracted.triage = asdict(triage) if triage is not None else None
+    return extracted
+
+
+def extract_text_from_pdf(
+    source: PdfSource,
+    *,
+    skip_size_check: bool = False,
+    name: Optional[str] = None,
+) -> str:
+    return extract_pdf(source, skip_size_check=skip_size_check, name=name).text
 #之前在测试的时候，会出现读一个pdf生成的txt只有一行但是特别长的情况，这是由于pdf文件的格式导致的
 #其实这无伤大雅，只需要最后llm能正常提取这些txt并且把它们转换成对应的json 结构化数据即可
\ No newline at end of file
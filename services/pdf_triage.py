@@ -0,0 +1,127 @@
+"""
+Cheap pre-flight checks on a PDF, run before any page text is extracted.
+
+- truncated: no %%EOF marker near the end of the file and pypdf cannot open it
+  (upload cut short). A missing marker on a file pypdf reads fine (trailing junk,
+  appended signatures) is only flagged as ``missing_eof``;
+- encrypted: the trailer carries an /Encrypt entry;
+- no_pages: the page tree is empty;
+- image_only: none of the sampled pages shows a text-showing operator
+  (Tj / TJ / ' / ") in its content stream or its form XObjects, but some draw images.
+
+Only the trailer, the xref and the sampled content streams are read, so hopeless
+files are rejected in milliseconds instead of after full page extraction.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject
+
+# 规范要求 %%EOF 出现在文件末尾 1024 字节内；多留一些余量给末尾带杂质的文件
+TRIAGE_TAIL_BYTES = 4096
+# 表单 XObject 可以层层嵌套，只往下看这么多层
+_MAX_FORM_DEPTH = 3
+
+VERDICTS = ("text", "encrypted", "truncated", "no_pages", "image_only", "unknown")
+
+_TEXT_OP_RE = re.compile(rb"[)\]>]\s*(?:T[jJ]|['\"])")
+_INLINE_IMAGE_RE = re.compile(rb"\bBI\b")
+_DO_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s*Do\b")
+
+
+@dataclass
+class PdfTriage:
+    verdict: str
+    pages: int = 0
+    sampled_pages: int = 0
+    text_pages: int = 0
+    image_pages: int = 0
+    missing_eof: bool = False
+
+
+def tail_is_truncated(tail: bytes) -> bool:
+    """``tail``: the last TRIAGE_TAIL_BYTES of the file. Only a hint; see pdf_to_txt._triage."""
+    return b"%%EOF" not in tail
+
+
+def inspect_reader(reader: PdfReader, sample_pages: int) -> PdfTriage:
+    """Classify an opened PDF from its trailer, page count and a sample of its pages."""
+    if reader.is_encrypted:
+        return PdfTriage("encrypted")
+    page_count = len(reader.pages)
+    if page_count == 0:
+        return PdfTriage("no_pages")
+
+    triage = PdfTriage("unknown", pages=page_count)
+    for index in _sample_indexes(page_count, sample_pages):
+        try:
+            has_text, has_image = _scan_page(reader.pages[index])
+        except MemoryError:
+            raise
+        except Exception:
+            # 内容流读不出来就不下结论，交给完整解析去判断
+            return triage
+        triage.sampled_pages += 1
+        triage.text_pages += has_text
+        triage.image_pages += has_image
+
+    if triage.text_pages:
+        triage.verdict = "text"
+    elif triage.image_pages:
+        triage.verdict = "image_only"
+    return triage
+
+
+def _sample_indexes(page_count: int, sample_pages: int) -> list[int]:
+    """First, last and evenly spaced pages in between; every page when there are few."""
+    if sample_pages <= 0 or page_count <= sample_pages:
+        return list(range(page_count))
+    if sample_pages == 1:
+        return [0]
+    step = (page_count - 1) / (sample_pages - 1)
+    return sorted({round(i * step) for i in range(sample_pages)})
+
+
+def _scan_page(page) -> tuple[bool, bool]:
+    return _scan_stream(_content_bytes(page), page.get("/Resources"), 0)
+
+
+def _content_bytes(page) -> bytes:
+    contents = page.get("/Contents")
+    if contents is None:
+        return b""
+    contents = contents.get_object()
+    if isinstance(contents, ArrayObject):
+        return b"\n".join(part.get_object().get_data() for part in contents)
+    return contents.get_data()
+
+
+def _scan_stream(data: bytes, resources, depth: int) -> tuple[bool, bool]:
+    """(shows text, draws an image) for one content stream and the form XObjects it paints."""
+    if _TEXT_OP_RE.search(data):
+        return True, False
+    has_image = bool(_INLINE_IMAGE_RE.search(data))
+
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is None:
+        return False, has_image
+    xobjects = xobjects.get_object()
+    for name in {match.group(1) for match in _DO_RE.finditer(data)}:
+        xobject = xobjects.get("/" + name.decode("latin-1"))
+        if xobject is None:
+            continue
+        xobject = xobject.get_object()
+        subtype = xobject.get("/Subtype")
+        if subtype == "/Image":
+            has_image = True
+        elif subtype == "/Form" and depth < _MAX_FORM_DEPTH:
+            form_text, form_image = _scan_stream(
+                xobject.get_data(), xobject.get("/Resources", resources), depth + 1
+            )
+            if form_text:
+                return True, has_image
+            has_image = has_image or form_image
+    return False, has_image
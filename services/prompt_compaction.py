@@ -0,0 +1,304 @@
+"""
+Shrink resume text before it goes into an LLM extraction prompt.
+
+- boilerplate lines: consecutive duplicates (e.g. merged DOCX table cells), page-number
+  lines, and running page headers / footers: short lines found at the top or bottom of
+  several pages (pages are split at clean_text's PAGE_BREAK lines), which are kept only
+  where they first appear;
+- near-duplicate paragraphs: most of their 3-word shingles already occur in one earlier
+  paragraph;
+- a per-provider token estimate, and when the text is over PROMPT_MAX_INPUT_TOKENS,
+  section-aware trimming: low-value sections lose lines first, and inside a section
+  bullet / long description lines go before the short company / title / date lines.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import settings
+from services.resume_validity_checker import ResumeValidityChecker
+from services.text_clean_service import PAGE_BREAK
+from utils import metrics
+
+# 每个 provider 的粗略换算：(非 CJK 字符数 / token, 每个 CJK 字符的 token 数)
+_TOKEN_RATES: Dict[str, Tuple[float, float]] = {
+    "openai": (4.0, 0.9),
+    "gemini": (4.0, 0.8),
+    "dashscope": (3.6, 0.7),
+    "ollama": (3.4, 1.0),
+}
+_DEFAULT_TOKEN_RATE = (3.6, 1.0)
+_CJK_RE = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+# 页码行："Page 2" / "Jane Doe | Page 2 of 3" / "- 2 -" / "第 2 页 共 3 页"。
+# 单独的数字或 "4/5" 不算：DOCX 表格里的年限、评分也是这个样子
+_PAGE_NUMBER_RE = re.compile(
+    r"(?:.{0,60}?[-|–—·•]\s*)?page\s*\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?"
+    r"|-\s*\d{1,3}\s*-"
+    r"|第\s*\d{1,3}\s*页(?:\s*[,，/]?\s*共\s*\d{1,3}\s*页)?",
+    re.IGNORECASE,
+)
+# 页眉页脚一般很短，只出现在每页开头或结尾的前几行里
+_REPEATED_LINE_MAX_CHARS = 120
+_PAGE_EDGE_LINES = 2
+_PARAGRAPH_MIN_WORDS = 15
+_WORD_RE = re.compile(r"\w+")
+_DETAIL_LINE_RE = re.compile(r"^[-*•▪◦]\s")
+_DETAIL_LINE_MIN_WORDS = 12
+
+_CONTACT = "contact"
+_EXTRA_SECTION_ALIASES = {
+    "education": ["教育背景", "教育经历"],
+    "experience": ["工作经历", "工作经验", "实习经历"],
+    "skills": ["专业技能", "技能", "技能特长"],
+    "projects": ["项目经历", "项目经验"],
+    "summary": ["自我评价", "个人简介", "个人总结"],
+    "certifications": ["证书", "资格证书"],
+    "awards": ["获奖情况", "荣誉奖项"],
+}
+_SECTION_ALIASES = {
+    alias: name
+    for name, aliases in ResumeValidityChecker.SECTION_KEYWORDS.items()
+    for alias in [*aliases, *_EXTRA_SECTION_ALIASES.get(name, [])]
+}
+# 越小越先被裁剪；联系方式块（第一个标题之前的内容）只在最后的硬截断里才会动
+_SECTION_PRIORITY = {"experience": 4, "education": 4, "skills": 4, "projects": 3, "summary": 2}
+_OTHER_SECTION_PRIORITY = 1
+
+
+@dataclass
+class CompactedText:
+    text: str
+    tokens_before: int
+    tokens: int
+    removed_lines: int = 0
+    removed_paragraphs: int = 0
+    trimmed_lines: int = 0
+
+
+def estimate_tokens(text: str, provider: Optional[str] = None) -> int:
+    """Rough prompt-token count of ``text`` for ``provider`` (default: DEFAULT_LLM_PROVIDER)."""
+    chars_per_token, cjk_rate = _TOKEN_RATES.get(
+        (provider or settings.DEFAULT_LLM_PROVIDER).lower().strip(), _DEFAULT_TOKEN_RATE
+    )
+    cjk = len(_CJK_RE.findall(text))
+    return math.ceil((len(text) - cjk) / chars_per_token + cjk * cjk_rate)
+
+
+def compact_text(text: str, provider: Optional[str] = None, max_tokens: Optional[int] = None) -> CompactedText:
+    """
+    Remove boilerplate and near-duplicate paragraphs from ``text``, then trim it to
+    ``max_tokens`` (default PROMPT_MAX_INPUT_TOKENS; 0 = no budget).
+    """
+    if max_tokens is None:
+        max_tokens = settings.PROMPT_MAX_INPUT_TOKENS
+    tokens_before = estimate_tokens(text, provider)
+
+    lines, removed_lines = _drop_boilerplate_lines(text.split("\n"))
+    lines, removed_paragraphs = _drop_near_duplicate_paragraphs(lines)
+    trimmed_lines = 0
+    if max_tokens > 0:
+        lines, trimmed_lines = _trim_to_budget(lines, max_tokens, provider)
+
+    compacted = "\n".join(lines).strip()
+    result = CompactedText(
+        text=compacted,
+        tokens_before=tokens_before,
+        tokens=estimate_tokens(compacted, provider),
+        removed_lines=removed_lines,
+        removed_paragraphs=removed_paragraphs,
+        trimmed_lines=trimmed_lines,
+    )
+    metrics.incr("prompt.compaction.tokens_before", result.tokens_before)
+    metrics.incr("prompt.compaction.tokens_after", result.tokens)
+    metrics.incr("prompt.compaction.removed_lines", removed_lines)
+    metrics.incr("prompt.compaction.removed_paragraphs", removed_paragraphs)
+    if trimmed_lines:
+        metrics.incr("prompt.compaction.trimmed")
+    return result
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.casefold().split())
+
+
+def _drop_boilerplate_lines(lines: List[str]) -> Tuple[List[str], int]:
+    keys = [_line_key(line) for line in lines]
+    running = _running_header_lines(lines, keys)
+
+    kept: List[str] = []
+    seen: Set[str] = set()
+    previous = ""
+    removed = 0
+    for index, (line, key) in enumerate(zip(lines, keys)):
+        if _is_page_break(line):
+            # 分页符不进提示词，换成空行；previous 不清空，跨页的连续重复行照样去掉
+            kept.append("")
+            continue
+        if not key:
+            kept.append(line)
+            continue
+        if key == previous or _PAGE_NUMBER_RE.fullmatch(key) or (index in running and key in seen):
+            removed += 1
+            continue
+        seen.add(key)
+        previous = key
+        kept.append(line)
+    return kept, removed
+
+
+def _is_page_break(line: str) -> bool:
+    return PAGE_BREAK in line and not line.strip()
+
+
+def _running_header_lines(lines: List[str], keys: List[str]) -> Set[int]:
+    """
+    Indexes of running page headers / footers: short lines among the first or last
+    _PAGE_EDGE_LINES non-blank lines of a page whose text sits at an edge of at least
+    PROMPT_REPEATED_LINE_MIN_COUNT pages. Without PAGE_BREAK lines (DOCX, pasted
+    text) there is a single page and nothing qualifies.
+    """
+    pages: List[List[int]] = [[]]
+    for index, (line, key) in enumerate(zip(lines, keys)):
+        if _is_page_break(line):
+            pages.append([])
+        elif key:
+            pages[-1].append(index)
+
+    edges: List[Set[int]] = []
+    page_counts: Dict[str, int] = {}
+    for page in pages:
+        edge = {
+            index
+            for index in page[:_PAGE_EDGE_LINES] + page[-_PAGE_EDGE_LINES:]
+            if len(keys[index]) <= _REPEATED_LINE_MAX_CHARS
+        }
+        edges.append(edge)
+        for key in {keys[index] for index in edge}:
+            page_counts[key] = page_counts.get(key, 0) + 1
+
+    # 至少出现在两页上才谈得上"重复"
+    min_count = max(2, settings.PROMPT_REPEATED_LINE_MIN_COUNT)
+    return {index for edge in edges for index in edge if page_counts[keys[index]] >= min_count}
+
+
+def _drop_near_duplicate_paragraphs(lines: List[str]) -> Tuple[List[str], int]:
+    """Drop a blank-line separated paragraph that mostly repeats an earlier one."""
+    paragraphs: List[List[str]] = [[]]
+    for line in lines:
+        if line.strip():
+            paragraphs[-1].append(line)
+        elif paragraphs[-1]:
+            paragraphs.append([])
+
+    kept: List[List[str]] = []
+    index: Dict[Tuple[str, ...], List[int]] = {}
+    removed = 0
+    for paragraph in paragraphs:
+        if not paragraph:
+            continue
+        words = _WORD_RE.findall(" ".join(paragraph).casefold())
+        shingles = {tuple(words[i:i + 3]) for i in range(len(words) - 2)} if len(words) >= _PARAGRAPH_MIN_WORDS else set()
+        if shingles and _is_near_duplicate(shingles, index):
+            removed += 1
+            continue
+        for shingle in shingles:
+            index.setdefault(shingle, []).append(len(kept))
+        kept.append(paragraph)
+
+    output: List[str] = []
+    for paragraph in kept:
+        if output:
+            output.append("")
+        output.extend(paragraph)
+    return output, removed
+
+
+def _is_near_duplicate(
+    shingles: Set[Tuple[str, ...]],
+    index: Dict[Tuple[str, ...], List[int]],
+) -> bool:
+    """True when most of ``shingles`` already occur in a single earlier paragraph."""
+    shared: Dict[int, int] = {}
+    for shingle in shingles:
+        for paragraph in index.get(shingle, ()):
+            shared[paragraph] = shared.get(paragraph, 0) + 1
+    # 用包含度而不是 Jaccard：段落被截短或改了几个词时，大部分 3 词片段仍然能在原段落里找到
+    needed = settings.PROMPT_NEAR_DUPLICATE_THRESHOLD * len(shingles)
+    return any(overlap >= needed for overlap in shared.values())
+
+
+def _section_of(line: str) -> Optional[str]:
+    key = _line_key(line).rstrip(":：").strip()
+    return _SECTION_ALIASES.get(key) if len(key) <= 40 else None
+
+
+def _removal_stack(indexes: List[int], lines: List[str]) -> List[int]:
+    """
+    Lines a section can give up, as a stack: pop() yields detail lines from the end
+    of the section first, then the remaining lines from the end. Its heading and
+    first line always stay.
+    """
+    candidates = indexes[2:]
+    details = [i for i in candidates if _is_detail_line(lines[i])]
+    others = [i for i in candidates if not _is_detail_line(lines[i])]
+    return others + details
+
+
+def _is_detail_line(line: str) -> bool:
+    stripped = line.strip()
+    return bool(_DETAIL_LINE_RE.match(stripped)) or len(stripped.split()) >= _DETAIL_LINE_MIN_WORDS
+
+
+def _trim_to_budget(lines: List[str], budget: int, provider: Optional[str]) -> Tuple[List[str], int]:
+    line_tokens = [estimate_tokens(line, provider) + 1 for line in lines]
+    total = sum(line_tokens)
+    if total <= budget:
+        return lines, 0
+
+    sections: List[Tuple[str, List[int]]] = [(_CONTACT, [])]
+    for index, line in enumerate(lines):
+        name = _section_of(line)
+        if name is not None:
+            sections.append((name, []))
+        sections[-1][1].append(index)
+
+    removed: Set[int] = set()
+    levels = sorted({_SECTION_PRIORITY.get(name, _OTHER_SECTION_PRIORITY) for name, _ in sections[1:]})
+    for level in levels:
+        # 同一优先级里总是先削当前最长的那一节
+        heap = []
+        for section_id, (name, indexes) in enumerate(sections[1:]):
+            if _SECTION_PRIORITY.get(name, _OTHER_SECTION_PRIORITY) != level:
+                continue
+            stack = _removal_stack(indexes, lines)
+            if stack:
+                heap.append((-sum(line_tokens[i] for i in indexes), section_id, stack))
+        heapq.heapify(heap)
+        while heap and total > budget:
+            negative_size, section_id, stack = heapq.heappop(heap)
+            index = stack.pop()
+            removed.add(index)
+            total -= line_tokens[index]
+            if stack:
+                heapq.heappush(heap, (negative_size + line_tokens[index], section_id, stack))
+        if total <= budget:
+            break
+
+    kept = [i for i in range(len(lines)) if i not in removed]
+    if total > budget:
+        # 各节都只剩标题和首行仍然超预算：按顺序保留到预算为止
+        running = 0
+        cut = len(kept)
+        for position, index in enumerate(kept):
+            running += line_tokens[index]
+            if running > budget:
+                cut = position
+                break
+        removed.update(kept[cut:])
+        kept = kept[:cut]
+    return [lines[i] for i in kept], len(removed)
@@ -0,0 +1,257 @@
+"""
+Local resume / not-resume classifier: a logistic regression over ResumeValidityChecker
+stats, trained offline from logged LLM verdicts (storage/validity_samples.py).
+
+    python -m services.resume_classifier [--out PATH]
+
+trains on every stored sample and writes a small .npz artifact, which the API loads
+once at startup. At request time it is consulted after the validity gate; texts it is
+not confident about still go to the LLM classifier (RESUME_CLASSIFIER_LLM_FALLBACK).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from services.resume_validity_checker import ResumeValidityChecker, ValidityResult, ValidityStats
+from storage import validity_samples
+from utils import metrics
+from utils.logger import get_logger
+
+logger = get_logger("resume_classifier")
+
+_SECTIONS = tuple(ResumeValidityChecker.SECTION_KEYWORDS)
+# 计数类特征取 log1p，避免超长文本把线性模型拉偏
+FEATURE_NAMES = (
+    "log_words",
+    "log_chars",
+    "log_lines",
+    "log_non_empty_lines",
+    "sections",
+    "log_dates",
+    "email",
+    "phone",
+    "linkedin",
+    "github",
+    "log_bullet_lines",
+    "repeated_line_ratio",
+    "jd_signals",
+    *(f"section_{name}" for name in _SECTIONS),
+)
+
+
+def stats_features(stats: ValidityStats) -> np.ndarray:
+    """Feature vector for one text, in FEATURE_NAMES order."""
+    sections = set(stats.section_hits)
+    return np.array(
+        [
+            np.log1p(stats.word_count),
+            np.log1p(stats.char_count),
+            np.log1p(stats.line_count),
+            np.log1p(stats.non_empty_line_count),
+            len(sections),
+            np.log1p(stats.date_matches),
+            stats.email_found,
+            stats.phone_found,
+            stats.linkedin_found,
+            stats.github_found,
+            np.log1p(stats.bullet_lines),
+            stats.repeated_line_ratio,
+            stats.possible_jd_signals,
+            *(name in sections for name in _SECTIONS),
+        ],
+        dtype=np.float64,
+    )
+
+
+@dataclass(frozen=True)
+class ResumeClassifier:
+    """Standardized logistic regression: p = sigmoid(((x - mean) / scale) @ weights + bias)."""
+    weights: np.ndarray = field(repr=False)
+    bias: float = field(repr=False)
+    mean: np.ndarray = field(repr=False)
+    scale: np.ndarray = field(repr=False)
+    samples: int = 0
+
+    def predict_proba(self, stats: ValidityStats) -> float:
+        """Probability that the text behind ``stats`` is a resume."""
+        z = float((stats_features(stats) - self.mean) / self.scale @ self.weights) + self.bias
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as handle:
+            np.savez(
+                handle,
+                feature_names=np.array(FEATURE_NAMES),
+                weights=self.weights,
+                bias=np.array(self.bias),
+                mean=self.mean,
+                scale=self.scale,
+                samples=np.array(self.samples),
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "ResumeClassifier":
+        with np.load(path, allow_pickle=False) as artifact:
+            feature_names = tuple(str(name) for name in artifact["feature_names"])
+            if feature_names != FEATURE_NAMES:
+                raise ValueError(f"{path} was trained on different features; retrain it")
+            return cls(
+                weights=artifact["weights"],
+                bias=float(artifact["bias"]),
+                mean=artifact["mean"],
+                scale=artifact["scale"],
+                samples=int(artifact["samples"]),
+            )
+
+
+def train(
+    samples: Iterable[Tuple[ValidityStats, bool]],
+    l2: float = 1.0,
+    max_iterations: int = 50,
+) -> ResumeClassifier:
+    """Fit by Newton's method (IRLS) with an L2 penalty on the weights (not the bias)."""
+    rows: List[np.ndarray] = []
+    labels: List[float] = []
+    for stats, is_resume in samples:
+        rows.append(stats_features(stats))
+        labels.append(float(is_resume))
+    if not rows:
+        raise ValueError("no training samples")
+
+    x = np.vstack(rows)
+    y = np.array(labels)
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.0
+    design = np.hstack([(x - mean) / scale, np.ones((len(x), 1))])
+    penalty = np.full(design.shape[1], l2)
+    penalty[-1] = 0.0
+
+    theta = np.zeros(design.shape[1])
+    for _ in range(max_iterations):
+        p = 1.0 / (1.0 + np.exp(-(design @ theta)))
+        gradient = design.T @ (p - y) + penalty * theta
+        hessian = (design * (p * (1.0 - p))[:, None]).T @ design + np.diag(penalty)
+        # 样本全是同一类时 Hessian 奇异，加一点对角项保证可解
+        step = np.linalg.solve(hessian + 1e-9 * np.eye(len(theta)), gradient)
+        theta -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+
+    return ResumeClassifier(weights=theta[:-1], bias=float(theta[-1]), mean=mean, scale=scale, samples=len(x))
+
+
+_classifier: Optional[ResumeClassifier] = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def load_classifier() -> Optional[ResumeClassifier]:
+    """Load the trained artifact once; None when disabled, missing or unreadable."""
+    global _classifier, _classifier_loaded
+    with _classifier_lock:
+        if _classifier_loaded:
+            return _classifier
+        _classifier_loaded = True
+        path = settings.RESUME_CLASSIFIER_PATH
+        if not settings.RESUME_CLASSIFIER_ENABLED or not path.exists():
+            return None
+        try:
+            _classifier = ResumeClassifier.load(path)
+        except Exception as exc:
+            logger.error("Could not load resume classifier from %s: %s", path, exc)
+            return None
+        logger.info("Loaded resume classifier from %s (%d training samples)", path, _classifier.samples)
+        return _classifier
+
+
+def classify(validity: Optional[ValidityResult]) -> Optional[bool]:
+    """
+    True / False when the local model is confident, None when the LLM should decide.
+    Without a model (or without checker stats) this always returns None.
+    """
+    classifier = load_classifier()
+    if classifier is None or validity is None:
+        return None
+
+    started_at = time.perf_counter()
+    probability = classifier.predict_proba(validity.stats)
+    metrics.observe("resume_classifier.predict", time.perf_counter() - started_at)
+
+    if probability >= settings.RESUME_CLASSIFIER_ACCEPT_PROBABILITY:
+        metrics.incr("resume_classifier.accepted")
+        return True
+    if probability <= settings.RESUME_CLASSIFIER_REJECT_PROBABILITY:
+        metrics.incr("resume_classifier.rejected")
+        return False
+    if not settings.RESUME_CLASSIFIER_LLM_FALLBACK:
+        metrics.incr("resume_classifier.forced")
+        return probability >= 0.5
+    metrics.incr("resume_classifier.llm_fallback")
+    return None
+
+
+def record_verdict(validity: Optional[ValidityResult], is_resume: bool) -> None:
+    """Log an LLM verdict with the checker stats of the same text as a training sample."""
+    if validity is None or not settings.VALIDITY_SAMPLES_ENABLED:
+        return
+    validity_samples.record(asdict(validity.stats), is_resume)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m services.resume_classifier",
+        description="Train the local resume classifier from logged checker stats and LLM verdicts.",
+    )
+    parser.add_argument("--out", type=Path, default=settings.RESUME_CLASSIFIER_PATH)
+    parser.add_argument("--l2", type=float, default=1.0, help="L2 penalty on the weights")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of samples kept back for evaluation")
+    parser.add_argument("--min-samples", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    samples = [(ValidityStats(**stats), is_resume) for stats, is_resume in validity_samples.iter_samples()]
+    if len(samples) < args.min_samples:
+        print(f"only {len(samples)} samples in {settings.VALIDITY_SAMPLES_PATH}, need {args.min_samples}", file=sys.stderr)
+        return 1
+
+    order = np.random.default_rng(0).permutation(len(samples))
+    held = max(1, int(len(samples) * args.holdout)) if args.holdout > 0 else 0
+    evaluation = [samples[i] for i in order[:held]]
+    model = train((samples[i] for i in order[held:]), l2=args.l2)
+    if evaluation:
+        _report(model, evaluation)
+
+    # 评估完用全部样本重新训练再保存
+    model = train(samples, l2=args.l2)
+    model.save(args.out)
+    positives = sum(is_resume for _, is_resume in samples)
+    print(f"trained on {len(samples)} samples ({positives} resumes), saved to {args.out}")
+    return 0
+
+
+def _report(model: ResumeClassifier, evaluation: List[Tuple[ValidityStats, bool]]) -> None:
+    probabilities = np.array([model.predict_proba(stats) for stats, _ in evaluation])
+    labels = np.array([is_resume for _, is_resume in evaluation])
+    accuracy = np.mean((probabilities >= 0.5) == labels)
+    confident = (probabilities >= settings.RESUME_CLASSIFIER_ACCEPT_PROBABILITY) | (
+        probabilities <= settings.RESUME_CLASSIFIER_REJECT_PROBABILITY
+    )
+    line = f"holdout {len(labels)}: accuracy {accuracy:.3f}, decided locally {confident.mean():.1%}"
+    if confident.any():
+        confident_accuracy = np.mean((probabilities[confident] >= 0.5) == labels[confident])
+        line += f" with accuracy {confident_accuracy:.3f}"
+    print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
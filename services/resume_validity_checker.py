@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import argparse
+import json
+import multiprocessing
 import re
-from dataclasses import dataclass, field
+import sys
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Literal
+from typing import Deque, Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple
 
 
 DecisionType = Literal["PASS", "SOFT_FAIL", "HARD_FAIL"]
@@ -37,10 +44,87 @@ class ValidityResult:
     stats: ValidityStats
 
 
+def _alternation(words: List[str]) -> str:
+    """
+    Regex source matching any of ``words``, factored into a prefix trie so each position
+    costs one walk down the trie instead of one attempt per word. Longer words win:
+    at every node the continuations are tried before stopping there.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" not in node:
+            return body
+        return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+
+    return build(trie) if words else "(?!)"
+
+
+class _KeywordScanner:
+    r"""
+    Find the keywords and section-header aliases present in lowered text.
+
+    Keywords use plain substring semantics and are tested one by one with ``in``, which
+    is cheaper than a regex that has to be tried at every position. Aliases follow
+    the header rule ``(?:^|\s)alias(?:\s*:|\s+|$)`` and are found by one precompiled
+    pattern. It is a zero-width lookahead, so it is tried at every position and
+    overlapping hits are kept. At a given position only the longest alias is reported.
+    Shorter aliases that are prefixes of it, and that would also have matched there,
+    come back through the ``implied`` table.
+    """
+
+    _HEADER_END = r"(?:\s*:|\s|$)"
+    # 行首检测把空白压成单个空格后再比较；只有含其它空白的行才可能比全文检测多命中
+    _IRREGULAR_SPACE = re.compile(r"[^\S ]| {2}")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, keywords: List[str], aliases: List[str]) -> None:
+        self._keywords = tuple(sorted(set(keywords)))
+        aliases = sorted(set(aliases))
+        self._pattern = re.compile(rf"(?<!\S)(?=({_alternation(aliases)}){self._HEADER_END})")
+        self._line_header = re.compile(f"({_alternation(aliases)})(?=:| |$)")
+        self._implied_aliases = {
+            alias: frozenset(
+                other
+                for other in aliases
+                if alias.startswith(other) and re.match(self._HEADER_END, alias[len(other):])
+            )
+            for alias in aliases
+        }
+
+    def scan(self, lowered_text: str, non_empty_lines: List[str]) -> Tuple[Set[str], Set[str]]:
+        """(keywords found anywhere, header aliases found) for the checker's normalized text."""
+        keywords = {keyword for keyword in self._keywords if keyword in lowered_text}
+        aliases: Set[str] = set()
+        implied_aliases = self._implied_aliases
+        for alias in set(self._pattern.findall(lowered_text)):
+            aliases |= implied_aliases[alias]
+
+        # A header line counts when it is not the last non-empty line.
+        for line in non_empty_lines[:-1]:
+            if self._IRREGULAR_SPACE.search(line):
+                match = self._line_header.match(self._WHITESPACE.sub(" ", line.lower()))
+                if match:
+                    aliases |= implied_aliases[match.group(1)]
+        return keywords, aliases
+
+
 class ResumeValidityChecker:
     """
     Check whether a clean TXT input is sufficiently resume-like
     before sending it to an LLM extraction or ranking pipeline.
+
+    Instances are immutable and keep no per-call state, so one checker can be
+    shared across threads; see the module-level ``validity_checker``.
     """
 
     SECTION_KEYWORDS = {
@@ -128,16 +212,17 @@ class ResumeValidityChecker:
         "financial analyst",
     ]
 
+    # 月份模式先用首字母前瞻筛掉绝大多数词首，再去试十几个忽略大小写的分支
     DATE_PATTERNS = [
         re.compile(r"\b(?:19|20)\d{2}\b"),
         re.compile(
-            r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\s+(?:19|20)\d{2}\b",
+            r"\b(?=[jfmasond])(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\s+(?:19|20)\d{2}\b",
             re.I,
         ),
         re.compile(r"\b(?:19|20)\d{2}\s*[-–]\s*(?:19|20)\d{2}\b"),
         re.compile(r"\b(?:19|20)\d{2}\s*[-–]\s*(?:present|current|now)\b", re.I),
         re.compile(
-            r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4}\b",
+            r"\b(?=[jfmasond])(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{4}\b",
             re.I,
         ),
     ]
@@ -152,7 +237,35 @@ class ResumeValidityChecker:
     BULLET_LINE_PATTERN = re.compile(r"^\s*[-*•▪◦]\s+")
     INLINE_BULLET_PATTERN = re.compile(r"[•▪◦]\s+")
     WHITESPACE_PATTERN = re.compile(r"\s+")
-    WORD_PATTERN = re.compile(r"\b\w+\b")
+    # 与 \b\w+\b 的匹配数相同（每段连续的 \w 各算一次），省掉两次边界判断
+    WORD_PATTERN = re.compile(r"\w+")
+
+    # 扁平文本里常见的大写 / 首字母大写段落标题，前面的空白会被换成换行。
+    # "TECHNICAL SKILLS" 不在表里："SKILLS" 本身已经会把它断成 "TECHNICAL\nSKILLS"。
+    UPPERCASE_HEADERS = [
+        "EDUCATION",
+        "EXPERIENCE",
+        "PROJECTS",
+        "SKILLS",
+        "SUMMARY",
+        "RESEARCH",
+        "PUBLICATIONS",
+        "LEADERSHIP",
+        "CERTIFICATIONS",
+        "AWARDS",
+        "WHAT I CAN BRING",
+    ]
+    TITLE_CASE_HEADERS = ["Education", "Experience", "Projects", "Skills", "Summary", "Research", "Publications"]
+    # One scan for bullet, header and blank-line recovery; see _normalize_text.
+    # 每个匹配都以空白或项目符号开头，先用前瞻筛掉其它位置
+    NORMALIZE_PATTERN = re.compile(
+        r"(?=[\s•▪◦])(?:"
+        r"\s*(?P<bullet>[•▪◦])\s*"
+        rf"|\s+(?P<header>{'|'.join(map(re.escape, UPPERCASE_HEADERS))})\b"
+        rf"|(?<=[A-Za-z0-9])\s+(?P<title>{'|'.join(TITLE_CASE_HEADERS)})\b"
+        r"|\n{3,})"
+    )
+    UPPERCASE_HEADER_PATTERN = re.compile(rf"(?:{'|'.join(map(re.escape, UPPERCASE_HEADERS))})\b")
 
     def __init__(
         self,
@@ -160,21 +273,73 @@ class ResumeValidityChecker:
         soft_min_word_threshold: int = 250,
         strong_word_threshold: int = 400,
     ) -> None:
-        self.hard_fail_word_threshold = hard_fail_word_threshold
-        self.soft_min_word_threshold = soft_min_word_threshold
-        self.strong_word_threshold = strong_word_threshold
+        object.__setattr__(self, "hard_fail_word_threshold", hard_fail_word_threshold)
+        object.__setattr__(self, "soft_min_word_threshold", soft_min_word_threshold)
+        object.__setattr__(self, "strong_word_threshold", strong_word_threshold)
+        # 关键词扫描器按类编译一次，这里提前触发，避免第一个请求付编译的开销
+        self._scanner()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable; create a new checker instead")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable; create a new checker instead")
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(hard_fail_word_threshold={self.hard_fail_word_threshold}, "
+            f"soft_min_word_threshold={self.soft_min_word_threshold}, "
+            f"strong_word_threshold={self.strong_word_threshold})"
+        )
 
     def check_file(self, txt_path: str | Path) -> ValidityResult:
-        path = Path(txt_path)
-        text = path.read_text(encoding="utf-8", errors="ignore")
-        return self.check_text(text)
+        return self.check_text(_read_txt(txt_path))
 
-    def check_text(self, text: str) -> ValidityResult:
-        normalized_text = self._normalize_text(text)
+    def check_texts(
+        self,
+        texts: Iterable[str],
+        *,
+        cleaned: bool = False,
+        workers: int = 1,
+        chunk_size: int = 32,
+    ) -> Iterator[ValidityResult]:
+        """
+        Check many texts, yielding results lazily and in input order.
+
+        With ``workers`` > 1, chunks of ``chunk_size`` texts are checked in that many
+        spawned processes. Only two chunks per worker are read ahead, so ``texts``
+        can be a lazy stream (e.g. a whole directory of TXT files).
+        """
+        chunks = _chunked(texts, chunk_size)
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self._check_chunk(chunk, cleaned)
+            return
+
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        pending: Deque[Future] = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(self._check_chunk, chunk, cleaned))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # 调用方提前停止迭代时，丢弃还没开始的分块
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _check_chunk(self, texts: List[str], cleaned: bool) -> List[ValidityResult]:
+        return [self.check_text(text, cleaned=cleaned) for text in texts]
+
+    def check_text(self, text: str, cleaned: bool = False) -> ValidityResult:
+        """Check ``text``; pass ``cleaned=True`` for output of text_clean_service.clean_text."""
+        normalized_text = self._normalize_text(text, cleaned=cleaned)
         lines = [line.rstrip() for line in normalized_text.splitlines()]
         non_empty_lines = [line.strip() for line in lines if line.strip()]
 
-        stats = self._collect_stats(normalized_text, lines, non_empty_lines)
+        keywords, header_aliases = self._scanner().scan(normalized_text.lower(), non_empty_lines)
+        stats = self._collect_stats(normalized_text, lines, non_empty_lines, keywords, header_aliases)
 
         component_scores: Dict[str, float] = {}
         reasons: List[str] = []
@@ -182,7 +347,7 @@ class ResumeValidityChecker:
 
         length_score = self._score_length(stats, reasons, warnings)
         section_score = self._score_sections(stats, reasons, warnings)
-        density_score = self._score_content_density(normalized_text, stats, reasons, warnings)
+        density_score = self._score_content_density(keywords, stats, reasons, warnings)
         contact_score = self._score_contact(stats, reasons, warnings)
         penalty_score = self._score_penalty(stats, reasons, warnings)
 
@@ -214,55 +379,45 @@ class ResumeValidityChecker:
             stats=stats,
         )
 
-    def _normalize_text(self, text: str) -> str:
+    def _normalize_text(self, text: str, cleaned: bool = False) -> str:
         """
-        Normalize line endings and recover some structure from flattened TXT.
+        Normalize line endings and recover some structure from flattened TXT:
+        bullets start a new line, known section headers start a new line, and
+        runs of blank lines collapse to one. ``cleaned`` text comes from
+        clean_text, whose line endings are already normalized and whose page
+        breaks sit on lines of their own; those lines are dropped.
         """
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if cleaned:
+            text = text.replace("\n\f\n", "\n")
+        else:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
         text = text.replace("\x00", " ")
-
-        # Recover bullet structure from flattened text.
-        text = re.sub(r"\s*([•▪◦])\s*", r"\n\1 ", text)
-
-        # Recover common uppercase section headers from flattened text.
-        common_headers = [
-            "EDUCATION",
-            "EXPERIENCE",
-            "PROJECTS",
-            "SKILLS",
-            "TECHNICAL SKILLS",
-            "SUMMARY",
-            "RESEARCH",
-            "PUBLICATIONS",
-            "LEADERSHIP",
-            "CERTIFICATIONS",
-            "AWARDS",
-            "WHAT I CAN BRING",
-        ]
-        for header in common_headers:
-            text = re.sub(rf"\s+({re.escape(header)})\b", r"\n\1", text)
-
-        # Recover common title-case headers if they appear inline.
-        text = re.sub(
-            r"(?<=[A-Za-z0-9])\s+(Education|Experience|Projects|Skills|Summary|Research|Publications)\b",
-            r"\n\1",
-            text,
-        )
-
-        # Collapse excessive blank lines.
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        return text.strip()
+        return self.NORMALIZE_PATTERN.sub(self._normalize_match, text).strip()
+
+    def _normalize_match(self, match: re.Match) -> str:
+        # 与原先逐个 re.sub（项目符号 → 大写标题 → 首字母大写标题 → 空行）的结果一致：
+        # 项目符号后紧跟大写标题时，标题前那个空格也会被换成换行
+        bullet = match.group("bullet")
+        if bullet is not None:
+            if self.UPPERCASE_HEADER_PATTERN.match(match.string, match.end()):
+                return f"\n{bullet}\n"
+            return f"\n{bullet} "
+        header = match.group("header") or match.group("title")
+        if header is not None:
+            return f"\n{header}"
+        return "\n\n"
 
     def _collect_stats(
         self,
         text: str,
         lines: List[str],
         non_empty_lines: List[str],
+        keywords: Set[str],
+        header_aliases: Set[str],
     ) -> ValidityStats:
         lowered_lines = [line.lower().strip() for line in non_empty_lines]
-        lowered_text = text.lower()
 
-        section_hits = self._detect_sections(non_empty_lines, lowered_text)
+        section_hits = self._detect_sections(header_aliases)
         date_matches = self._count_date_matches(text)
         email_found = bool(self.EMAIL_PATTERN.search(text))
         phone_found = bool(self.PHONE_PATTERN.search(text))
@@ -274,7 +429,7 @@ class ResumeValidityChecker:
         bullet_lines += len(self.INLINE_BULLET_PATTERN.findall(text))
 
         repeated_line_ratio = self._compute_repeated_line_ratio(lowered_lines)
-        possible_jd_signals = sum(1 for kw in self.JD_KEYWORDS if kw in lowered_text)
+        possible_jd_signals = sum(1 for kw in self.JD_KEYWORDS if kw in keywords)
 
         word_count = len(self.WORD_PATTERN.findall(text))
 
@@ -294,38 +449,24 @@ class ResumeValidityChecker:
             possible_jd_signals=possible_jd_signals,
         )
 
-    def _detect_sections(self, non_empty_lines: List[str], lowered_text: str) -> List[str]:
-        hits: List[str] = []
-        for canonical_name, aliases in self.SECTION_KEYWORDS.items():
-            if self._has_section_header(non_empty_lines, lowered_text, aliases):
-                hits.append(canonical_name)
-        return hits
+    def _detect_sections(self, header_aliases: Set[str]) -> List[str]:
+        return [
+            canonical_name
+            for canonical_name, aliases in self.SECTION_KEYWORDS.items()
+            if any(alias in header_aliases for alias in aliases)
+        ]
 
-    def _has_section_header(
-        self,
-        non_empty_lines: List[str],
-        lowered_text: str,
-        aliases: List[str],
-    ) -> bool:
-        # First try line-based header detection.
-        for i, line in enumerate(non_empty_lines):
-            normalized_line = self.WHITESPACE_PATTERN.sub(" ", line.lower().strip())
-            for alias in aliases:
-                if (
-                    normalized_line == alias
-                    or normalized_line.startswith(alias + ":")
-                    or normalized_line.startswith(alias + " ")
-                ):
-                    if i + 1 < len(non_empty_lines):
-                        return True
-
-        # Then try text-level fallback for flattened content.
-        for alias in aliases:
-            pattern = rf"(?:^|\n|\s){re.escape(alias)}(?:\s*:|\s+|$)"
-            if re.search(pattern, lowered_text):
-                return True
-
-        return False
+    @classmethod
+    def _scanner(cls) -> _KeywordScanner:
+        """The compiled keyword / header scanner for this class's keyword lists, built once."""
+        scanner = cls.__dict__.get("_compiled_scanner")
+        if scanner is None:
+            scanner = _KeywordScanner(
+                keywords=[*cls.JD_KEYWORDS, *cls.DEGREE_KEYWORDS, *cls.SKILL_KEYWORDS, *cls.ROLE_KEYWORDS],
+                aliases=[alias for aliases in cls.SECTION_KEYWORDS.values() for alias in aliases],
+            )
+            cls._compiled_scanner = scanner
+        return scanner
 
     def _count_date_matches(self, text: str) -> int:
         count = 0
@@ -407,16 +548,14 @@ class ResumeValidityChecker:
 
     def _score_content_density(
         self,
-        text: str,
+        keywords: Set[str],
         stats: ValidityStats,
         reasons: List[str],
         warnings: List[str],
     ) -> float:
-        lowered_text = text.lower()
-
-        degree_hits = sum(1 for kw in self.DEGREE_KEYWORDS if kw in lowered_text)
-        skill_hits = sum(1 for kw in self.SKILL_KEYWORDS if kw in lowered_text)
-        role_hits = sum(1 for kw in self.ROLE_KEYWORDS if kw in lowered_text)
+        degree_hits = sum(1 for kw in self.DEGREE_KEYWORDS if kw in keywords)
+        skill_hits = sum(1 for kw in self.SKILL_KEYWORDS if kw in keywords)
+        role_hits = sum(1 for kw in self.ROLE_KEYWORDS if kw in keywords)
 
         score = 0.0
 
@@ -592,3 +731,62 @@ class ResumeValidityChecker:
                 seen.add(item)
                 output.append(item)
         return output
+
+
+def _read_txt(txt_path: str | Path) -> str:
+    return Path(txt_path).read_text(encoding="utf-8", errors="ignore")
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, max(size, 1)))
+        if not chunk:
+            return
+        yield chunk
+
+
+# 进程内共享的默认检查器（不可变，线程安全）
+validity_checker = ResumeValidityChecker()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Re-score every TXT file in a directory: ``python -m services.resume_validity_checker DIR``."""
+    parser = argparse.ArgumentParser(
+        prog="python -m services.resume_validity_checker",
+        description="Re-run the resume validity check over a directory of TXT files (e.g. storage/txts).",
+    )
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--pattern", default="*.txt", help="glob for files to check (default: *.txt)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread the files over")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per file")
+    parser.add_argument("--hard-fail-words", type=int, default=validity_checker.hard_fail_word_threshold)
+    parser.add_argument("--soft-min-words", type=int, default=validity_checker.soft_min_word_threshold)
+    parser.add_argument("--strong-words", type=int, default=validity_checker.strong_word_threshold)
+    args = parser.parse_args(argv)
+
+    if not args.directory.is_dir():
+        parser.error(f"not a directory: {args.directory}")
+    paths = sorted(path for path in args.directory.glob(args.pattern) if path.is_file())
+    checker = ResumeValidityChecker(
+        hard_fail_word_threshold=args.hard_fail_words,
+        soft_min_word_threshold=args.soft_min_words,
+        strong_word_threshold=args.strong_words,
+    )
+
+    decisions: Counter = Counter()
+    results = checker.check_texts((_read_txt(path) for path in paths), workers=args.workers)
+    for path, result in zip(paths, results):
+        decisions[result.decision] += 1
+        if args.json:
+            print(json.dumps({"file": path.name, **asdict(result)}, ensure_ascii=False))
+        else:
+            print(f"{result.decision}\t{result.overall_score:.1f}\t{result.confidence:.2f}\t{path.name}")
+
+    summary = ", ".join(f"{decision} {decisions[decision]}" for decision in ("PASS", "SOFT_FAIL", "HARD_FAIL"))
+    print(f"{len(paths)} files: {summary}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,37 @@
 import re
-from typing import Literal
+from dataclasses import dataclass
+from typing import Literal, Optional
 
 from config import settings
+from utils import metrics
 from utils.errors import DocumentExtractError, PDFParseError
 
 #处理空行，使文本更加规整，空白稳定，让后续llm处理不容易呗奇怪字符所干扰
 _SPACE_RE = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
 _BULLET_RE = re.compile(r"^[\s]*[•·●◦▪▫–—\-]+[\s]+", re.MULTILINE)
 _DASHES_RE = re.compile(r"[‐‑‒–—−]")
+# PDF 分页符：页面之间用 \f 连接，clean_text 后单独占一行，提示词压缩靠它识别页眉页脚
+PAGE_BREAK = "\f"
 
 
 def clean_text(raw: str) -> str:
+    """
+    Normalize line endings, dashes, bullets and spacing. Form feeds mark PDF page
+    breaks and come out as a line holding only PAGE_BREAK between non-empty pages.
+    """
     if not raw:
         return ""
 
     text = raw
     text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = text.replace("\f", "\n")
     text = _DASHES_RE.sub("-", text)
 
+    pages = [_clean_page(page) for page in text.split(PAGE_BREAK)]
+    return f"\n{PAGE_BREAK}\n".join(page for page in pages if page)
+
+
+def _clean_page(text: str) -> str:
+    # 按页处理项目符号：跨行的 [\s]* 不能吃掉分页符
     text = _BULLET_RE.sub("- ", text)
 
     lines = [line.strip() for line in text.split("\n")]
@@ -36,9 +49,12 @@ def clean_text(raw: str) -> str:
 
     text = _SPACE_RE.sub(" ", text)
 
-    text = text.strip()
+    return text.strip()
 
-    return text
+
+def without_page_breaks(text: str) -> str:
+    """``text`` with the PAGE_BREAK lines of clean_text removed."""
+    return text.replace(f"\n{PAGE_BREAK}\n", "\n").replace(PAGE_BREAK, "\n")
 
 
 def finalize_extracted_plaintext(raw: str, *, source: Literal["pdf", "docx"]) -> str:
@@ -48,3 +64,29 @@ def finalize_extracted_plaintext(raw: str, *, source: Literal["pdf", "docx"]) ->
             raise PDFParseError("PDF 不包含可提取的文本（疑似图片 PDF）")
         raise DocumentExtractError("文档不含足够可提取的文本（可能几乎为空或主要为图片）")
     return text
+
+
+@dataclass
+class ExtractedText:
+    """Final text of a document, plus whether a page / character budget cut it short."""
+    text: str
+    truncated: bool = False
+    # PDF 预检结果（services.pdf_triage.PdfTriage 转成的 dict），DOCX 为 None
+    triage: Optional[dict] = None
+
+
+def finalize_extracted(raw: str, *, source: Literal["pdf", "docx"], truncated: bool = False) -> ExtractedText:
+    """finalize_extracted_plaintext, then cap the result at EXTRACT_MAX_CHARS."""
+    text = finalize_extracted_plaintext(raw, source=source)
+    limit = settings.EXTRACT_MAX_CHARS
+    if limit > 0 and len(text) > limit:
+        text = text[:limit]
+        truncated = True
+    if truncated:
+        metrics.incr(f"extraction.truncated.{source}")
+    return ExtractedText(text=text, truncated=truncated)
+
+
+def char_budget_reached(extracted_chars: int) -> bool:
+    """True once the raw text read so far already fills the EXTRACT_MAX_CHARS budget."""
+    return 0 < settings.EXTRACT_MAX_CHARS <= extracted_chars
@@ -4,15 +4,33 @@ Keeps API routes clean by encapsulating complex operations.
 """
 from __future__ import annotations
 
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
 from config import settings
-from services.document_to_txt import extract_text_from_document
-from services.document_validate import allowed_types_hint, validate_upload_magic
-from storage.file_store import new_resume_id, save_upload_bytes, save_txt
-from utils.constants import ERR_UNSUPPORTED_FILE_TYPE
+from services.document_to_txt import extract_document
+from services.document_validate import (
+    UPLOAD_HEAD_BYTES,
+    allowed_types_hint,
+    validate_upload_body,
+    validate_upload_head,
+)
+from storage import upload_index
+from storage.file_store import (
+    new_resume_id,
+    new_spool_path,
+    promote_upload,
+    save_result_json,
+    save_txt,
+    save_upload_bytes,
+)
+from utils.constants import DEFAULT_CHUNK_SIZE, ERR_UNSUPPORTED_FILE_TYPE
 from utils.errors import (
     CorruptedPDFError,
     DocumentExtractError,
@@ -21,8 +39,10 @@ from utils.errors import (
     InvalidFileType,
     InvalidResumeError,
 )
+from utils import metrics
 from utils.logger import get_logger
-from services.resume_validity_checker import ResumeValidityChecker
+from services.resume_validity_checker import ValidityResult, validity_checker
+from services.text_clean_service import ExtractedText
 
 logger = get_logger("upload_service")
 
@@ -33,6 +53,13 @@ class UploadResult:
     resume_id: str
     text: str
     txt_path: str
+    sha256: str = ""
+    deduplicated: bool = False
+    validity: Optional[ValidityResult] = None
+    # 文本是否因页数 / 字数预算被截断；去重命中时未重新解析，为 None
+    truncated: Optional[bool] = False
+    # PDF 预检结果（见 services.pdf_triage）；去重命中时取自上传索引
+    triage: Optional[dict] = None
 
 
 @dataclass
@@ -57,72 +84,274 @@ def validate_filename(filename: Optional[str]) -> str:
     return ext
 
 
-def process_upload(ext: str, content: bytes) -> UploadResult:
+@dataclass
+class SpooledUpload:
     """
-    Process uploaded file content: validate, save, convert to text.
-    
-    Args:
-        ext: File extension (e.g., '.pdf', '.docx')
-        content: File content bytes
-        
-    Returns:
-        UploadResult with resume_id, text, and txt_path
-        
-    Raises:
-        InvalidFileType: If file content doesn't match extension
-        FileSizeError: If file is too small/large
-        EncryptedPDFError: If PDF is encrypted
-        CorruptedPDFError: If PDF is corrupted
-        DocumentExtractError: If text extraction fails
+    An upload fully received, hashed and magic-checked: held in memory (``content``)
+    or, above UPLOAD_MEMORY_SPOOL_BYTES, in a temporary file in UPLOAD_DIR (``path``).
     """
-    validate_upload_magic(ext, content)
-    
+    path: Optional[Path]
+    sha256: str
+    size: int
+    content: Optional[bytes] = None
+
+
+class UploadSpool:
+    """
+    Receive an upload chunk by chunk, hashing it and checking its magic bytes on the
+    way. Small uploads stay in memory; once the body passes UPLOAD_MEMORY_SPOOL_BYTES
+    it rolls over to a temp file in UPLOAD_DIR, so only one chunk is held from then on.
+    """
+
+    def __init__(self, ext: str) -> None:
+        self.ext = ext
+        self.path: Optional[Path] = None
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._head = b""
+        self._buffer = bytearray()
+        self._file = None
+
+    def write(self, chunk: bytes) -> None:
+        if len(self._head) < UPLOAD_HEAD_BYTES:
+            self._head += chunk[:UPLOAD_HEAD_BYTES - len(self._head)]
+            if len(self._head) >= UPLOAD_HEAD_BYTES:
+                validate_upload_head(self.ext, self._head)
+        self._hasher.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > settings.UPLOAD_MEMORY_SPOOL_BYTES:
+            self._roll_over()
+        if self._file is None:
+            self._buffer += chunk
+        else:
+            self._file.write(chunk)
+
+    def _roll_over(self) -> None:
+        self.path = new_spool_path(self.ext)
+        self._file = open(self.path, "wb")
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+        metrics.incr("upload.spooled_to_disk")
+
+    def finish(self) -> SpooledUpload:
+        if len(self._head) < UPLOAD_HEAD_BYTES:
+            validate_upload_head(self.ext, self._head)
+        digest = self._hasher.hexdigest()
+        if self._file is None:
+            content = bytes(self._buffer)
+            self._buffer = bytearray()
+            validate_upload_body(self.ext, content)
+            return SpooledUpload(path=None, sha256=digest, size=self.size, content=content)
+        self._file.close()
+        validate_upload_body(self.ext, self.path)
+        return SpooledUpload(path=self.path, sha256=digest, size=self.size)
+
+    def discard(self) -> None:
+        self._buffer = bytearray()
+        if self._file is not None:
+            self._file.close()
+            _safe_unlink(self.path)
+
+
+def spool_existing_file(ext: str, source: Path) -> SpooledUpload:
+    """Stage a file already on disk (e.g. a queued job input) as an upload, without reading it into memory."""
+    path = new_spool_path(ext)
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copyfile(source, path)
+
+    try:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as fh:
+            validate_upload_head(ext, fh.read(UPLOAD_HEAD_BYTES))
+            fh.seek(0)
+            while chunk := fh.read(DEFAULT_CHUNK_SIZE):
+                hasher.update(chunk)
+        validate_upload_body(ext, path)
+    except Exception:
+        _safe_unlink(path)
+        raise
+    return SpooledUpload(path=path, sha256=hasher.hexdigest(), size=path.stat().st_size)
+
+
+def page_slots_wanted(ext: str) -> int:
+    """Idle cpu slots worth borrowing to parse this upload (only PDFs fan out by page)."""
+    return max(0, settings.PDF_PAGE_WORKERS) if ext.lower() == ".pdf" else 0
+
+
+def process_spooled_upload(ext: str, spooled: SpooledUpload, force: bool = False) -> UploadResult:
+    """
+    Convert an upload received by UploadSpool. One held in memory is parsed straight
+    from the buffer; one spooled to disk is parsed from its temp file, which is then
+    renamed into place (or removed, for a duplicate or a failure).
+    """
+    if not force:
+        existing = _find_processed_upload(spooled.sha256)
+        if existing is not None:
+            if spooled.path is not None:
+                _safe_unlink(spooled.path)
+            return existing
+    metrics.incr("upload_dedup.misses")
+
     resume_id = new_resume_id()
-    upload_path = save_upload_bytes(resume_id, ext, content)
-    
+    if spooled.content is not None:
+        return _process_buffered(ext, spooled.content, spooled.sha256, resume_id)
+
+    # 先直接解析临时文件，成功后才改名归档：解析进程因超时 / 内存超限被杀掉时，
+    # 留下的只有调用方知道路径的临时文件（见 discard_spooled）
+    upload_path = None
     try:
-        text = extract_text_from_document(upload_path)
+        extracted = extract_document(spooled.path, ext, name=f"{resume_id}{ext}")
+        if settings.ARCHIVE_UPLOADS:
+            upload_path = promote_upload(spooled.path, resume_id, ext)
+        result = _finish_upload(spooled.sha256, resume_id, ext, extracted)
     except Exception:
         # Clean up uploaded file on any parsing failure
-        _safe_unlink(upload_path)
+        _safe_unlink(upload_path or spooled.path)
         raise
+    if upload_path is None:
+        _safe_unlink(spooled.path)
+    return result
+
 
-    # Validate that the extracted text is a valid resume
-    checker = ResumeValidityChecker()
-    validity_result = checker.check_text(text)
+def _process_buffered(ext: str, content: bytes, digest: str, resume_id: str) -> UploadResult:
+    # 直接从内存解析；原文件归档写盘在后台线程并行进行（ARCHIVE_UPLOADS 关闭时跳过）
+    archive = None
+    if settings.ARCHIVE_UPLOADS:
+        archive = _get_archive_pool().submit(save_upload_bytes, resume_id, ext, content)
+    try:
+        extracted = extract_document(content, ext, name=f"{resume_id}{ext}")
+        result = _finish_upload(digest, resume_id, ext, extracted)
+    except Exception:
+        if archive is not None:
+            _discard_archive(archive)
+        raise
+    if archive is not None:
+        archive.result()
+    return result
+
+
+def discard_spooled(spooled: SpooledUpload) -> None:
+    """Remove a spooled upload whose parse worker was killed before it could clean up."""
+    if spooled.path is not None:
+        _safe_unlink(spooled.path)
+
+
+def _finish_upload(digest: str, resume_id: str, ext: str, extracted: ExtractedText) -> UploadResult:
+    """Validity-check extracted text, save the TXT and index it under the content hash."""
+    text = extracted.text
+    validity_result = validity_checker.check_text(text, cleaned=True)
     if validity_result.decision == "HARD_FAIL":
-        _safe_unlink(upload_path)
         raise InvalidResumeError("上传的文件似乎不是一份有效的简历")
 
-    
     txt_path = save_txt(resume_id, text)
+    relative_txt_path = f"storage/txts/{txt_path.name}"
+    upload_index.record_upload(digest, resume_id, ext, relative_txt_path, extracted.triage)
     logger.info("Processed upload: resume_id=%s, txt=%s", resume_id, txt_path.name)
     
     return UploadResult(
         resume_id=resume_id,
         text=text,
-        txt_path=f"storage/txts/{txt_path.name}",
+        txt_path=relative_txt_path,
+        sha256=digest,
+        validity=validity_result,
+        truncated=extracted.truncated,
+        triage=extracted.triage,
     )
 
 
+_archive_pool: Optional[ThreadPoolExecutor] = None
+_archive_pool_lock = threading.Lock()
+
+
+def _get_archive_pool() -> ThreadPoolExecutor:
+    global _archive_pool
+    with _archive_pool_lock:
+        if _archive_pool is None:
+            _archive_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="archive")
+        return _archive_pool
+
+
+def _discard_archive(archive: Future) -> None:
+    """Wait for a background archive write of a rejected upload and remove the file."""
+    try:
+        _safe_unlink(archive.result())
+    except Exception:
+        pass
+
+
+def _find_processed_upload(digest: str) -> Optional[UploadResult]:
+    """Return the stored result for an already processed upload, if its TXT is still on disk."""
+    entry = upload_index.lookup(digest)
+    if entry is None:
+        return None
+    path = settings.BASE_DIR / entry.txt_path
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        logger.warning("Indexed TXT missing for resume_id=%s, reprocessing", entry.resume_id)
+        return None
+
+    metrics.incr("upload_dedup.hits")
+    logger.info("Duplicate upload: reusing resume_id=%s", entry.resume_id)
+    return UploadResult(
+        resume_id=entry.resume_id,
+        text=text,
+        txt_path=entry.txt_path,
+        sha256=digest,
+        deduplicated=True,
+        validity=validity_checker.check_text(text, cleaned=True),
+        truncated=None,
+        triage=entry.triage,
+    )
+
+
+def save_structured_result(resume_id: str, json_text: str) -> None:
+    """Persist a structured result and link it to the upload in the content-hash index."""
+    path = save_result_json(resume_id, json_text)
+    upload_index.record_result(resume_id, f"storage/results/{path.name}")
+
+
+def load_stored_result(resume_id: str) -> Optional[str]:
+    """Return the saved structured-result JSON for ``resume_id``, if extraction ran before."""
+    result_path = upload_index.result_path_for(resume_id)
+    if not result_path:
+        return None
+    try:
+        return (settings.BASE_DIR / result_path).read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def stored_triage(resume_id: str) -> Optional[dict]:
+    """Return the PDF triage recorded for the upload behind ``resume_id`` (None for DOCX)."""
+    entry = upload_index.lookup_resume(resume_id)
+    return entry.triage if entry else None
+
+
 def process_single_file_in_batch(
     filename: str,
     ext: str,
-    content: bytes,
+    spooled: SpooledUpload,
+    force: bool = False,
 ) -> tuple[Optional[dict], Optional[dict]]:
     """
-    Process a single file in batch upload, reusing the core process_upload logic.
+    Process a single file in batch upload, reusing the core process_spooled_upload logic.
     
     Returns:
         Tuple of (success_dict, failure_dict) - one will be None
     """
     try:
-        result = process_upload(ext, content)
+        result = process_spooled_upload(ext, spooled, force)
         logger.info("[BATCH] Processed %s -> resume_id=%s", filename, result.resume_id)
         return {
             "resume_id": result.resume_id,
             "filename": filename,
             "txt_path": result.txt_path,
+            "deduplicated": result.deduplicated,
+            "truncated": result.truncated,
+            "pdf_triage": result.triage,
         }, None
     except (InvalidFileType, FileSizeError, EncryptedPDFError, CorruptedPDFError, DocumentExtractError) as exc:
         logger.error("[BATCH] %s: %s", filename, exc)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import uuid
 from pathlib import Path
 
@@ -30,6 +31,19 @@ def save_upload_bytes(resume_id: str, ext: str, content: bytes) -> Path:
     return path
 
 
+def new_spool_path(ext: str) -> Path:
+    """Temporary path in UPLOAD_DIR for an upload that is still being received."""
+    ensure_storage_dirs()
+    return settings.UPLOAD_DIR / f".{uuid.uuid4().hex}{ext.lower()}.part"
+
+
+def promote_upload(spool_path: Path, resume_id: str, ext: str) -> Path:
+    """Atomically move a fully received upload to its final name."""
+    path = upload_stored_path(resume_id, ext)
+    os.replace(spool_path, path)
+    return path
+
+
 def txt_path(resume_id: str) -> Path:
     return settings.TXT_DIR / f"{resume_id}.txt"
 
@@ -0,0 +1,352 @@
+"""
+Persistent queue for bulk parse jobs.
+
+A job is a set of uploaded files; every file is one row in ``job_items`` that moves
+queued -> running -> succeeded / failed. Workers claim rows with a lease that they
+renew while the item runs, so a row held by a worker that died is picked up again
+once the lease runs out (and fails once it has used up JOB_MAX_ATTEMPTS). Status
+updates only apply to rows this process still leases.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import settings
+from storage import sqlite_db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    mode TEXT,
+    force INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    ext TEXT,
+    input_path TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    resume_id TEXT,
+    deduplicated INTEGER,
+    error TEXT,
+    started_at REAL,
+    parsed_at REAL,
+    finished_at REAL,
+    parse_seconds REAL,
+    extract_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_job ON job_items(job_id, position);
+CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, available_at);
+"""
+
+STATUSES = ("queued", "running", "succeeded", "failed")
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+# 条目仍由本进程持有（参数依次为 id、owner）
+_OWNED = "id = ? AND status = 'running' AND owner = ?"
+_ABANDONED_ERROR = "worker stopped or timed out on every attempt"
+
+
+@dataclass
+class JobItemInput:
+    """One submitted file: either spooled to ``input_path`` or rejected with ``error``."""
+    filename: str
+    ext: Optional[str] = None
+    input_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class JobItem:
+    id: int
+    job_id: str
+    position: int
+    filename: str
+    ext: Optional[str]
+    input_path: Optional[str]
+    status: str
+    attempts: int
+    resume_id: Optional[str]
+    deduplicated: bool
+    error: Optional[str]
+    mode: Optional[str] = None
+    force: bool = False
+
+
+@dataclass
+class Job:
+    id: str
+    mode: Optional[str]
+    force: bool
+    total: int
+    created_at: float
+
+
+_ITEM_COLUMNS = (
+    "i.id, i.job_id, i.position, i.filename, i.ext, i.input_path, i.status, i.attempts, "
+    "i.resume_id, i.deduplicated, i.error, j.mode, j.force"
+)
+
+
+def _connection() -> sqlite3.Connection:
+    return sqlite_db.connect(settings.JOB_DB_PATH, _SCHEMA)
+
+
+def _item_from_row(row) -> JobItem:
+    return JobItem(
+        id=row[0],
+        job_id=row[1],
+        position=row[2],
+        filename=row[3],
+        ext=row[4],
+        input_path=row[5],
+        status=row[6],
+        attempts=row[7],
+        resume_id=row[8],
+        deduplicated=bool(row[9]),
+        error=row[10],
+        mode=row[11],
+        force=bool(row[12]),
+    )
+
+
+def create_job(job_id: str, mode: Optional[str], force: bool, items: list[JobItemInput]) -> None:
+    now = time.time()
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, mode, force, total, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, mode, int(force), len(items), now),
+        )
+        conn.executemany(
+            "INSERT INTO job_items (job_id, position, filename, ext, input_path, status, "
+            "available_at, error, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    job_id,
+                    position,
+                    item.filename,
+                    item.ext,
+                    item.input_path,
+                    "failed" if item.error else "queued",
+                    now,
+                    item.error,
+                    now if item.error else None,
+                )
+                for position, item in enumerate(items)
+            ],
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def claim_next() -> Optional[JobItem]:
+    """
+    Lease the oldest runnable item to this process, or return None if there is none.
+    An expired lease that already used up JOB_MAX_ATTEMPTS fails its item instead of
+    being claimed again: a file that kills or hangs every worker must not loop forever.
+    """
+    now = time.time()
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE job_items SET status = 'failed', error = ?, owner = NULL, lease_until = NULL, "
+            "finished_at = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (_ABANDONED_ERROR, now, now, settings.JOB_MAX_ATTEMPTS),
+        )
+        row = conn.execute(
+            f"SELECT {_ITEM_COLUMNS} FROM job_items i JOIN jobs j ON j.id = i.job_id "
+            "WHERE (i.status = 'queued' AND i.available_at <= ?) "
+            "OR (i.status = 'running' AND i.lease_until < ? AND i.attempts < ?) "
+            "ORDER BY i.id LIMIT 1",
+            (now, now, settings.JOB_MAX_ATTEMPTS),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE job_items SET status = 'running', attempts = attempts + 1, owner = ?, "
+                "lease_until = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (_OWNER, now + settings.JOB_LEASE_SECONDS, now, row[0]),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    item = _item_from_row(row)
+    item.status = "running"
+    item.attempts += 1
+    return item
+
+
+def renew_lease(item_id: int) -> bool:
+    """Extend this process's lease on a running item; False if the item is no longer ours."""
+    return _connection().execute(
+        f"UPDATE job_items SET lease_until = ? WHERE {_OWNED}",
+        (time.time() + settings.JOB_LEASE_SECONDS, item_id, _OWNER),
+    ).rowcount == 1
+
+
+# 以下写操作都只对本进程仍持有租约的条目生效；返回 False 说明租约已被别的 worker 接手，
+# 调用方应当停手，不要覆盖新持有者的状态
+def record_parsed(item_id: int, resume_id: str, deduplicated: bool, parse_seconds: float) -> bool:
+    return _connection().execute(
+        "UPDATE job_items SET resume_id = ?, deduplicated = COALESCE(deduplicated, ?), parsed_at = ?, parse_seconds = ? "
+        f"WHERE {_OWNED}",
+        (resume_id, int(deduplicated), time.time(), parse_seconds, item_id, _OWNER),
+    ).rowcount == 1
+
+
+def complete_item(item_id: int, extract_seconds: Optional[float]) -> bool:
+    return _connection().execute(
+        "UPDATE job_items SET status = 'succeeded', error = NULL, owner = NULL, lease_until = NULL, "
+        f"finished_at = ?, extract_seconds = ? WHERE {_OWNED}",
+        (time.time(), extract_seconds, item_id, _OWNER),
+    ).rowcount == 1
+
+
+def fail_item(item_id: int, error: str) -> bool:
+    return _connection().execute(
+        "UPDATE job_items SET status = 'failed', error = ?, owner = NULL, lease_until = NULL, "
+        f"finished_at = ? WHERE {_OWNED}",
+        (error, time.time(), item_id, _OWNER),
+    ).rowcount == 1
+
+
+def retry_item(item_id: int, error: str, delay_seconds: float) -> bool:
+    return _connection().execute(
+        "UPDATE job_items SET status = 'queued', error = ?, owner = NULL, lease_until = NULL, "
+        f"available_at = ? WHERE {_OWNED}",
+        (error, time.time() + delay_seconds, item_id, _OWNER),
+    ).rowcount == 1
+
+
+def release_item(item_id: int) -> bool:
+    """Hand an interrupted item back to the queue without counting the attempt."""
+    return _connection().execute(
+        "UPDATE job_items SET status = 'queued', attempts = MAX(attempts - 1, 0), owner = NULL, "
+        f"lease_until = NULL WHERE {_OWNED}",
+        (item_id, _OWNER),
+    ).rowcount == 1
+
+
+def reclaim_orphans() -> int:
+    """
+    Requeue items leased by processes on this host that are no longer alive; items
+    that already used up JOB_MAX_ATTEMPTS fail instead. Returns the requeued count.
+    """
+    host = socket.gethostname()
+    conn = _connection()
+    owners = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT owner FROM job_items WHERE status = 'running' AND owner LIKE ?",
+            (f"{host}:%",),
+        )
+    ]
+    reclaimed = 0
+    for owner in owners:
+        pid = int(owner.rsplit(":", 1)[1])
+        if owner != _OWNER and _pid_alive(pid):
+            continue
+        conn.execute(
+            "UPDATE job_items SET status = 'failed', error = ?, owner = NULL, lease_until = NULL, "
+            "finished_at = ? WHERE status = 'running' AND owner = ? AND attempts >= ?",
+            (_ABANDONED_ERROR, time.time(), owner, settings.JOB_MAX_ATTEMPTS),
+        )
+        reclaimed += conn.execute(
+            "UPDATE job_items SET status = 'queued', owner = NULL, lease_until = NULL "
+            "WHERE status = 'running' AND owner = ?",
+            (owner,),
+        ).rowcount
+    return reclaimed
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    row = _connection().execute(
+        "SELECT id, mode, force, total, created_at FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return Job(id=row[0], mode=row[1], force=bool(row[2]), total=row[3], created_at=row[4])
+
+
+def status_counts(job_id: Optional[str] = None) -> dict:
+    """Item counts per status, for one job or for the whole queue."""
+    if job_id is None:
+        rows = _connection().execute("SELECT status, COUNT(*) FROM job_items GROUP BY status")
+    else:
+        rows = _connection().execute(
+            "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+        )
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(dict(rows.fetchall()))
+    return counts
+
+
+def stage_stats(job_id: str) -> dict:
+    """Per-stage item count, busy time and throughput (items per wall-clock second)."""
+    conn = _connection()
+    parsed, parse_total, first_started, last_parsed = conn.execute(
+        "SELECT COUNT(parse_seconds), COALESCE(SUM(parse_seconds), 0), MIN(started_at), MAX(parsed_at) "
+        "FROM job_items WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    extracted, extract_total, first_parsed, last_finished = conn.execute(
+        "SELECT COUNT(extract_seconds), COALESCE(SUM(extract_seconds), 0), MIN(parsed_at), MAX(finished_at) "
+        "FROM job_items WHERE job_id = ? AND extract_seconds IS NOT NULL",
+        (job_id,),
+    ).fetchone()
+    return {
+        "parse": _stage(parsed, parse_total, first_started, last_parsed),
+        "extract": _stage(extracted, extract_total, first_parsed, last_finished),
+    }
+
+
+def _stage(count: int, total: float, first: Optional[float], last: Optional[float]) -> dict:
+    wall = (last - first) if first is not None and last is not None else 0.0
+    return {
+        "completed": count,
+        "busy_seconds": round(total, 3),
+        "avg_seconds": round(total / count, 3) if count else 0.0,
+        "wall_seconds": round(wall, 3),
+        "items_per_second": round(count / wall, 3) if wall > 0 else None,
+    }
+
+
+def list_items(job_id: str, offset: int = 0, limit: int = 100, status: Optional[str] = None) -> list[JobItem]:
+    query = f"SELECT {_ITEM_COLUMNS} FROM job_items i JOIN jobs j ON j.id = i.job_id WHERE i.job_id = ?"
+    params: list = [job_id]
+    if status:
+        query += " AND i.status = ?"
+        params.append(status)
+    query += " ORDER BY i.position LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    return [_item_from_row(row) for row in _connection().execute(query, params)]
@@ -0,0 +1,197 @@
+"""
+Content-addressed cache for LLM responses.
+
+Two tiers: a per-process in-memory LRU in front of a SQLite database under
+STORAGE_DIR (see storage.sqlite_db), which several uvicorn workers on the
+same host can read and write concurrently.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+from storage import sqlite_db
+from utils import metrics
+from utils.logger import get_logger
+
+logger = get_logger("llm_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    usage TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access);
+"""
+
+_memory: "OrderedDict[str, tuple[float, str, dict]]" = OrderedDict()
+_memory_lock = threading.Lock()
+_puts_since_evict = 0
+_evict_lock = threading.Lock()
+
+
+def cache_key(provider: str, model: str, prompt: str, temperature: float) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([provider, model, prompt_hash, temperature])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _connection() -> sqlite3.Connection:
+    return sqlite_db.connect(settings.LLM_CACHE_PATH, _SCHEMA)
+
+
+def get(provider: str, model: str, prompt: str, temperature: float) -> Optional[tuple[str, dict]]:
+    """Return the cached (content, usage) pair, or None on a miss or expired entry."""
+    key = cache_key(provider, model, prompt, temperature)
+    now = time.time()
+
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            created_at, content, usage = entry
+            if now - created_at <= settings.LLM_CACHE_TTL_SECONDS:
+                _memory.move_to_end(key)
+                metrics.incr("llm_cache.hits.memory")
+                metrics.incr("llm_cache.bytes_served", len(content))
+                return content, usage
+            del _memory[key]
+
+    try:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT content, usage, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and now - row[2] > settings.LLM_CACHE_TTL_SECONDS:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            row = None
+        if row is not None:
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+    except sqlite3.Error as exc:
+        logger.warning("LLM cache read failed: %s", exc)
+        metrics.incr("llm_cache.errors")
+        row = None
+
+    if row is None:
+        metrics.incr("llm_cache.misses")
+        return None
+
+    content, usage_json, created_at = row
+    usage = json.loads(usage_json)
+    _remember(key, created_at, content, usage)
+    metrics.incr("llm_cache.hits.disk")
+    metrics.incr("llm_cache.bytes_served", len(content))
+    return content, usage
+
+
+def put(provider: str, model: str, prompt: str, temperature: float, content: str, usage: dict) -> None:
+    """Store a response; callers put only responses that passed their own validation."""
+    key = cache_key(provider, model, prompt, temperature)
+    now = time.time()
+    _remember(key, now, content, usage)
+
+    usage_json = json.dumps(usage, ensure_ascii=False)
+    size = len(content.encode("utf-8")) + len(usage_json)
+    try:
+        _connection().execute(
+            "INSERT OR REPLACE INTO llm_cache "
+            "(key, provider, model, content, usage, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, content, usage_json, size, now, now),
+        )
+    except sqlite3.Error as exc:
+        logger.warning("LLM cache write failed: %s", exc)
+        metrics.incr("llm_cache.errors")
+        return
+    metrics.incr("llm_cache.bytes_written", size)
+    _maybe_evict()
+
+
+def invalidate(provider: str, model: str, prompt: str, temperature: float) -> None:
+    """Drop one entry from both tiers, e.g. a cached response that no longer validates."""
+    key = cache_key(provider, model, prompt, temperature)
+    with _memory_lock:
+        _memory.pop(key, None)
+    try:
+        _connection().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+    except sqlite3.Error as exc:
+        logger.warning("LLM cache invalidation failed: %s", exc)
+        metrics.incr("llm_cache.errors")
+        return
+    metrics.incr("llm_cache.invalidated")
+
+
+def _remember(key: str, created_at: float, content: str, usage: dict) -> None:
+    with _memory_lock:
+        _memory[key] = (created_at, content, usage)
+        _memory.move_to_end(key)
+        while len(_memory) > settings.LLM_CACHE_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+            metrics.incr("llm_cache.evictions.memory")
+
+
+def _maybe_evict() -> None:
+    """Run disk eviction every LLM_CACHE_EVICT_EVERY writes rather than on each one."""
+    global _puts_since_evict
+    with _evict_lock:
+        _puts_since_evict += 1
+        if _puts_since_evict < settings.LLM_CACHE_EVICT_EVERY:
+            return
+        _puts_since_evict = 0
+    evict()
+
+
+def evict() -> int:
+    """Drop expired rows, then least recently used rows until the table fits LLM_CACHE_MAX_BYTES."""
+    conn = _connection()
+    removed = 0
+    try:
+        cutoff = time.time() - settings.LLM_CACHE_TTL_SECONDS
+        removed += conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,)).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > settings.LLM_CACHE_MAX_BYTES:
+            excess = total - settings.LLM_CACHE_MAX_BYTES
+            rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall()
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+            removed += len(doomed)
+    except sqlite3.Error as exc:
+        logger.warning("LLM cache eviction failed: %s", exc)
+        metrics.incr("llm_cache.errors")
+        return removed
+
+    if removed:
+        metrics.incr("llm_cache.evictions.disk", removed)
+    return removed
+
+
+def stats() -> dict:
+    with _memory_lock:
+        memory_entries = len(_memory)
+    try:
+        entries, total_bytes = _connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+    except sqlite3.Error:
+        entries, total_bytes = None, None
+    return {"memory_entries": memory_entries, "disk_entries": entries, "disk_bytes": total_bytes}
+
+
+metrics.register_collector("llm_cache", stats)
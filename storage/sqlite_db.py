@@ -0,0 +1,32 @@
+"""
+Shared helper for the small SQLite databases kept under STORAGE_DIR.
+
+Connections are cached per thread (sqlite3 connections must not be shared across
+threads) and opened in WAL mode with a busy timeout, so several uvicorn workers
+and parse processes on one host can use the same file concurrently.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+_local = threading.local()
+
+
+def connect(path: Path, schema: str) -> sqlite3.Connection:
+    """Return this thread's connection to ``path``, creating the file and schema on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = str(path)
+    conn = connections.get(key)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(schema)
+        connections[key] = conn
+    return conn
@@ -0,0 +1,136 @@
+"""
+Content-hash index of processed uploads: SHA-256 of the upload bytes -> resume_id,
+TXT path, PDF triage result and (once extraction has run) structured result path.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import settings
+from storage import sqlite_db
+from utils.logger import get_logger
+
+logger = get_logger("upload_index")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    sha256 TEXT PRIMARY KEY,
+    resume_id TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    txt_path TEXT NOT NULL,
+    result_path TEXT,
+    created_at REAL NOT NULL,
+    triage TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_resume_id ON uploads(resume_id);
+"""
+
+_migrated_paths: set[str] = set()
+
+
+@dataclass
+class IndexEntry:
+    sha256: str
+    resume_id: str
+    ext: str
+    txt_path: str
+    result_path: Optional[str]
+    # PDF 预检结果（verdict、页数、抽样页统计、missing_eof），DOCX 和旧记录为 None
+    triage: Optional[dict] = None
+
+
+def _connection() -> sqlite3.Connection:
+    conn = sqlite_db.connect(settings.UPLOAD_INDEX_PATH, _SCHEMA)
+    key = str(settings.UPLOAD_INDEX_PATH)
+    if key not in _migrated_paths:
+        _add_triage_column(conn)
+        _migrated_paths.add(key)
+    return conn
+
+
+def _add_triage_column(conn: sqlite3.Connection) -> None:
+    # 旧库没有 triage 列；多个进程可能同时补列，重复列错误直接忽略
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(uploads)")}
+    if "triage" in columns:
+        return
+    try:
+        conn.execute("ALTER TABLE uploads ADD COLUMN triage TEXT")
+    except sqlite3.OperationalError as exc:
+        if "duplicate column" not in str(exc):
+            raise
+
+
+def _entry_from_row(row) -> IndexEntry:
+    *fields, triage = row
+    return IndexEntry(*fields, triage=json.loads(triage) if triage else None)
+
+
+def lookup(sha256: str) -> Optional[IndexEntry]:
+    try:
+        row = _connection().execute(
+            "SELECT sha256, resume_id, ext, txt_path, result_path, triage FROM uploads WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+    except sqlite3.Error as exc:
+        logger.warning("Upload index lookup failed: %s", exc)
+        return None
+    return _entry_from_row(row) if row else None
+
+
+def lookup_resume(resume_id: str) -> Optional[IndexEntry]:
+    """The most recent upload indexed under ``resume_id``."""
+    try:
+        row = _connection().execute(
+            "SELECT sha256, resume_id, ext, txt_path, result_path, triage FROM uploads "
+            "WHERE resume_id = ? ORDER BY created_at DESC LIMIT 1",
+            (resume_id,),
+        ).fetchone()
+    except sqlite3.Error as exc:
+        logger.warning("Upload index lookup failed: %s", exc)
+        return None
+    return _entry_from_row(row) if row else None
+
+
+def record_upload(
+    sha256: str,
+    resume_id: str,
+    ext: str,
+    txt_path: str,
+    triage: Optional[dict] = None,
+) -> None:
+    """Point ``sha256`` at a freshly processed upload (replacing any older entry)."""
+    try:
+        _connection().execute(
+            "INSERT OR REPLACE INTO uploads (sha256, resume_id, ext, txt_path, result_path, created_at, triage) "
+            "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+            (sha256, resume_id, ext, txt_path, time.time(), json.dumps(triage) if triage else None),
+        )
+    except sqlite3.Error as exc:
+        logger.warning("Upload index write failed: %s", exc)
+
+
+def record_result(resume_id: str, result_path: str) -> None:
+    """Attach a structured result to the upload(s) indexed under ``resume_id``."""
+    try:
+        _connection().execute(
+            "UPDATE uploads SET result_path = ? WHERE resume_id = ?",
+            (result_path, resume_id),
+        )
+    except sqlite3.Error as exc:
+        logger.warning("Upload index write failed: %s", exc)
+
+
+def result_path_for(resume_id: str) -> Optional[str]:
+    try:
+        row = _connection().execute(
+            "SELECT result_path FROM uploads WHERE resume_id = ? AND result_path IS NOT NULL",
+            (resume_id,),
+        ).fetchone()
+    except sqlite3.Error as exc:
+        logger.warning("Upload index lookup failed: %s", exc)
+        return None
+    return row[0] if row else None
@@ -0,0 +1,48 @@
+"""
+Training samples for the local resume classifier: the ResumeValidityChecker stats of a
+text together with the resume / not-resume verdict the LLM classifier gave for it.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from typing import Iterator
+
+from config import settings
+from storage import sqlite_db
+from utils.logger import get_logger
+
+logger = get_logger("validity_samples")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stats TEXT NOT NULL,
+    is_resume INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _connection() -> sqlite3.Connection:
+    return sqlite_db.connect(settings.VALIDITY_SAMPLES_PATH, _SCHEMA)
+
+
+def record(stats: dict, is_resume: bool, source: str = "llm") -> None:
+    """Store one labelled sample; ``stats`` is ValidityStats as a dict."""
+    try:
+        _connection().execute(
+            "INSERT INTO samples (stats, is_resume, source, created_at) VALUES (?, ?, ?, ?)",
+            (json.dumps(stats, ensure_ascii=False), int(is_resume), source, time.time()),
+        )
+    except sqlite3.Error as exc:
+        logger.warning("Validity sample write failed: %s", exc)
+
+
+def iter_samples() -> Iterator[tuple[dict, bool]]:
+    """Yield (stats dict, is_resume) for every stored sample, oldest first."""
+    rows = _connection().execute("SELECT stats, is_resume FROM samples ORDER BY id")
+    for stats, is_resume in rows:
+        yield json.loads(stats), bool(is_resume)
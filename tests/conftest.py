@@ -0,0 +1,61 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config import settings  # noqa: E402
+from services import llm_service  # noqa: E402
+from utils import executors  # noqa: E402
+
+RESUME_JSON = json.dumps({"name": "Jane Doe", "email": "jane@example.com", "skills": ["Python"]})
+
+
+class StubLLM:
+    """
+    Local stand-in for every provider: answers the is_resume prompt and the
+    extraction prompt, or raises / waits when a test scripts it to.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.failures: list[Exception] = []
+        self.delay = 0.0
+        self.gate: Optional[asyncio.Event] = None
+        self.extraction = RESUME_JSON
+
+    async def __call__(self, prompt: str, model: str) -> tuple[str, dict]:
+        self.calls.append(prompt)
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            raise self.failures.pop(0)
+        if prompt.startswith("You are a resume classification system."):
+            return '{"is_resume": true}', {"total_tokens": 10}
+        return self.extraction, {"total_tokens": 100}
+
+
+@pytest.fixture
+def stub_llm(monkeypatch) -> StubLLM:
+    stub = StubLLM()
+    for provider in list(llm_service._ASYNC_CALLERS):
+        monkeypatch.setitem(llm_service._ASYNC_CALLERS, provider, stub)
+    # 信号量绑定在创建它的事件循环上，每个测试用新的
+    monkeypatch.setattr(llm_service, "_provider_semaphores", {})
+    monkeypatch.setattr(llm_service, "_global_semaphore", None)
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "VALIDITY_SAMPLES_ENABLED", False)
+    monkeypatch.setattr(settings, "RESUME_CLASSIFIER_ENABLED", False)
+    return stub
+
+
+@pytest.fixture(autouse=True)
+def fresh_executor_semaphores(monkeypatch):
+    monkeypatch.setattr(executors.io_executor, "_semaphore", None)
+    monkeypatch.setattr(executors.cpu_executor, "_semaphore", None)
@@ -0,0 +1,30 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import api
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def must_not_parse(*args, **kwargs):
+        raise AssertionError("upload parsed before the mode was checked")
+
+    monkeypatch.setattr(api, "process_spooled_upload", must_not_parse)
+    app = FastAPI()
+    app.include_router(api.router)
+    return TestClient(app)
+
+
+def test_parse_rejects_unknown_mode_before_parsing(client):
+    response = client.post(
+        "/api/parse", params={"mode": "triple_call"}, files={"file": ("cv.pdf", b"%PDF-1.4", "application/pdf")}
+    )
+    assert response.status_code == 400
+    assert "triple_call" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("mode", ["triple_call", 3, ["two_call"]])
+def test_extract_rejects_unknown_mode(client, mode):
+    response = client.post("/api/extract", json={"text": "Jane Doe, software engineer", "mode": mode})
+    assert response.status_code == 400
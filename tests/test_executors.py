@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import executors
+from utils.executors import BoundedExecutor
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_cancelled_call_keeps_its_slot_until_the_work_finishes(pool):
+    executor = BoundedExecutor("test", lambda: pool, 1, 10)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "first"
+
+    async def run():
+        first = asyncio.create_task(executor.run(blocking))
+        await asyncio.to_thread(started.wait, 5)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert executor.stats()["running"] == 1
+
+        second = asyncio.create_task(executor.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        assert not second.done() and executor.stats()["queued"] == 1
+
+        release.set()
+        assert await second == "second"
+        await asyncio.sleep(0)
+        return executor.stats()
+
+    stats = asyncio.run(run())
+    assert stats["running"] == 0 and stats["completed"] == 2
+
+
+def test_cancelled_call_that_has_not_started_frees_its_slot(pool):
+    executor = BoundedExecutor("test", lambda: pool, 2, 10)
+    gate = threading.Event()
+    pool.submit(gate.wait, 5)
+    pool.submit(gate.wait, 5)  # 线程池占满，下面的调用只能排队
+
+    async def run():
+        call = asyncio.create_task(executor.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0.01)
+        return executor.stats()
+
+    stats = asyncio.run(run())
+    gate.set()
+    assert stats["running"] == 0
+
+
+def test_borrowed_idle_slots_are_held_until_the_call_finishes(pool):
+    executor = BoundedExecutor("test", lambda: pool, 3, 10, collect_worker_metrics=True)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def fan_out():
+        started.set()
+        gate.wait(5)
+        return executors.granted_page_workers()
+
+    async def run():
+        first = asyncio.create_task(executor.run(fan_out, borrow_idle=4))
+        await asyncio.to_thread(started.wait, 5)
+        assert executor.stats()["borrowed"] == 2
+
+        second = asyncio.create_task(executor.run(lambda: "second", borrow_idle=4))
+        await asyncio.sleep(0.05)
+        assert not second.done()
+
+        gate.set()
+        return await first, await second, executor.stats()
+
+    granted, second, stats = asyncio.run(run())
+    assert granted == 2 and second == "second"
+    assert executors.granted_page_workers() == 0
+    assert stats["borrowed"] == 0 and stats["running"] == 0
+
+
+def test_queued_calls_are_not_overtaken_by_borrowing(pool):
+    executor = BoundedExecutor("test", lambda: pool, 2, 10, collect_worker_metrics=True)
+    gate = threading.Event()
+
+    async def run():
+        busy = [asyncio.create_task(executor.run(gate.wait, 5)) for _ in range(2)]
+        queued = asyncio.create_task(executor.run(executors.granted_page_workers, borrow_idle=1))
+        waiting = asyncio.create_task(executor.run(executors.granted_page_workers))
+        await asyncio.sleep(0.05)
+        gate.set()
+        await asyncio.gather(*busy)
+        return await queued, await waiting
+
+    # 排在后面的调用还在等时，前一个不能把名额借走
+    assert asyncio.run(run()) == (0, 0)
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from config import settings
+from services import job_service
+from services.upload_service import UploadResult
+from storage import job_store
+from storage.job_store import JobItemInput
+from utils.errors import LLMError
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch, stub_llm):
+    """A job queue in tmp_path whose parse stage reads the input file as text."""
+    monkeypatch.setattr(settings, "JOB_DB_PATH", tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(settings, "UPLOAD_INDEX_PATH", tmp_path / "uploads.sqlite3")
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "JOB_WORKERS", 2)
+
+    results: dict[str, str] = {}
+
+    async def parse_job_input(ext, input_path, force):
+        text = open(input_path, encoding="utf-8").read()
+        return UploadResult(resume_id=os.path.basename(input_path), text=text, txt_path="")
+
+    monkeypatch.setattr(job_service, "parse_job_input", parse_job_input)
+    monkeypatch.setattr(job_service, "save_structured_result", results.__setitem__)
+    monkeypatch.setattr(job_service, "load_stored_result", results.get)
+
+    def create(job_id: str, count: int, rejected: int = 0) -> None:
+        items = []
+        for position in range(count):
+            path = tmp_path / f"{job_id}-{position}.txt"
+            path.write_text(f"Jane Doe {position}\nSoftware engineer, Python, SQL.\n" * 5, encoding="utf-8")
+            items.append(JobItemInput(filename=path.name, ext=".txt", input_path=str(path)))
+        items += [JobItemInput(filename=f"bad-{i}.exe", error="unsupported") for i in range(rejected)]
+        job_store.create_job(job_id, None, False, items)
+
+    create.results = results
+    return create
+
+
+def _set_owner(item_id: int, owner: str) -> None:
+    job_store._connection().execute("UPDATE job_items SET owner = ? WHERE id = ?", (owner, item_id))
+
+
+def test_claim_leases_each_item_once(jobs):
+    jobs("job", 2, rejected=1)
+
+    first = job_store.claim_next()
+    second = job_store.claim_next()
+    assert (first.position, second.position) == (0, 1)
+    assert first.status == "running" and first.attempts == 1
+    assert job_store.claim_next() is None
+    assert job_store.status_counts("job") == {"queued": 0, "running": 2, "succeeded": 0, "failed": 1}
+
+
+def test_expired_lease_is_claimed_again(jobs, monkeypatch):
+    jobs("job", 1)
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.0)
+    item = job_store.claim_next()
+    time.sleep(0.01)
+
+    again = job_store.claim_next()
+    assert again.id == item.id and again.attempts == 2
+
+
+def test_renewed_lease_is_not_claimed_again(jobs, monkeypatch):
+    jobs("job", 1)
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.0)
+    item = job_store.claim_next()
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 60.0)
+
+    assert job_store.renew_lease(item.id)
+    assert job_store.claim_next() is None
+    _set_owner(item.id, "elsewhere:1")
+    assert not job_store.renew_lease(item.id)
+
+
+def test_expired_lease_at_max_attempts_fails_instead_of_looping(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+    jobs("job", 1)
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.0)
+    assert job_store.claim_next().attempts == 1
+    time.sleep(0.01)
+    assert job_store.claim_next().attempts == 2
+    time.sleep(0.01)
+
+    assert job_store.claim_next() is None
+    [item] = job_store.list_items("job")
+    assert item.status == "failed" and item.error == job_store._ABANDONED_ERROR
+
+
+def test_stale_worker_cannot_overwrite_new_owner(jobs, stub_llm):
+    jobs("job", 1)
+    item = job_store.claim_next()
+    _set_owner(item.id, "elsewhere:1")
+
+    asyncio.run(job_service._run_item(item))
+
+    [entry] = job_service.job_results("job", 0, 10)
+    assert entry["status"] == "running" and entry["resume_id"] is None
+    assert os.path.exists(item.input_path)
+    for update in (
+        lambda: job_store.complete_item(item.id, None),
+        lambda: job_store.fail_item(item.id, "boom"),
+        lambda: job_store.retry_item(item.id, "boom", 0),
+        lambda: job_store.release_item(item.id),
+    ):
+        assert update() is False
+    assert job_store.list_items("job")[0].status == "running"
+
+
+def test_workers_complete_job_against_stub_llm(jobs, stub_llm):
+    jobs("job", 4, rejected=1)
+
+    async def run():
+        await job_service.start_workers()
+        try:
+            for _ in range(200):
+                counts = job_store.status_counts("job")
+                if counts["queued"] + counts["running"] == 0:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await job_service.stop_workers()
+
+    asyncio.run(run())
+
+    status = job_service.job_status("job")
+    assert status["status"] == "completed"
+    assert status["counts"] == {"queued": 0, "running": 0, "succeeded": 4, "failed": 1}
+    assert status["stages"]["extract"]["completed"] == 4
+    assert len(stub_llm.calls) == 8  # is_resume + extraction per file
+    results = job_service.job_results("job", 0, 10, "succeeded")
+    assert [entry["result"]["name"] for entry in results] == ["Jane Doe"] * 4
+
+
+def test_transient_llm_error_is_retried_with_backoff(jobs, stub_llm, monkeypatch):
+    jobs("job", 1)
+    delays = []
+    retry_item = job_store.retry_item
+
+    def record_retry(item_id, error, delay_seconds):
+        delays.append(delay_seconds)
+        return retry_item(item_id, error, delay_seconds)
+
+    monkeypatch.setattr(job_store, "retry_item", record_retry)
+    stub_llm.failures = [LLMError("429", details={"transient": True}) for _ in range(2)]
+
+    async def run_until_done():
+        while True:
+            item = job_store.claim_next()
+            if item is None:
+                counts = job_store.status_counts("job")
+                if counts["queued"] == 0:
+                    return
+                await asyncio.sleep(0.02)
+                continue
+            await job_service._run_item(item)
+
+    asyncio.run(run_until_done())
+
+    assert delays == [0.05, 0.1]
+    [entry] = job_service.job_results("job", 0, 10)
+    assert entry["status"] == "succeeded" and entry["attempts"] == 3
+
+
+def test_retries_stop_at_max_attempts_and_permanent_errors_fail(jobs, stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    jobs("transient", 1)
+    stub_llm.failures = [LLMError("503", details={"transient": True})]
+    asyncio.run(job_service._run_item(job_store.claim_next()))
+
+    jobs("permanent", 1)
+    stub_llm.extraction = "not json"
+    asyncio.run(job_service._run_item(job_store.claim_next()))
+
+    for job_id, error in (("transient", "503"), ("permanent", "not valid JSON")):
+        [entry] = job_service.job_results(job_id, 0, 10)
+        assert entry["status"] == "failed" and error in entry["error"]
+
+
+def test_orphans_of_stopped_processes_are_reclaimed(jobs):
+    jobs("job", 3)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    host = socket.gethostname()
+
+    orphan, own, live = job_store.claim_next(), job_store.claim_next(), job_store.claim_next()
+    _set_owner(orphan.id, f"{host}:{dead.pid}")
+    _set_owner(live.id, f"{host}:{os.getppid()}")
+
+    # 本进程自己的条目也要收回：重启后可能拿到同一个 pid
+    assert job_store.reclaim_orphans() == 2
+    reclaimed = {job_store.claim_next().id, job_store.claim_next().id}
+    assert reclaimed == {orphan.id, own.id}
+    assert job_store.claim_next() is None
+
+
+def test_orphans_at_max_attempts_fail(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    jobs("job", 1)
+    job_store.claim_next()
+
+    assert job_store.reclaim_orphans() == 0
+    [entry] = job_service.job_results("job", 0, 10)
+    assert entry["status"] == "failed" and entry["attempts"] == 1
+    assert job_store.claim_next() is None
+
+
+def test_cancelled_item_goes_back_to_queue(jobs, stub_llm):
+    jobs("job", 1)
+
+    async def run():
+        stub_llm.gate = asyncio.Event()
+        item = job_store.claim_next()
+        task = asyncio.create_task(job_service._run_item(item))
+        while not stub_llm.calls:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    [entry] = job_service.job_results("job", 0, 10)
+    assert entry["status"] == "queued" and entry["attempts"] == 0
+    assert job_store.claim_next().attempts == 1
+
+
+def test_lease_is_renewed_while_item_runs(jobs, stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.3)
+    jobs("job", 1)
+    stub_llm.delay = 0.4  # 两次 LLM 调用共 0.8s，远超租约
+
+    async def run():
+        item = job_store.claim_next()
+        task = asyncio.create_task(job_service._run_item(item))
+        await asyncio.sleep(0.6)
+        stolen = await asyncio.to_thread(job_store.claim_next)
+        await task
+        return stolen
+
+    assert asyncio.run(run()) is None
+    [entry] = job_service.job_results("job", 0, 10)
+    assert entry["status"] == "succeeded" and entry["attempts"] == 1
+    assert json.loads(jobs.results[entry["resume_id"]])["name"] == "Jane Doe"
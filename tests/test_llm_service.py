@@ -0,0 +1,22 @@
+import asyncio
+import ssl
+
+from services import llm_service
+
+
+def test_async_client_verifies_with_ca_certificates(monkeypatch):
+    monkeypatch.setattr(llm_service, "_ssl_context", None)
+    monkeypatch.setattr(llm_service, "_async_client", None)
+
+    client = llm_service._get_async_client()
+    try:
+        context = client._transport._pool._ssl_context
+        assert context.verify_mode == ssl.CERT_REQUIRED
+        assert context.cert_store_stats()["x509_ca"] > 0
+    finally:
+        asyncio.run(client.aclose())
+
+
+def test_ollama_payload_keeps_model_default_temperature():
+    _, _, payload = llm_service._ollama_request("prompt", "llama3")
+    assert payload == {"model": "llama3", "prompt": "prompt", "stream": False}
@@ -0,0 +1,76 @@
+import io
+import sqlite3
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from config import settings
+from services.pdf_to_txt import extract_pdf
+from storage import upload_index
+from utils import metrics
+from utils.errors import CorruptedPDFError
+
+
+def _text_pdf(text: str = "Jane Doe Software Engineer Python SQL") -> bytes:
+    writer = PdfWriter()
+    page = writer.add_blank_page(612, 792)
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+    })
+    content = DecodedStreamObject()
+    content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def triage_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_TRIAGE_ENABLED", True)
+    metrics.drain()
+
+
+def test_pdf_with_eof_marker_is_not_flagged():
+    extracted = extract_pdf(_text_pdf(), name="resume.pdf", skip_size_check=True)
+    assert "Jane Doe" in extracted.text
+    assert extracted.triage["verdict"] == "text"
+    assert extracted.triage["missing_eof"] is False
+
+
+def test_trailing_junk_after_eof_only_warns():
+    extracted = extract_pdf(_text_pdf() + b"\n" + b"x" * 8192, name="signed.pdf", skip_size_check=True)
+    assert "Jane Doe" in extracted.text
+    assert extracted.triage["verdict"] == "text"
+    assert extracted.triage["missing_eof"] is True
+    assert metrics.snapshot()["counters"]["pdf.triage.missing_eof"] == 1
+
+
+def test_cut_off_upload_is_rejected_as_truncated():
+    data = _text_pdf()
+    with pytest.raises(CorruptedPDFError) as raised:
+        extract_pdf(data[: len(data) // 3], name="partial.pdf", skip_size_check=True)
+    assert raised.value.details == {"triage": "truncated"}
+
+
+def test_triage_is_stored_per_upload_and_old_index_is_migrated(tmp_path, monkeypatch):
+    path = tmp_path / "uploads.sqlite3"
+    monkeypatch.setattr(settings, "UPLOAD_INDEX_PATH", path)
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE uploads (sha256 TEXT PRIMARY KEY, resume_id TEXT NOT NULL, ext TEXT NOT NULL, "
+            "txt_path TEXT NOT NULL, result_path TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO uploads VALUES ('old', 'r0', '.pdf', 'r0.txt', NULL, 0)")
+
+    assert upload_index.lookup("old").triage is None
+    triage = {"verdict": "text", "pages": 1, "missing_eof": True}
+    upload_index.record_upload("new", "r1", ".pdf", "r1.txt", triage)
+    assert upload_index.lookup("new").triage == triage
+    assert upload_index.lookup_resume("r1").triage == triage
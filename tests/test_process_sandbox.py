@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+from utils import metrics
+from utils.errors import ExtractionLimitError
+from utils.executors import BoundedExecutor
+from utils.process_sandbox import SandboxedProcessPool
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="RLIMIT_AS is POSIX only")
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+def _allocate() -> int:
+    return len(bytearray(600 * 1024 * 1024))
+
+
+def _hang() -> None:
+    time.sleep(30)
+
+
+@pytest.fixture
+def sandboxed():
+    pool = SandboxedProcessPool(
+        1,
+        mp_context=multiprocessing.get_context("spawn"),
+        task_timeout=2,
+        memory_limit_bytes=300 * 1024 * 1024,
+        name="test",
+    )
+    executor = BoundedExecutor("test", lambda: pool, 1, 4, collect_worker_metrics=True)
+    metrics.drain()
+    yield executor
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_memory_error_retires_worker_through_metrics_wrapper(sandboxed):
+    async def run():
+        before = await sandboxed.run(_pid)
+        with pytest.raises(ExtractionLimitError) as raised:
+            await sandboxed.run(_allocate)
+        return before, raised.value, await sandboxed.run(_pid)
+
+    before, error, after = asyncio.run(run())
+    assert error.details == {"reason": "memory"}
+    assert before != after
+    assert metrics.snapshot()["counters"]["executor.test.memory_exceeded"] == 1
+
+
+def test_timeout_kills_worker_and_logs_task_name(sandboxed, caplog):
+    async def run():
+        with pytest.raises(ExtractionLimitError) as raised:
+            await sandboxed.run(_hang)
+        return raised.value
+
+    error = asyncio.run(run())
+    assert error.details == {"reason": "timeout"}
+    assert metrics.snapshot()["counters"]["executor.test.killed.timeout"] == 1
+    assert any(record.getMessage().endswith("killed: _hang") for record in caplog.records)
+
+
+def test_start_workers_starts_every_slot():
+    pool = SandboxedProcessPool(3, mp_context=multiprocessing.get_context("spawn"), name="test")
+    try:
+        assert pool.start_workers() == 3
+        pids = {pool.submit(_pid).result() for _ in range(9)}
+        assert len(pids) <= 3
+        assert pool.start_workers() == 3
+    finally:
+        pool.shutdown(wait=True)
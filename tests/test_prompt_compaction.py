@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+from config import settings
+from schemas.models import ExtractionInput
+from services import extract_service
+from services.prompt_compaction import compact_text
+from services.text_clean_service import PAGE_BREAK, clean_text
+
+HEADER = "Jane Doe | jane@example.com"
+FOOTER = "Jane Doe - Curriculum Vitae"
+
+
+def _paged_resume(pages: int) -> str:
+    """PDF-style raw text: every page starts with HEADER and ends with FOOTER."""
+    page_texts = []
+    for page in range(pages):
+        body = [f"Built reporting pipeline number {page}-{i} with Python and SQL" for i in range(20)]
+        page_texts.append("\n".join([HEADER, *body, FOOTER]))
+    return clean_text(PAGE_BREAK.join(page_texts)) + "\nSkills: Python"
+
+
+def _repeated_roles_resume() -> str:
+    lines = ["Jane Doe", "jane@example.com", "", "EXPERIENCE"]
+    for company in ("Acme", "Globex", "Initech"):
+        lines += ["", "Senior Software Engineer", f"{company}, 2015 - 2018", "Responsibilities:"]
+        lines += [f"- Delivered {company} project {i} on time with a small team" for i in range(14)]
+    return "\n".join(lines)
+
+
+def test_clean_text_keeps_page_breaks_on_their_own_line():
+    assert clean_text("page one \n\f• item\n\f\f") == f"page one\n{PAGE_BREAK}\n- item"
+
+
+def test_running_header_and_footer_are_kept_once():
+    result = compact_text(_paged_resume(3), max_tokens=0)
+    assert result.text.count(HEADER) == 1
+    assert result.text.count(FOOTER) == 1
+    assert PAGE_BREAK not in result.text
+    assert "Built reporting pipeline number 2-19" in result.text
+
+
+def test_repeated_titles_and_headings_inside_pages_survive():
+    text = _repeated_roles_resume()
+    for pages in (text, clean_text(text.replace("\n\nSenior", f"\n{PAGE_BREAK}\nSenior", 1))):
+        result = compact_text(pages, max_tokens=0)
+        assert result.text.count("Senior Software Engineer") == 3
+        assert result.text.count("Responsibilities:") == 3
+        assert result.removed_lines == 0
+
+
+def test_repeated_lines_without_page_breaks_are_kept():
+    text = "\n".join(line for line in _paged_resume(3).split("\n") if line != PAGE_BREAK)
+    result = compact_text(text, max_tokens=0)
+    assert result.text.count(FOOTER) == 3
+
+
+def test_min_count_below_two_is_treated_as_two(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_REPEATED_LINE_MIN_COUNT", 1)
+
+    result = compact_text(_paged_resume(2), max_tokens=0)
+    assert result.text.count(FOOTER) == 1
+    assert "Skills: Python" in result.text
+
+
+def test_async_extraction_compacts_off_the_event_loop(stub_llm, monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_COMPACTION_ENABLED", True)
+    threads = []
+
+    def recording_compact(text, provider=None):
+        threads.append(threading.get_ident())
+        return compact_text(text, provider)
+
+    monkeypatch.setattr(extract_service, "compact_text", recording_compact)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        data = ExtractionInput(text=_paged_resume(2))
+        structured, _ = await extract_service.extract_structured_resume_async(data, mode="two_call")
+        return loop_thread, structured
+
+    loop_thread, structured = asyncio.run(run())
+    assert structured.name == "Jane Doe"
+    assert threads and loop_thread not in threads
@@ -0,0 +1,77 @@
+"""
+Regression corpus for the resume validity checker: every text under
+data/validity_corpus is checked raw and after clean_text, and the full result
+must match data/validity_baseline.json.
+
+The baseline was recorded with the checker as it was before the compiled
+keyword / header scan and the single-pass normalizer, so any change in a
+decision, score, reason or stat shows up here. After an intended behaviour
+change, rewrite it with ``python tests/test_validity_baseline.py``.
+"""
+import json
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.resume_validity_checker import validity_checker  # noqa: E402
+from services.text_clean_service import clean_text  # noqa: E402
+
+DATA_DIR = Path(__file__).parent / "data"
+CORPUS_DIR = DATA_DIR / "validity_corpus"
+BASELINE_PATH = DATA_DIR / "validity_baseline.json"
+
+
+def _read(name: str) -> str:
+    # 按字节读，保留 \r\n 样本的原始换行
+    return (CORPUS_DIR / name).read_bytes().decode("utf-8")
+
+
+def _check(text: str, cleaned: bool) -> dict:
+    if cleaned:
+        return asdict(validity_checker.check_text(clean_text(text), cleaned=True))
+    return asdict(validity_checker.check_text(text))
+
+
+def _baseline() -> dict:
+    return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+
+
+def test_corpus_and_baseline_cover_the_same_files():
+    assert sorted(path.name for path in CORPUS_DIR.glob("*.txt")) == sorted(_baseline())
+
+
+def test_baseline_covers_every_decision():
+    decisions = {entry["raw"]["decision"] for entry in _baseline().values()}
+    assert decisions == {"PASS", "SOFT_FAIL", "HARD_FAIL"}
+
+
+@pytest.mark.parametrize("name", sorted(_baseline()))
+@pytest.mark.parametrize("mode", ["raw", "cleaned"])
+def test_check_text_matches_baseline(name, mode):
+    expected = _baseline()[name][mode]
+    assert _check(_read(name), cleaned=mode == "cleaned") == expected
+
+
+def test_check_texts_matches_check_text():
+    names = sorted(_baseline())
+    texts = [_read(name) for name in names]
+    batched = validity_checker.check_texts(texts, workers=2, chunk_size=3)
+    assert [asdict(result) for result in batched] == [_baseline()[name]["raw"] for name in names]
+
+
+def _write_baseline() -> None:
+    baseline = {
+        path.name: {mode: _check(_read(path.name), mode == "cleaned") for mode in ("raw", "cleaned")}
+        for path in sorted(CORPUS_DIR.glob("*.txt"))
+    }
+    BASELINE_PATH.write_text(
+        json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+
+
+if __name__ == "__main__":
+    _write_baseline()
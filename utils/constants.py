@@ -4,10 +4,13 @@ All magic numbers and repeated string literals should be defined here.
 """
 
 # HTTP Status Codes
+HTTP_202_ACCEPTED = 202
 HTTP_400_BAD_REQUEST = 400
+HTTP_404_NOT_FOUND = 404
 HTTP_413_PAYLOAD_TOO_LARGE = 413
 HTTP_422_UNPROCESSABLE_ENTITY = 422
 HTTP_502_BAD_GATEWAY = 502
+HTTP_503_SERVICE_UNAVAILABLE = 503
 
 # Error Messages
 ERR_FILE_TOO_LARGE = "文件过大"
@@ -18,6 +21,7 @@ ERR_TEXT_EMPTY = "text 不能为空"
 ERR_NO_FILENAME_PROVIDED = "未提供文件名"
 ERR_FILE_CONTENT_EMPTY = "文件内容为空"
 ERR_UNSUPPORTED_FILE_TYPE = "不支持的文件类型"
+ERR_JOB_NOT_FOUND = "任务不存在"
 
 # File upload limits
 ALLOWED_EXTENSIONS = {".pdf", ".docx"}
@@ -49,6 +49,16 @@ class CorruptedPDFError(PDFParseError):
     pass
 
 
+class ExtractionLimitError(DocumentExtractError):
+    """A document hit the parse time or memory limit and its worker process was killed."""
+    pass
+
+
+class ExecutorBusyError(AppError):
+    """Raised when a background executor's queue is full and new work is rejected."""
+    pass
+
+
 class LLMParseError(AppError):
     """Raised when LLM response cannot be parsed or validated."""
     pass
@@ -0,0 +1,305 @@
+"""
+Shared executors for work that must not run on the event loop.
+
+- cpu: document parsing (pypdf / DOCX XML / validity checking) holds the GIL,
+  so it runs on a process pool. The pool is sandboxed (utils.process_sandbox): a
+  document that overruns PARSE_TIMEOUT_SECONDS or PARSE_MEMORY_LIMIT_MB only costs
+  the worker it ran on.
+- io: blocking LLM calls and small disk writes run on a thread pool.
+- pages: page ranges of very large PDFs, fanned out from inside a parse worker.
+
+cpu and io are wrapped in BoundedExecutor, which caps how much work may queue up and
+records queue depth and wait time per executor.
+
+Page fan-out is paid for with cpu slots: a PDF parse borrows the cpu slots that are
+idle when it starts (at most PDF_PAGE_WORKERS) and may keep that many page processes
+busy. So busy parse workers plus busy page processes never exceed PARSE_WORKERS, and
+under load, when no slot is idle, PDFs are extracted sequentially. Page processes
+belong to the parse worker's process group, so the sandbox's timeout kill takes them
+down too, and they exit when their parse worker is recycled.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import settings
+from utils import metrics
+from utils.errors import ExecutorBusyError, ExtractionLimitError
+from utils.logger import get_logger
+from utils.process_sandbox import SandboxedProcessPool
+
+logger = get_logger("executors")
+
+_process_pool: Optional[SandboxedProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker() -> None:
+    """Import the parsing stack inside a worker so the first real task does not pay for it."""
+    import services.upload_service  # noqa: F401
+
+    metrics.drain()  # start each worker with an empty registry
+
+
+def get_process_pool() -> SandboxedProcessPool:
+    """Return the shared parsing pool, creating it on first use."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn avoids forking a process that already runs the event loop and its threads
+            _process_pool = SandboxedProcessPool(
+                settings.PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+                task_timeout=settings.PARSE_TIMEOUT_SECONDS or None,
+                memory_limit_bytes=settings.PARSE_MEMORY_LIMIT_MB * 1024 * 1024,
+                max_tasks_per_worker=settings.PARSE_MAX_TASKS_PER_WORKER,
+                name="cpu",
+            )
+            logger.info(
+                "Started parse process pool with %d workers (timeout %ss, memory limit %d MB)",
+                settings.PARSE_WORKERS, settings.PARSE_TIMEOUT_SECONDS, settings.PARSE_MEMORY_LIMIT_MB,
+            )
+        return _process_pool
+
+
+def warm_process_pool() -> None:
+    """Start every worker up front and wait until each has imported the parsing stack."""
+    # 直接启动每个槽位的工作进程（初始化函数即预热），而不是提交预热任务：
+    # 任务可能被同一个先就绪的工作进程连续领走，其余工作进程仍是冷的
+    ready = get_process_pool().start_workers()
+    logger.info("Parse process pool warmed: %d/%d worker processes ready", ready, settings.PARSE_WORKERS)
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    with _pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_page_worker() -> None:
+    import services.pdf_to_txt  # noqa: F401
+
+    metrics.drain()
+
+
+# 当前解析任务从 cpu 执行器借到的空闲名额数；只在解析进程里由 _CollectingMetrics 设置
+_granted_page_workers = 0
+
+
+def granted_page_workers() -> int:
+    """Page processes the running parse task may keep busy (0 outside a task that borrowed slots)."""
+    return _granted_page_workers
+
+
+def get_page_pool() -> ProcessPoolExecutor:
+    """
+    Pool used to extract page ranges of one large PDF in parallel, created lazily in
+    the parse worker. Its processes start on demand, so a worker only ever holds as many
+    as the largest number of slots one of its tasks borrowed.
+    """
+    global _page_pool
+    with _pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_PAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_page_worker,
+            )
+            logger.info("Started PDF page pool with %d workers", settings.PDF_PAGE_WORKERS)
+        return _page_pool
+
+
+def reset_page_pool() -> None:
+    """Drop a broken page pool so the next large PDF starts a fresh one."""
+    global _page_pool
+    with _pool_lock:
+        pool, _page_pool = _page_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _CollectingMetrics:
+    """
+    Picklable wrapper that runs ``func`` in a worker process and ships the metrics it
+    recorded back to the parent. It keeps ``func``'s name for the sandbox's logs, and
+    hands ``func`` the cpu slots the call borrowed (see granted_page_workers).
+    """
+
+    def __init__(self, func: Callable[..., Any], borrowed: int = 0) -> None:
+        self.func = func
+        self.borrowed = borrowed
+        self.__name__ = getattr(func, "__name__", repr(func))
+
+    def __call__(self, *args: Any) -> tuple[bool, Any, dict]:
+        global _granted_page_workers
+        _granted_page_workers = self.borrowed
+        try:
+            return True, self.func(*args), metrics.drain()
+        except (MemoryError, ExtractionLimitError):
+            # 交给沙箱处理：转换成 ExtractionLimitError、计数并替换这个工作进程
+            metrics.drain()
+            raise
+        except Exception as exc:
+            return False, exc, metrics.drain()
+        finally:
+            _granted_page_workers = 0
+
+
+class BoundedExecutor:
+    """
+    Run blocking callables on an underlying executor without blocking the event loop.
+
+    At most ``max_workers`` calls are submitted at once; up to ``max_queue`` more wait
+    their turn, and anything beyond that is rejected with ExecutorBusyError. A call
+    holds its slot until the work itself finishes, even if the awaiting task is
+    cancelled first.
+
+    ``run(..., borrow_idle=n)`` also takes up to ``n`` slots that are idle at that moment
+    (never one a queued call is waiting for) and holds them for the same time; with
+    ``collect_worker_metrics`` the worker sees the count via granted_page_workers().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        executor_factory: Callable[[], Executor],
+        max_workers: int,
+        max_queue: int,
+        *,
+        collect_worker_metrics: bool = False,
+    ) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor_factory = executor_factory
+        self._collect_worker_metrics = collect_worker_metrics
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        self._running = 0
+        self._borrowed = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any, borrow_idle: int = 0) -> Any:
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            metrics.incr(f"executor.{self.name}.rejected")
+            raise ExecutorBusyError(f"服务繁忙，{self.name} 队列已满，请稍后重试")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        enqueued_at = time.perf_counter()
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+        started_at = time.perf_counter()
+        metrics.observe(f"executor.{self.name}.wait", started_at - enqueued_at)
+
+        # 只借此刻空闲的名额：locked() 在有调用排队时也为真，借用不会插到排队者前面
+        borrowed = 0
+        while borrowed < borrow_idle and not self._semaphore.locked():
+            await self._semaphore.acquire()  # 未上锁时立即返回，不会让出事件循环
+            borrowed += 1
+        if borrowed:
+            self._borrowed += borrowed
+            metrics.incr(f"executor.{self.name}.borrowed", borrowed)
+
+        self._running += 1
+        loop = asyncio.get_running_loop()
+        call = _CollectingMetrics(func, borrowed) if self._collect_worker_metrics else func
+        try:
+            future = self._executor_factory().submit(call, *args)
+        except BaseException:
+            self._finish(started_at, borrowed)
+            raise
+        # 名额在任务真正结束时才归还：调用方被取消时线程 / 进程里的任务仍在跑
+        future.add_done_callback(lambda _: self._finish_from_worker(loop, started_at, borrowed))
+        waiter = asyncio.wrap_future(future, loop=loop)
+        try:
+            result = await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            future.cancel()  # 只撤销还没开始的任务
+            # 没人再等这个结果，取走异常免得 asyncio 报 "never retrieved"
+            waiter.add_done_callback(lambda done: done.cancelled() or done.exception())
+            raise
+
+        if not self._collect_worker_metrics:
+            return result
+        ok, value, delta = result
+        metrics.merge(delta)
+        if not ok:
+            raise value
+        return value
+
+    def _finish(self, started_at: float, borrowed: int = 0) -> None:
+        self._running -= 1
+        self._borrowed -= borrowed
+        self._completed += 1
+        for _ in range(1 + borrowed):
+            self._semaphore.release()
+        metrics.observe(f"executor.{self.name}.run", time.perf_counter() - started_at)
+
+    def _finish_from_worker(self, loop: asyncio.AbstractEventLoop, started_at: float, borrowed: int) -> None:
+        try:
+            loop.call_soon_threadsafe(self._finish, started_at, borrowed)
+        except RuntimeError:
+            pass  # 事件循环已关闭，名额也就无所谓了
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "running": self._running,
+            "borrowed": self._borrowed,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="io")
+        return _thread_pool
+
+
+def shutdown_thread_pool() -> None:
+    global _thread_pool
+    with _pool_lock:
+        pool, _thread_pool = _thread_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+cpu_executor = BoundedExecutor(
+    "cpu",
+    get_process_pool,
+    settings.PARSE_WORKERS,
+    settings.PARSE_MAX_QUEUE,
+    collect_worker_metrics=True,
+)
+io_executor = BoundedExecutor("io", _get_thread_pool, settings.IO_WORKERS, settings.IO_MAX_QUEUE)
+
+metrics.register_collector(
+    "executors",
+    lambda: {cpu_executor.name: cpu_executor.stats(), io_executor.name: io_executor.stats()},
+)
@@ -0,0 +1,77 @@
+"""
+In-process counters and timings, exposed through /api/metrics.
+
+Work that runs inside a parse worker process records into that process's registry;
+the executor drains it after each task and merges it back into the API process.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record one duration sample under ``name``."""
+    with _lock:
+        _add_timing(name, 1, seconds, seconds)
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """Register a callable whose live values (gauges, pool stats) are included in snapshots."""
+    with _lock:
+        _collectors[name] = collector
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        timings = {
+            name: {
+                "count": int(t["count"]),
+                "total_seconds": round(t["total"], 6),
+                "avg_seconds": round(t["total"] / t["count"], 6) if t["count"] else 0.0,
+                "max_seconds": round(t["max"], 6),
+            }
+            for name, t in _timings.items()
+        }
+        collectors = dict(_collectors)
+
+    result = {"counters": counters, "timings": timings}
+    for name, collector in collectors.items():
+        result[name] = collector()
+    return result
+
+
+def drain() -> dict:
+    """Return everything recorded since the last drain and reset the registry."""
+    global _counters, _timings
+    with _lock:
+        delta = {"counters": _counters, "timings": _timings}
+        _counters, _timings = {}, {}
+    return delta
+
+
+def merge(delta: dict) -> None:
+    """Fold a ``drain()`` result from another process into this registry."""
+    with _lock:
+        for name, value in delta.get("counters", {}).items():
+            _counters[name] = _counters.get(name, 0) + value
+        for name, t in delta.get("timings", {}).items():
+            _add_timing(name, t["count"], t["total"], t["max"])
+
+
+def _add_timing(name: str, count: float, total: float, max_value: float) -> None:
+    current = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+    current["count"] += count
+    current["total"] += total
+    current["max"] = max(current["max"], max_value)
@@ -0,0 +1,313 @@
+"""
+A process pool whose workers can be killed.
+
+concurrent.futures.ProcessPoolExecutor cannot stop a task that hangs, and a worker
+that dies takes the whole pool down with BrokenProcessPool. SandboxedProcessPool gives
+every worker its own pipe and dispatcher thread instead, so one task can be cut off
+without touching the others:
+
+- each task has a wall-clock deadline; past it the worker is killed and replaced;
+- each worker runs under an address-space limit (RLIMIT_AS, POSIX only), so a
+  runaway allocation fails with MemoryError instead of exhausting the host;
+- workers are recycled after a fixed number of tasks.
+
+Over-budget tasks fail with ExtractionLimitError.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import signal
+import threading
+import weakref
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the time limit still applies
+    resource = None
+
+from utils import metrics
+from utils.errors import ExtractionLimitError
+from utils.logger import get_logger
+
+logger = get_logger("process_sandbox")
+
+_READY = "ready"
+_STOP_GRACE_SECONDS = 5
+
+
+def _limit_address_space(limit_bytes: int) -> None:
+    if limit_bytes <= 0 or resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit_bytes = min(limit_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, hard))
+
+
+def _worker_main(conn, initializer: Optional[Callable[[], Any]], memory_limit_bytes: int) -> None:
+    # 独立进程组：超时被杀时，连同它拉起的 PDF 分页进程一起结束
+    if hasattr(os, "setpgid"):
+        os.setpgid(0, 0)
+    _limit_address_space(memory_limit_bytes)
+    if initializer is not None:
+        initializer()
+    conn.send(_READY)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return  # the pool went away
+        if task is None:
+            return
+        fn, args, kwargs = task
+        try:
+            reply = (True, fn(*args, **kwargs))
+        except BaseException as exc:
+            reply = (False, exc)
+        try:
+            conn.send(reply)
+        except Exception as exc:  # result or exception could not be pickled
+            conn.send((False, RuntimeError(f"{type(exc).__name__}: {exc}")))
+
+
+class _Worker:
+    def __init__(self, ctx, initializer, memory_limit_bytes: int) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        # Not a daemon: the worker must be allowed to start a PDF page pool of its own.
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, initializer, memory_limit_bytes), name="parse-sandbox"
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.retire = False
+        try:
+            if self.conn.recv() != _READY:
+                raise RuntimeError("unexpected handshake from parse worker")
+        except EOFError:
+            self.kill()
+            raise RuntimeError(
+                f"parse worker exited during startup (exit code {self.process.exitcode}); "
+                "is PARSE_MEMORY_LIMIT_MB too low?"
+            ) from None
+        except BaseException:
+            self.kill()
+            raise
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(_STOP_GRACE_SECONDS)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class SandboxedProcessPool(Executor):
+    """
+    Executor running each task in one of ``max_workers`` spawned worker processes,
+    with a per-task ``task_timeout`` (seconds, None = unlimited), a per-worker
+    ``memory_limit_bytes`` (0 = unlimited) and ``max_tasks_per_worker`` (0 = unlimited).
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        mp_context,
+        initializer: Optional[Callable[[], Any]] = None,
+        task_timeout: Optional[float] = None,
+        memory_limit_bytes: int = 0,
+        max_tasks_per_worker: int = 0,
+        name: str = "sandbox",
+    ) -> None:
+        self.name = name
+        self._ctx = mp_context
+        self._initializer = initializer
+        self._task_timeout = task_timeout
+        self._memory_limit_bytes = memory_limit_bytes
+        self._max_tasks_per_worker = max_tasks_per_worker
+        self._tasks: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        # 每个分发线程一个工作进程槽位；槽位锁保证 start_workers 与分发线程不会重复启动
+        self._workers: list[Optional[_Worker]] = [None] * max_workers
+        self._slot_locks = [threading.Lock() for _ in range(max_workers)]
+        self._threads = [
+            threading.Thread(target=self._dispatch, args=(i,), name=f"{name}-dispatch-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        _live_pools.add(self)
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future = Future()
+            self._tasks.put((future, fn, args, kwargs))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            already_shut_down, self._shutdown = self._shutdown, True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        if not already_shut_down:
+            for _ in self._threads:
+                self._tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def start_workers(self) -> int:
+        """
+        Start the worker of every slot now instead of on its first task, and wait
+        until each has run the initializer. Returns the number of live workers.
+        """
+        threads = [
+            threading.Thread(target=self._start_slot, args=(slot,), name=f"{self.name}-start-{slot}", daemon=True)
+            for slot in range(len(self._workers))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(worker is not None for worker in self._workers)
+
+    def _start_slot(self, slot: int) -> None:
+        try:
+            self._slot_worker(slot)
+        except Exception as exc:
+            logger.error("Could not start %s worker %d: %s", self.name, slot, exc)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self._initializer, self._memory_limit_bytes)
+
+    def _slot_worker(self, slot: int) -> Optional[_Worker]:
+        """The worker of ``slot``, started if the slot is empty (None after shutdown)."""
+        with self._slot_locks[slot]:
+            if self._workers[slot] is None and not self._shutdown:
+                self._workers[slot] = self._spawn()
+            return self._workers[slot]
+
+    def _dispatch(self, slot: int) -> None:
+        # 每个分发线程独占一个工作进程；未经 start_workers 预热时，工作进程在第一个任务到来时才启动
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                worker = self._slot_worker(slot)
+                if worker is None:
+                    raise RuntimeError(f"{self.name} pool is shut down")
+                value = self._run(worker, fn, args, kwargs)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(value)
+
+            worker = self._workers[slot]
+            if worker is None or self._worker_usable(worker):
+                continue
+            if worker.process.is_alive():
+                worker.stop()
+            with self._slot_locks[slot]:
+                self._workers[slot] = None
+            self._start_slot(slot)
+
+        with self._slot_locks[slot]:
+            worker, self._workers[slot] = self._workers[slot], None
+        if worker is not None:
+            worker.stop()
+
+    def _worker_usable(self, worker: _Worker) -> bool:
+        if worker.retire or not worker.process.is_alive():
+            return False
+        if self._max_tasks_per_worker and worker.tasks >= self._max_tasks_per_worker:
+            metrics.incr(f"executor.{self.name}.recycled")
+            return False
+        return True
+
+    def _run(self, worker: _Worker, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        worker.tasks += 1
+        try:
+            worker.conn.send((fn, args, kwargs))
+        except OSError:
+            worker.retire = True
+            return self._crashed(worker)
+
+        if not worker.conn.poll(self._task_timeout):
+            worker.retire = True
+            worker.kill()
+            metrics.incr(f"executor.{self.name}.killed.timeout")
+            logger.error(
+                "%s worker %d exceeded %gs, killed: %s", self.name, worker.process.pid, self._task_timeout,
+                getattr(fn, "__name__", fn),
+            )
+            raise ExtractionLimitError(
+                f"文档解析超时（超过 {self._task_timeout:g} 秒），已终止解析",
+                details={"reason": "timeout"},
+            )
+
+        try:
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.retire = True
+            return self._crashed(worker)
+        if ok:
+            return value
+
+        if isinstance(value, MemoryError):
+            value = ExtractionLimitError("文档解析超出内存限制，已终止解析", details={"reason": "memory"})
+        if isinstance(value, ExtractionLimitError):
+            # 内存超限后堆可能已经碎片化，换一个新进程
+            worker.retire = True
+            metrics.incr(f"executor.{self.name}.memory_exceeded")
+        raise value
+
+    def _crashed(self, worker: _Worker) -> Any:
+        worker.kill()
+        metrics.incr(f"executor.{self.name}.crashed")
+        logger.error("%s worker %d died, exit code %s", self.name, worker.process.pid, worker.process.exitcode)
+        raise ExtractionLimitError(
+            "解析进程异常退出（文档可能超出内存限制或已损坏）",
+            details={"reason": "crashed", "exitcode": worker.process.exitcode},
+        )
+
+
+_live_pools: "weakref.WeakSet[SandboxedProcessPool]" = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_live_pools() -> None:
+    # Workers are not daemons; stop them before multiprocessing tries to join them at exit.
+    for pool in list(_live_pools):
+        pool.shutdown(wait=True, cancel_futures=True)